@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+import importlib.util
 import os
 from pathlib import Path
 from dotenv import load_dotenv
@@ -60,6 +61,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'fundamentos.versao.VersaoPorRequisicaoMiddleware',
 ]
 
 ROOT_URLCONF = 'config.urls'
@@ -151,15 +153,75 @@ MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
 # REST Framework settings
+# Renderers: JSON via orjson; MessagePack (Accept: application/msgpack) se msgpack estiver instalado
 REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 50,
+    'DEFAULT_RENDERER_CLASSES': [
+        'fundamentos.renderers.OrjsonRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
         'rest_framework.filters.SearchFilter',
         'rest_framework.filters.OrderingFilter',
     ],
 }
+if importlib.util.find_spec('msgpack'):
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'].append('fundamentos.renderers.MessagePackRenderer')
+
+# Cache
+# 'file' (padrão) é compartilhado entre os workers do mesmo servidor;
+# 'redis' usa CACHE_URL; 'locmem' é local a cada processo (desenvolvimento)
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'file')
+
+if CACHE_BACKEND == 'redis':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('CACHE_URL', 'redis://localhost:6379/1'),
+        }
+    }
+elif CACHE_BACKEND == 'locmem':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.getenv('CACHE_DIR', str(BASE_DIR / 'cache' / 'django')),
+            'OPTIONS': {'MAX_ENTRIES': 5000},
+        }
+    }
+
+# Fundamentos
+# Alias do cache onde ficam a versão dos dados e os dados derivados dela
+FUNDAMENTOS_CACHE = 'default'
+
+# Segundos que a versão lida do banco fica no cache compartilhado; a
+# publicada por registrar_versao não expira
+FUNDAMENTOS_VERSAO_TIMEOUT = int(os.getenv('FUNDAMENTOS_VERSAO_TIMEOUT', '300'))
+
+# Backend de busca textual: 'auto' usa tsvector + unaccent no PostgreSQL
+# (a migração cria a extensão unaccent) e FTS5 no SQLite
+FUNDAMENTOS_BUSCA_BACKEND = os.getenv('FUNDAMENTOS_BUSCA_BACKEND', 'auto')
+
+# Índice invertido serializado pelo importador e carregado pelos workers
+# (busca com ?engine=index)
+FUNDAMENTOS_INDICE_ARQUIVO = os.getenv(
+    'FUNDAMENTOS_INDICE_ARQUIVO', str(BASE_DIR / 'cache' / 'indice_busca.pickle')
+)
+
+# Impressões digitais (tamanho, mtime, SHA-256) e resultados de validar_dados
+FUNDAMENTOS_VALIDACAO_CACHE = os.getenv(
+    'FUNDAMENTOS_VALIDACAO_CACHE', str(BASE_DIR / 'cache' / 'validacao_dados.json')
+)
+
+# Máximo de seqs por requisição em /api/fundamentos/lote/
+FUNDAMENTOS_LOTE_MAXIMO = int(os.getenv('FUNDAMENTOS_LOTE_MAXIMO', '100'))
 
 # Security settings for production
 if not DEBUG:
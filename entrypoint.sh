@@ -46,23 +46,44 @@ else:
     print('ℹ️  Superuser already exists')
 EOF
 
+# Validate data files before importing (unchanged files come from the cache)
+export DADOS_VALIDOS=0
+if [ -d /app/data ]; then
+    echo "🔎 Validating data files..."
+    if python manage.py validar_dados --dir=/app/data > /tmp/validacao_dados.json; then
+        DADOS_VALIDOS=1
+        echo "✅ Data files are valid"
+    else
+        echo "⚠️  Data validation failed, skipping import (report: /tmp/validacao_dados.json)"
+    fi
+fi
+
 # Import data if database is empty
 echo "📊 Checking if data needs to be imported..."
 python manage.py shell << EOF
 from fundamentos.models import FundamentoLegal
 import os
 
+dados_validos = os.environ.get('DADOS_VALIDOS') == '1'
+
 if FundamentoLegal.objects.count() == 0:
     print('📥 Database is empty, importing data...')
-    if os.path.exists('/app/data'):
+    if os.path.exists('/app/data') and dados_validos:
         os.system('python manage.py importar_fundamentos --dir=/app/data')
         print('✅ Data imported successfully!')
     else:
-        print('⚠️  Data directory not found, skipping import')
+        print('⚠️  Data directory not found or invalid, skipping import')
 else:
     print(f'ℹ️  Database already has {FundamentoLegal.objects.count()} fundamentos')
+    if os.path.exists('/app/data') and dados_validos:
+        print('🔁 Applying incremental changes from /app/data...')
+        os.system('python manage.py importar_fundamentos --dir=/app/data --incremental')
 EOF
 
+# Static snapshots (after collectstatic --clear, which would remove them)
+echo "🗂️  Generating static JSON snapshots..."
+python manage.py gerar_snapshots
+
 echo "✅ Application is ready!"
 echo "🌐 Starting web server..."
 
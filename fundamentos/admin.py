@@ -1,7 +1,9 @@
 from django.contrib import admin
 from django.utils.html import format_html
-from django.db.models import Count
-from .models import FundamentoLegal, TextoFundamento
+from .busca import reindexar
+from .hierarquia import obter_arvore, recalcular_hierarquia
+from .models import FundamentoLegal, TextoFundamento, VersaoDados
+from .versao import registrar_versao
 
 
 class TextoFundamentoInline(admin.TabularInline):
@@ -19,7 +21,10 @@ class FundamentoLegalAdmin(admin.ModelAdmin):
     list_filter = ['tipo_recurso', 'categoria', 'selecionavel', 'neutro']
     search_fields = ['seq', 'descricao', 'glossario']
     raw_id_fields = ['pai']
-    readonly_fields = ['criado_em', 'atualizado_em', 'nivel_display', 'caminho_display']
+    readonly_fields = [
+        'criado_em', 'atualizado_em', 'nivel_display', 'caminho_display',
+        'num_descendentes',
+    ]
     inlines = [TextoFundamentoInline]
     
     fieldsets = (
@@ -33,39 +38,62 @@ class FundamentoLegalAdmin(admin.ModelAdmin):
             'fields': ('selecionavel', 'neutro', 'informacao', 'justificativa')
         }),
         ('Informações', {
-            'fields': ('nivel_display', 'caminho_display', 'criado_em', 'atualizado_em'),
+            'fields': (
+                'nivel_display', 'caminho_display', 'num_descendentes',
+                'criado_em', 'atualizado_em'
+            ),
             'classes': ('collapse',)
         }),
     )
 
-    def get_queryset(self, request):
-        return super().get_queryset(request).annotate(
-            _num_filhos=Count('filhos')
-        )
+    def save_related(self, request, form, formsets, change):
+        # Os textos (inline) são gravados aqui, depois de save_model
+        super().save_related(request, form, formsets, change)
+        self.dados_alterados([form.instance.seq])
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        self.dados_alterados(excluidos=[obj.seq])
+
+    def delete_queryset(self, request, queryset):
+        seqs = list(queryset.values_list('seq', flat=True))
+        super().delete_queryset(request, queryset)
+        self.dados_alterados(excluidos=seqs)
+
+    def dados_alterados(self, seqs=None, excluidos=None):
+        """Atualiza hierarquia, índice de busca e versão dos dados"""
+        recalcular_hierarquia()
+        # Exclusões levam os descendentes (CASCADE): o índice é refeito inteiro
+        reindexar(seqs)
+        registrar_versao('admin', seqs or excluidos)
 
     def descricao_truncada(self, obj):
         return obj.descricao[:80] + '...' if len(obj.descricao) > 80 else obj.descricao
     descricao_truncada.short_description = 'Descrição'
 
     def pai_link(self, obj):
-        if obj.pai:
-            return format_html(
-                '<a href="/admin/fundamentos/fundamentolegal/{}/change/">[{}] {}</a>',
-                obj.pai.seq, obj.pai.seq, obj.pai.descricao[:30]
-            )
-        return '-'
+        if obj.pai_id is None:
+            return '-'
+        arvore = obter_arvore()
+        if obj.pai_id in arvore:
+            descricao = arvore.descricao(obj.pai_id)
+        else:
+            descricao = obj.pai.descricao
+        return format_html(
+            '<a href="/admin/fundamentos/fundamentolegal/{}/change/">[{}] {}</a>',
+            obj.pai_id, obj.pai_id, descricao[:30]
+        )
     pai_link.short_description = 'Pai'
 
     def num_filhos(self, obj):
-        count = getattr(obj, '_num_filhos', obj.filhos.count())
-        if count > 0:
+        if obj.num_filhos > 0:
             return format_html(
                 '<a href="?pai__seq={}">{} filhos</a>',
-                obj.seq, count
+                obj.seq, obj.num_filhos
             )
         return '0'
     num_filhos.short_description = 'Filhos'
-    num_filhos.admin_order_field = '_num_filhos'
+    num_filhos.admin_order_field = 'num_filhos'
 
     def nivel_display(self, obj):
         return obj.nivel
@@ -82,3 +110,31 @@ class TextoFundamentoAdmin(admin.ModelAdmin):
     list_filter = ['fundamento__tipo_recurso']
     search_fields = ['fundamento__descricao', 'legislacao', 'texto_html']
     raw_id_fields = ['fundamento']
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        reindexar([obj.fundamento_id])
+        registrar_versao('admin', [obj.fundamento_id])
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        reindexar([obj.fundamento_id])
+        registrar_versao('admin', [obj.fundamento_id])
+
+    def delete_queryset(self, request, queryset):
+        seqs = list(queryset.values_list('fundamento_id', flat=True).distinct())
+        super().delete_queryset(request, queryset)
+        reindexar(seqs)
+        registrar_versao('admin', seqs)
+
+
+@admin.register(VersaoDados)
+class VersaoDadosAdmin(admin.ModelAdmin):
+    list_display = ['hash', 'atualizado_em', 'origem']
+    readonly_fields = ['hash', 'atualizado_em', 'origem']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
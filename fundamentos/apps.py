@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class FundamentosConfig(AppConfig):
     name = 'fundamentos'
+
+    def ready(self):
+        from . import signals  # noqa: F401
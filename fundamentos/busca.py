@@ -0,0 +1,273 @@
+"""
+Backends de busca textual sobre descrição, glossário e textos dos fundamentos.
+
+- PostgreSQL: coluna tsvector (configuração pt_unaccent) com índice GIN.
+- SQLite: tabela virtual FTS5 espelhada, sem acentos (remove_diacritics).
+- Demais casos: icontains, como antes.
+
+O índice é mantido por reindexar(), chamado pelo importador e pelo admin
+(manage.py reindexar recria o índice inteiro).
+O backend pode ser fixado em FUNDAMENTOS_BUSCA_BACKEND (caminho da classe)
+ou escolhido automaticamente pelo banco em uso ('auto').
+"""
+import html
+import re
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.utils.html import strip_tags
+from django.utils.module_loading import import_string
+from rest_framework import filters
+
+from .carga_postgres import copiar, copy_disponivel
+from .models import FundamentoLegal, TextoFundamento
+
+TABELA_FUNDAMENTOS = FundamentoLegal._meta.db_table
+TABELA_TEXTOS = TextoFundamento._meta.db_table
+TABELA_FTS = 'fundamentos_busca'
+CONFIGURACAO_PG = 'pt_unaccent'
+
+_palavra = re.compile(r'\w+')
+
+
+def termos_da_consulta(termo):
+    """Palavras da consulta, sem operadores nem pontuação"""
+    return _palavra.findall(termo or '')
+
+
+def texto_plano(texto_html):
+    return html.unescape(strip_tags(texto_html or ''))
+
+
+def documentos_busca(seqs=None):
+    """
+    Gera (seq, descricao, glossario, textos) para indexação, com os textos
+    HTML de cada fundamento convertidos para texto plano.
+    """
+    filtro = ''
+    params = []
+    if seqs is not None:
+        seqs = list(seqs)
+        if not seqs:
+            return
+        filtro = f" WHERE {{coluna}} IN ({', '.join(['%s'] * len(seqs))})"
+        params = seqs
+
+    textos = {}
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT fundamento_id, legislacao, texto_html FROM {TABELA_TEXTOS}"
+            + filtro.format(coluna='fundamento_id') + " ORDER BY id",
+            params,
+        )
+        for seq, legislacao, texto_html in cursor.fetchall():
+            partes = textos.setdefault(seq, [])
+            if legislacao:
+                partes.append(legislacao)
+            partes.append(texto_plano(texto_html))
+
+        cursor.execute(
+            f"SELECT seq, descricao, glossario FROM {TABELA_FUNDAMENTOS}"
+            + filtro.format(coluna='seq'),
+            params,
+        )
+        for seq, descricao, glossario in cursor.fetchall():
+            yield seq, descricao or '', glossario or '', ' '.join(textos.get(seq, []))
+
+
+class BuscaSimples:
+    """Busca por icontains, sem índice e sem ordenação por relevância"""
+
+    def disponivel(self):
+        return True
+
+    def buscar(self, queryset, termo):
+        return queryset.filter(
+            Q(descricao__icontains=termo) |
+            Q(glossario__icontains=termo)
+        )
+
+    def reindexar(self, seqs=None):
+        return 0
+
+
+class BuscaSQLite(BuscaSimples):
+    """Tabela FTS5 espelhando os fundamentos, ordenada por bm25"""
+
+    # Pesos do bm25 para descricao, glossario e textos
+    pesos = (10.0, 4.0, 1.0)
+
+    def disponivel(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s",
+                [TABELA_FTS],
+            )
+            return cursor.fetchone() is not None
+
+    def consulta_fts(self, termo):
+        return ' '.join(f'"{palavra}"*' for palavra in termos_da_consulta(termo))
+
+    def buscar(self, queryset, termo):
+        consulta = self.consulta_fts(termo)
+        if not consulta:
+            return queryset.none()
+        pesos = ', '.join(str(peso) for peso in self.pesos)
+        return queryset.filter(
+            seq__in=RawSQL(
+                f"SELECT rowid FROM {TABELA_FTS} WHERE {TABELA_FTS} MATCH %s",
+                [consulta],
+            )
+        ).annotate(
+            relevancia=RawSQL(
+                f"SELECT -bm25({TABELA_FTS}, {pesos}) FROM {TABELA_FTS} "
+                f"WHERE {TABELA_FTS} MATCH %s AND rowid = {TABELA_FUNDAMENTOS}.seq",
+                [consulta],
+            )
+        ).order_by('-relevancia', 'seq')
+
+    def reindexar(self, seqs=None):
+        if seqs is not None:
+            seqs = list(seqs)
+        documentos = list(documentos_busca(seqs))
+        with connection.cursor() as cursor:
+            if seqs is None:
+                cursor.execute(f"DELETE FROM {TABELA_FTS}")
+            else:
+                cursor.executemany(
+                    f"DELETE FROM {TABELA_FTS} WHERE rowid = %s",
+                    [(seq,) for seq in seqs],
+                )
+            cursor.executemany(
+                f"INSERT INTO {TABELA_FTS} (rowid, descricao, glossario, textos) "
+                f"VALUES (%s, %s, %s, %s)",
+                documentos,
+            )
+        return len(documentos)
+
+
+class BuscaPostgres(BuscaSimples):
+    """Coluna busca_vetor (tsvector sem acentos) com índice GIN, ordenada por ts_rank"""
+
+    def disponivel(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM information_schema.columns "
+                "WHERE table_name = %s AND column_name = 'busca_vetor'",
+                [TABELA_FUNDAMENTOS],
+            )
+            return cursor.fetchone() is not None
+
+    def consulta_ts(self, termo):
+        return ' & '.join(f'{palavra}:*' for palavra in termos_da_consulta(termo))
+
+    def buscar(self, queryset, termo):
+        consulta = self.consulta_ts(termo)
+        if not consulta:
+            return queryset.none()
+        return queryset.filter(
+            seq__in=RawSQL(
+                f"SELECT seq FROM {TABELA_FUNDAMENTOS} "
+                f"WHERE busca_vetor @@ to_tsquery('{CONFIGURACAO_PG}', %s)",
+                [consulta],
+            )
+        ).annotate(
+            relevancia=RawSQL(
+                f"ts_rank({TABELA_FUNDAMENTOS}.busca_vetor, to_tsquery('{CONFIGURACAO_PG}', %s))",
+                [consulta],
+            )
+        ).order_by('-relevancia', 'seq')
+
+    tabela_carga = 'fundamentos_busca_carga'
+
+    def reindexar(self, seqs=None):
+        if copy_disponivel():
+            return self.reindexar_copy(seqs)
+        documentos = [
+            (descricao, glossario, textos, seq)
+            for seq, descricao, glossario, textos in documentos_busca(seqs)
+        ]
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"UPDATE {TABELA_FUNDAMENTOS} SET busca_vetor = "
+                f"setweight(to_tsvector('{CONFIGURACAO_PG}', %s), 'A') || "
+                f"setweight(to_tsvector('{CONFIGURACAO_PG}', %s), 'B') || "
+                f"setweight(to_tsvector('{CONFIGURACAO_PG}', %s), 'C') "
+                f"WHERE seq = %s",
+                documentos,
+            )
+        return len(documentos)
+
+    def reindexar_copy(self, seqs=None):
+        """
+        Envia os documentos por COPY a uma tabela temporária e recalcula
+        busca_vetor de todos eles em um único UPDATE ... FROM.
+        """
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {self.tabela_carga}")
+            cursor.execute(
+                f"CREATE TEMPORARY TABLE {self.tabela_carga} "
+                f"(seq integer, descricao text, glossario text, textos text)"
+            )
+            total = copiar(
+                cursor, self.tabela_carga, ('seq', 'descricao', 'glossario', 'textos'),
+                documentos_busca(seqs),
+            )
+            cursor.execute(
+                f"UPDATE {TABELA_FUNDAMENTOS} AS f SET busca_vetor = "
+                f"setweight(to_tsvector('{CONFIGURACAO_PG}', c.descricao), 'A') || "
+                f"setweight(to_tsvector('{CONFIGURACAO_PG}', c.glossario), 'B') || "
+                f"setweight(to_tsvector('{CONFIGURACAO_PG}', c.textos), 'C') "
+                f"FROM {self.tabela_carga} AS c WHERE f.seq = c.seq"
+            )
+            cursor.execute(f"DROP TABLE {self.tabela_carga}")
+        return total
+
+
+BACKENDS_POR_BANCO = {
+    'sqlite': BuscaSQLite,
+    'postgresql': BuscaPostgres,
+}
+
+_backend = None
+
+
+def obter_backend():
+    """Backend configurado, ou o do banco em uso se o índice estiver criado"""
+    global _backend
+    if _backend is None:
+        caminho = getattr(settings, 'FUNDAMENTOS_BUSCA_BACKEND', 'auto')
+        if caminho != 'auto':
+            backend = import_string(caminho)()
+        else:
+            backend = BACKENDS_POR_BANCO.get(connection.vendor, BuscaSimples)()
+            if not backend.disponivel():
+                backend = BuscaSimples()
+        _backend = backend
+    return _backend
+
+
+def reindexar(seqs=None):
+    """Sincroniza o índice de busca para os seqs informados (todos, se None)"""
+    return obter_backend().reindexar(seqs)
+
+
+class BuscaTextualFilter(filters.SearchFilter):
+    """SearchFilter (?search=) delegado ao backend de busca"""
+
+    def filter_queryset(self, request, queryset, view):
+        termo = request.query_params.get(self.search_param, '').strip()
+        if not termo:
+            return queryset
+        return obter_backend().buscar(queryset, termo)
+
+
+class OrdenacaoFilter(filters.OrderingFilter):
+    """OrderingFilter que preserva a ordem por relevância de uma busca"""
+
+    def get_default_ordering(self, view):
+        if view.request.query_params.get(BuscaTextualFilter.search_param, '').strip():
+            return None
+        return super().get_default_ordering(view)
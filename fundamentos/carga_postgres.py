@@ -0,0 +1,190 @@
+"""
+Carga em massa no PostgreSQL com COPY (importar_fundamentos --carga copy,
+escolhida automaticamente quando o banco é PostgreSQL com psycopg2).
+
+- As linhas são enviadas com COPY FROM STDIN (copy_expert), em lotes, para
+  tabelas de staging UNLOGGED, sem WAL e sem índices.
+- Das tabelas de staging, um INSERT ... SELECT ... ON CONFLICT grava os
+  fundamentos e um INSERT ... SELECT os textos, com as FKs verificadas só
+  no commit (SET CONSTRAINTS ALL DEFERRED).
+- Na carga completa com --suspender-indices, indices_suspensos() remove os
+  índices secundários das duas tabelas e os recria uma única vez ao final.
+  DROP INDEX toma ACCESS EXCLUSIVE nas tabelas até o commit: a API fica
+  bloqueada durante toda a importação, por isso é opcional. Sem ela, a carga
+  só toma ROW EXCLUSIVE e as leituras continuam vendo a versão anterior.
+"""
+import io
+from contextlib import contextmanager
+from datetime import date, datetime
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import FundamentoLegal, TextoFundamento
+
+TABELA_FUNDAMENTOS = FundamentoLegal._meta.db_table
+TABELA_TEXTOS = TextoFundamento._meta.db_table
+STAGING_FUNDAMENTOS = 'fundamentos_carga_fundamento'
+STAGING_TEXTOS = 'fundamentos_carga_texto'
+
+COLUNAS_TEXTO = ('fundamento_id', 'legislacao', 'texto_html')
+
+# Escape do formato texto do COPY: barra invertida, tabulação e fins de linha
+ESCAPE_COPY = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+
+
+def copy_disponivel():
+    """Banco PostgreSQL acessado por psycopg2 (copy_expert)"""
+    if connection.vendor != 'postgresql':
+        return False
+    from django.db.backends.postgresql.psycopg_any import is_psycopg3
+
+    return not is_psycopg3
+
+
+def _q(nome):
+    return connection.ops.quote_name(nome)
+
+
+def valor_copy(valor):
+    if valor is None:
+        return '\\N'
+    if valor is True:
+        return 't'
+    if valor is False:
+        return 'f'
+    if isinstance(valor, (date, datetime)):
+        return valor.isoformat()
+    return str(valor).translate(ESCAPE_COPY)
+
+
+def copiar(cursor, tabela, colunas, linhas, tamanho_lote=1000):
+    """
+    Envia as linhas (tuplas na ordem de colunas) com COPY FROM STDIN, um
+    COPY por lote de tamanho_lote. Retorna o total de linhas.
+    """
+    sql = f"COPY {_q(tabela)} ({', '.join(map(_q, colunas))}) FROM STDIN"
+    total = 0
+    buffer = io.StringIO()
+    pendentes = 0
+    for linha in linhas:
+        buffer.write('\t'.join(map(valor_copy, linha)))
+        buffer.write('\n')
+        pendentes += 1
+        if pendentes >= tamanho_lote:
+            buffer.seek(0)
+            cursor.copy_expert(sql, buffer)
+            total += pendentes
+            buffer = io.StringIO()
+            pendentes = 0
+    if pendentes:
+        buffer.seek(0)
+        cursor.copy_expert(sql, buffer)
+        total += pendentes
+    return total
+
+
+def _criar_staging(cursor):
+    cursor.execute(
+        f"CREATE UNLOGGED TABLE IF NOT EXISTS {_q(STAGING_FUNDAMENTOS)} "
+        f"(LIKE {_q(TABELA_FUNDAMENTOS)})"
+    )
+    cursor.execute(
+        f"CREATE UNLOGGED TABLE IF NOT EXISTS {_q(STAGING_TEXTOS)} "
+        f"(ordem bigserial, fundamento_id integer, legislacao varchar(255), texto_html text)"
+    )
+    cursor.execute(f"TRUNCATE {_q(STAGING_FUNDAMENTOS)}, {_q(STAGING_TEXTOS)} RESTART IDENTITY")
+
+
+def _remover_staging(cursor):
+    cursor.execute(f"DROP TABLE IF EXISTS {_q(STAGING_FUNDAMENTOS)}, {_q(STAGING_TEXTOS)}")
+
+
+def gravar(fundamentos, campos_atualizados, textos, seqs_textos, tamanho_lote=1000):
+    """
+    Equivalente por COPY a bulk_create(update_conflicts=True) dos fundamentos
+    (atualizando campos_atualizados quando o seq já existe) seguido da
+    substituição dos textos dos seqs em seqs_textos por textos, um iterável
+    de (fundamento_id, legislacao, texto_html), ou None para manter os
+    textos. Retorna o número de textos gravados.
+    """
+    campos = FundamentoLegal._meta.concrete_fields
+    colunas = [campo.column for campo in campos]
+    atualizadas = [FundamentoLegal._meta.get_field(nome).column for nome in campos_atualizados]
+    agora = timezone.now()
+
+    def linhas_fundamentos():
+        for fundamento in fundamentos:
+            fundamento.criado_em = fundamento.atualizado_em = agora
+            yield tuple(getattr(fundamento, campo.attname) for campo in campos)
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute("SET CONSTRAINTS ALL DEFERRED")
+        _criar_staging(cursor)
+
+        copiar(cursor, STAGING_FUNDAMENTOS, colunas, linhas_fundamentos(), tamanho_lote)
+        lista = ', '.join(map(_q, colunas))
+        cursor.execute(
+            f"INSERT INTO {_q(TABELA_FUNDAMENTOS)} ({lista}) "
+            f"SELECT {lista} FROM {_q(STAGING_FUNDAMENTOS)} "
+            f"ON CONFLICT ({_q('seq')}) DO UPDATE SET "
+            + ', '.join(f'{_q(coluna)} = EXCLUDED.{_q(coluna)}' for coluna in atualizadas)
+        )
+
+        total = 0
+        if textos is not None:
+            if seqs_textos:
+                cursor.execute(
+                    f"DELETE FROM {_q(TABELA_TEXTOS)} WHERE {_q('fundamento_id')} = ANY(%s::integer[])",
+                    [sorted(seqs_textos)],
+                )
+            total = copiar(cursor, STAGING_TEXTOS, COLUNAS_TEXTO, textos, tamanho_lote)
+            lista = ', '.join(map(_q, COLUNAS_TEXTO))
+            cursor.execute(
+                f"INSERT INTO {_q(TABELA_TEXTOS)} ({lista}) "
+                f"SELECT {lista} FROM {_q(STAGING_TEXTOS)} ORDER BY ordem"
+            )
+        _remover_staging(cursor)
+    return total
+
+
+def truncar():
+    """Remove todos os fundamentos e textos (--clear) sem apagar linha a linha"""
+    with connection.cursor() as cursor:
+        # Dentro de uma transação, TRUNCATE falha com verificações de FK pendentes
+        cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+        cursor.execute(f"TRUNCATE {_q(TABELA_TEXTOS)}, {_q(TABELA_FUNDAMENTOS)}")
+
+
+@contextmanager
+def indices_suspensos():
+    """
+    Remove os índices secundários (sem chave primária, unicidade ou
+    restrição associada) de fundamentos e textos e os recria ao sair. Deve
+    ser usado dentro de transaction.atomic(): se a carga falhar, o rollback
+    devolve os índices removidos. Os locks ACCESS EXCLUSIVE do DROP INDEX
+    bloqueiam as leituras das duas tabelas até o commit. Produz os nomes
+    dos índices.
+    """
+    if not connection.in_atomic_block:
+        raise RuntimeError('indices_suspensos() precisa de uma transação')
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT indice.relname, pg_get_indexdef(indice.oid) "
+            "FROM pg_index x JOIN pg_class indice ON indice.oid = x.indexrelid "
+            "WHERE x.indrelid IN (%s::regclass, %s::regclass) "
+            "AND NOT x.indisprimary AND NOT x.indisunique "
+            "AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = x.indexrelid)",
+            [TABELA_FUNDAMENTOS, TABELA_TEXTOS],
+        )
+        indices = cursor.fetchall()
+        for nome, _ in indices:
+            cursor.execute(f"DROP INDEX {_q(nome)}")
+
+    yield [nome for nome, _ in indices]
+
+    with connection.cursor() as cursor:
+        # CREATE INDEX não é aceito com verificações de FK adiadas pendentes
+        cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+        for _, definicao in indices:
+            cursor.execute(definicao)
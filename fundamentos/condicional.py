@@ -0,0 +1,74 @@
+"""
+GET condicional (ETag / Last-Modified) para as leituras da API.
+
+A ETag é forte e derivada da versão dos dados, do caminho com a query string
+normalizada e do Accept (a API também responde em HTML navegável). Como a
+versão é lida do cache compartilhado, If-None-Match / If-Modified-Since são
+respondidos com 304 antes de qualquer consulta aos fundamentos.
+
+Os snapshots pré-comprimidos (br, gzip) são representações diferentes da
+mesma resposta: cada uma tem a sua ETag forte, com a Content-Encoding como
+sufixo (etag_codificada), e responde ao próprio If-None-Match.
+"""
+import hashlib
+from functools import wraps
+from urllib.parse import urlencode
+
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import quote_etag
+from django.views.decorators.http import condition
+
+from .versao import versao_atual
+
+
+def _versao(request):
+    # Lida uma única vez por requisição, para ETag e Last-Modified
+    if not hasattr(request, '_fundamentos_versao'):
+        request._fundamentos_versao = versao_atual()
+    return request._fundamentos_versao
+
+
+def etag_versao(request, *args, **kwargs):
+    versao = _versao(request)
+    if not versao.hash:
+        return None
+    parametros = urlencode(sorted(request.GET.lists()), doseq=True)
+    partes = (versao.hash, request.path, parametros, request.headers.get('Accept', ''))
+    return hashlib.sha256('\n'.join(partes).encode('utf-8')).hexdigest()
+
+
+def etag_codificada(request, codificacao):
+    """ETag (com aspas) da variante da resposta na Content-Encoding codificacao"""
+    etag = etag_versao(request)
+    if etag is None:
+        return None
+    return quote_etag(f'{etag}-{codificacao}' if codificacao else etag)
+
+
+def resposta_304_codificada(request, etag):
+    """304 se If-None-Match contém a ETag da variante comprimida, senão None"""
+    if etag is None or request.method not in ('GET', 'HEAD'):
+        return None
+    return get_conditional_response(request, etag=etag)
+
+
+def ultima_modificacao(request, *args, **kwargs):
+    return _versao(request).atualizado_em
+
+
+def condicional(view):
+    """
+    Aplica ETag/Last-Modified da versão dos dados à view. Os clientes
+    revalidam sempre (no-cache), pagando só o 304 enquanto os dados não mudam.
+    """
+    view_condicional = condition(etag_func=etag_versao, last_modified_func=ultima_modificacao)(view)
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        response = view_condicional(request, *args, **kwargs)
+        if request.method in ('GET', 'HEAD'):
+            patch_vary_headers(response, ['Accept'])
+            patch_cache_control(response, no_cache=True)
+        return response
+
+    return wrapper
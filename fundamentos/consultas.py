@@ -0,0 +1,104 @@
+"""
+Consultas hierárquicas com CTE recursiva (WITH RECURSIVE), suportadas
+tanto pelo SQLite quanto pelo PostgreSQL.
+
+Cada consulta devolve, em uma única ida ao banco, os campos da listagem
+acrescidos de tem_filhos, num_filhos, nivel (absoluto) e profundidade
+(relativa ao fundamento consultado). tem_filhos e num_filhos vêm da coluna
+desnormalizada num_filhos, como nas listagens, sem subconsultas por linha.
+"""
+from django.db import connection
+
+from .models import FundamentoLegal
+
+# Limite de segurança contra ciclos acidentais na coluna pai
+PROFUNDIDADE_MAXIMA = 64
+
+CAMPOS = [
+    'seq', 'descricao', 'tipo_recurso', 'categoria', 'selecionavel', 'pai',
+    'tem_filhos', 'num_filhos', 'nivel', 'profundidade',
+]
+
+
+def _chave_ordenacao(coluna):
+    """Seq com zeros à esquerda, para ordenar irmãos numericamente"""
+    if connection.vendor == 'sqlite':
+        return f"substr('0000000000' || {coluna}, -10)"
+    return f"lpad(CAST({coluna} AS text), 10, '0')"
+
+
+def _sql_descendentes():
+    tabela = FundamentoLegal._meta.db_table
+    chave = _chave_ordenacao('f.seq')
+    return f"""
+        WITH RECURSIVE
+        acima(seq, pai_id, distancia) AS (
+            SELECT seq, pai_id, 0 FROM {tabela} WHERE seq = %s
+            UNION ALL
+            SELECT f.seq, f.pai_id, a.distancia + 1
+            FROM {tabela} f JOIN acima a ON f.seq = a.pai_id
+            WHERE a.distancia < {PROFUNDIDADE_MAXIMA}
+        ),
+        abaixo(seq, profundidade, ordem) AS (
+            SELECT f.seq, 0, {chave} FROM {tabela} f WHERE f.seq = %s
+            UNION ALL
+            SELECT f.seq, a.profundidade + 1, a.ordem || '/' || {chave}
+            FROM {tabela} f JOIN abaixo a ON f.pai_id = a.seq
+            WHERE a.profundidade < %s
+        )
+        SELECT f.seq, f.descricao, f.tipo_recurso, f.categoria, f.selecionavel, f.pai_id,
+               f.num_filhos > 0, f.num_filhos,
+               (SELECT MAX(distancia) FROM acima) + a.profundidade,
+               a.profundidade
+        FROM abaixo a JOIN {tabela} f ON f.seq = a.seq
+        ORDER BY a.ordem
+    """
+
+
+def _sql_ancestrais():
+    tabela = FundamentoLegal._meta.db_table
+    return f"""
+        WITH RECURSIVE acima(seq, pai_id, distancia) AS (
+            SELECT seq, pai_id, 0 FROM {tabela} WHERE seq = %s
+            UNION ALL
+            SELECT f.seq, f.pai_id, a.distancia + 1
+            FROM {tabela} f JOIN acima a ON f.seq = a.pai_id
+            WHERE a.distancia < {PROFUNDIDADE_MAXIMA}
+        )
+        SELECT f.seq, f.descricao, f.tipo_recurso, f.categoria, f.selecionavel, f.pai_id,
+               f.num_filhos > 0, f.num_filhos,
+               (SELECT MAX(distancia) FROM acima) - a.distancia,
+               -a.distancia
+        FROM acima a JOIN {tabela} f ON f.seq = a.seq
+        ORDER BY a.distancia DESC
+    """
+
+
+def _consultar(sql, params):
+    # As respostas precisam de todas as linhas (a árvore é montada e guardada
+    # em cache inteira), então o resultado é lido de uma vez
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        linhas = cursor.fetchall()
+    registros = []
+    for linha in linhas:
+        registro = dict(zip(CAMPOS, linha))
+        registro['selecionavel'] = bool(registro['selecionavel'])
+        registro['tem_filhos'] = bool(registro['tem_filhos'])
+        registros.append(registro)
+    return registros
+
+
+def listar_descendentes(seq, profundidade=None):
+    """
+    Lista com o fundamento seq seguido de seus descendentes, em pré-ordem, até
+    profundidade níveis abaixo dele (todos, se profundidade for None).
+    """
+    if profundidade is None:
+        profundidade = PROFUNDIDADE_MAXIMA
+    return _consultar(_sql_descendentes(), [seq, seq, profundidade])
+
+
+def listar_ancestrais(seq):
+    """Lista dos fundamentos da raiz até seq, inclusive"""
+    return _consultar(_sql_ancestrais(), [seq])
@@ -0,0 +1,65 @@
+"""
+Estatísticas dos fundamentos, calculadas com uma única consulta agregada
+(GROUP BY tipo, categoria e nível com contagens condicionais) e guardadas
+em cache enquanto os dados não mudarem.
+"""
+from django.db.models import Count, Q
+
+from .models import Categoria, FundamentoLegal, TipoRecurso
+from .versao import cache_versionado
+
+CONTADORES = ('total', 'selecionaveis', 'com_glossario', 'raizes')
+
+
+def _contadores_vazios():
+    return dict.fromkeys(CONTADORES, 0)
+
+
+def calcular_estatisticas():
+    linhas = (
+        FundamentoLegal.objects.order_by()
+        .values('tipo_recurso', 'categoria', 'nivel')
+        .annotate(
+            total=Count('seq'),
+            selecionaveis=Count('seq', filter=Q(selecionavel=True)),
+            com_glossario=Count(
+                'seq', filter=Q(glossario__isnull=False) & ~Q(glossario='')
+            ),
+            raizes=Count('seq', filter=Q(pai__isnull=True)),
+        )
+    )
+
+    gerais = _contadores_vazios()
+    por_tipo = {tipo.value: _contadores_vazios() for tipo in TipoRecurso}
+    niveis_por_tipo = {tipo.value: {} for tipo in TipoRecurso}
+    por_categoria = {cat.value: 0 for cat in Categoria}
+    por_nivel = {}
+
+    for linha in linhas:
+        tipo = por_tipo.setdefault(linha['tipo_recurso'], _contadores_vazios())
+        for contador in CONTADORES:
+            gerais[contador] += linha[contador]
+            tipo[contador] += linha[contador]
+        niveis = niveis_por_tipo.setdefault(linha['tipo_recurso'], {})
+        niveis[linha['nivel']] = niveis.get(linha['nivel'], 0) + linha['total']
+        por_categoria[linha['categoria']] = por_categoria.get(linha['categoria'], 0) + linha['total']
+        por_nivel[linha['nivel']] = por_nivel.get(linha['nivel'], 0) + linha['total']
+
+    return {
+        'total': gerais['total'],
+        'por_tipo': {tipo.label: por_tipo[tipo.value]['total'] for tipo in TipoRecurso},
+        'por_categoria': {cat.label: por_categoria[cat.value] for cat in Categoria},
+        'selecionaveis': gerais['selecionaveis'],
+        'com_glossario': gerais['com_glossario'],
+        'raizes': gerais['raizes'],
+        'por_nivel': dict(sorted(por_nivel.items())),
+        'detalhes_por_tipo': {
+            tipo: {**contadores, 'por_nivel': dict(sorted(niveis_por_tipo[tipo].items()))}
+            for tipo, contadores in por_tipo.items()
+        },
+    }
+
+
+def obter_estatisticas():
+    """Estatísticas da versão atual dos dados, calculadas no máximo uma vez por versão"""
+    return cache_versionado('estatisticas', calcular_estatisticas)
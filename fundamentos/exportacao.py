@@ -0,0 +1,73 @@
+"""
+Exportação completa dos fundamentos, com textos, em NDJSON ou CSV.
+
+Os fundamentos são lidos com .iterator(chunk_size), com os textos de cada
+bloco buscados por prefetch, e cada linha é escrita assim que é gerada:
+a memória usada não depende do tamanho da base.
+"""
+import csv
+import json
+
+from django.db.models import Prefetch
+
+from .models import TextoFundamento
+from .renderers import OrjsonRenderer
+
+CAMPOS_EXPORTACAO = (
+    'seq', 'pai', 'descricao', 'glossario', 'tipo_recurso', 'categoria',
+    'neutro', 'informacao', 'justificativa', 'selecionavel', 'nivel',
+    'criado_em', 'atualizado_em',
+)
+
+TAMANHO_BLOCO = 500
+
+
+def registros(queryset, chunk_size=TAMANHO_BLOCO):
+    """Gera um dict por fundamento, em ordem de seq, com a lista de textos"""
+    textos = Prefetch(
+        'textos',
+        queryset=TextoFundamento.objects.order_by('id').only(
+            'fundamento_id', 'legislacao', 'texto_html'
+        ),
+    )
+    queryset = queryset.order_by('seq').prefetch_related(textos)
+    for fundamento in queryset.iterator(chunk_size=chunk_size):
+        registro = {
+            campo: getattr(fundamento, 'pai_id' if campo == 'pai' else campo)
+            for campo in CAMPOS_EXPORTACAO
+        }
+        registro['criado_em'] = registro['criado_em'].isoformat()
+        registro['atualizado_em'] = registro['atualizado_em'].isoformat()
+        registro['textos'] = [
+            {'legislacao': texto.legislacao, 'texto_html': texto.texto_html}
+            for texto in fundamento.textos.all()
+        ]
+        yield registro
+
+
+def gerar_ndjson(queryset):
+    renderer = OrjsonRenderer()
+    for registro in registros(queryset):
+        yield renderer.render(registro) + b'\n'
+
+
+class _Eco:
+    """Arquivo falso: csv.writer devolve a linha em vez de gravá-la"""
+
+    def write(self, valor):
+        return valor
+
+
+def gerar_csv(queryset):
+    """CSV com uma linha por fundamento; os textos vão em uma coluna JSON"""
+    escritor = csv.writer(_Eco())
+    yield escritor.writerow([*CAMPOS_EXPORTACAO, 'textos'])
+    for registro in registros(queryset):
+        textos = json.dumps(registro.pop('textos'), ensure_ascii=False)
+        yield escritor.writerow([*registro.values(), textos])
+
+
+FORMATOS = {
+    'ndjson': (gerar_ndjson, 'application/x-ndjson'),
+    'csv': (gerar_csv, 'text/csv; charset=utf-8'),
+}
@@ -0,0 +1,247 @@
+"""
+Índice em memória da hierarquia de fundamentos legais.
+
+O índice é construído com uma única consulta (seq, pai, descrição) e
+reaproveitado por todo o processo até que a assinatura dos dados mude.
+"""
+import threading
+from collections import namedtuple
+
+from .versao import assinatura_dados
+
+NoHierarquia = namedtuple('NoHierarquia', ['seq', 'descricao'])
+
+
+class ArvoreFundamentos:
+    """
+    Índice somente leitura da hierarquia (pai, filhos, nível, raiz e caminho
+    de cada seq). Filhos e subárvores são mantidos em pré-ordem por seq.
+    """
+
+    def __init__(self, linhas, assinatura=None):
+        self.assinatura = assinatura
+        self._pai = {}
+        self._descricao = {}
+        self._filhos = {}
+
+        for seq, pai_seq, descricao in linhas:
+            self._pai[seq] = pai_seq
+            self._descricao[seq] = descricao
+            self._filhos.setdefault(seq, [])
+
+        raizes = []
+        for seq in sorted(self._pai):
+            pai_seq = self._pai[seq]
+            if pai_seq is None or pai_seq not in self._pai:
+                self._pai[seq] = None
+                raizes.append(seq)
+            else:
+                self._filhos[pai_seq].append(seq)
+        self._filhos = {seq: tuple(filhos) for seq, filhos in self._filhos.items()}
+
+        self._ordem = []
+        self._posicao = {}
+        self._tamanho = {}
+        self._caminho = {}
+        for raiz in raizes:
+            self._percorrer(raiz)
+
+        # Nós presos em ciclos não são alcançados a partir das raízes;
+        # passam a ser tratados como raízes (e deixam de ser filhos do pai
+        # antigo) para que o índice fique completo.
+        for seq in sorted(self._pai):
+            if seq not in self._posicao:
+                antigo = self._pai[seq]
+                self._filhos[antigo] = tuple(f for f in self._filhos[antigo] if f != seq)
+                self._pai[seq] = None
+                self._percorrer(seq)
+
+    def _percorrer(self, raiz):
+        """Visita iterativamente a subárvore de raiz, em pré-ordem"""
+        pilha = [(raiz, (raiz,), False)]
+        while pilha:
+            seq, caminho, fechando = pilha.pop()
+            if fechando:
+                self._tamanho[seq] = len(self._ordem) - self._posicao[seq]
+                continue
+            if seq in self._posicao:
+                continue
+            self._posicao[seq] = len(self._ordem)
+            self._ordem.append(seq)
+            self._caminho[seq] = caminho
+            pilha.append((seq, caminho, True))
+            for filho in reversed(self._filhos[seq]):
+                pilha.append((filho, caminho + (filho,), False))
+
+    def __contains__(self, seq):
+        return seq in self._posicao
+
+    def __len__(self):
+        return len(self._ordem)
+
+    def pai(self, seq):
+        return self._pai[seq]
+
+    def descricao(self, seq):
+        return self._descricao[seq]
+
+    def filhos(self, seq):
+        return self._filhos[seq]
+
+    def nivel(self, seq):
+        return len(self._caminho[seq]) - 1
+
+    def raiz(self, seq):
+        return self._caminho[seq][0]
+
+    def caminho(self, seq):
+        """Seqs da raiz até seq, inclusive"""
+        return self._caminho[seq]
+
+    def ancestrais(self, seq):
+        """Seqs da raiz até o pai de seq"""
+        return self._caminho[seq][:-1]
+
+    def subarvore(self, seq):
+        """Seq e todos os seus descendentes, em pré-ordem"""
+        inicio = self._posicao[seq]
+        return self._ordem[inicio:inicio + self._tamanho[seq]]
+
+    def descendentes(self, seq):
+        return self.subarvore(seq)[1:]
+
+    def num_descendentes(self, seq):
+        return self._tamanho[seq] - 1
+
+    def intervalo(self, seq):
+        """
+        Intervalo (lft, rgt) de seq no conjunto aninhado de toda a floresta:
+        os descendentes de um nó são exatamente os nós com lft dentro dele.
+        """
+        # Antes de entrar em seq já houve posicao entradas e posicao - nivel saídas
+        lft = 2 * self._posicao[seq] - self.nivel(seq) + 1
+        return lft, lft + 2 * self._tamanho[seq] - 1
+
+    def caminho_materializado(self, seq):
+        return '/' + '/'.join(str(s) for s in self._caminho[seq]) + '/'
+
+    def nos_caminho(self, seq):
+        """Caminho de seq com as descrições, para breadcrumbs"""
+        return [NoHierarquia(s, self._descricao[s]) for s in self._caminho[seq]]
+
+
+CAMPOS_NO_ARVORE = ['seq', 'descricao', 'tipo_recurso', 'categoria', 'selecionavel']
+
+
+def montar_arvore(linhas, raizes=None):
+    """
+    Monta em O(n), sem recursão, a estrutura aninhada (children) a partir de
+    linhas já ordenadas com os campos de CAMPOS_NO_ARVORE e 'pai'.
+
+    Sem raizes explícitas, são raízes as linhas sem pai. Linhas cujo pai não
+    foi carregado e que não são raízes ficam de fora.
+    """
+    nos = {}
+    pais = []
+    for linha in linhas:
+        no = {campo: linha[campo] for campo in CAMPOS_NO_ARVORE}
+        no['children'] = []
+        nos[no['seq']] = no
+        pais.append((no, linha['pai']))
+
+    if raizes is None:
+        raizes = [no['seq'] for no, pai in pais if pai is None]
+    raizes = set(raizes)
+
+    for no, pai in pais:
+        if no['seq'] not in raizes and pai in nos:
+            nos[pai]['children'].append(no)
+    return [no for no, _ in pais if no['seq'] in raizes]
+
+
+def linhas_arvore(tipo=None, profundidade=None, modelo=None):
+    """
+    Linhas para montar_arvore: as raízes do tipo (todas, sem tipo) e as
+    subárvores inteiras delas, pelo intervalo lft/rgt. Um filho cadastrado
+    em outro tipo continua sob o pai, como na árvore completa.
+    """
+    if modelo is None:
+        from .models import FundamentoLegal as modelo
+    from django.db.models import Exists, OuterRef
+
+    queryset = modelo.objects.order_by('tipo_recurso', 'seq')
+    if tipo:
+        raizes = modelo.objects.filter(
+            pai__isnull=True, tipo_recurso=tipo,
+            lft__lte=OuterRef('lft'), rgt__gte=OuterRef('rgt'),
+        )
+        queryset = queryset.filter(Exists(raizes))
+    if profundidade is not None:
+        queryset = queryset.filter(nivel__lte=profundidade)
+    return queryset.values(*CAMPOS_NO_ARVORE, 'pai')
+
+
+_lock = threading.Lock()
+_arvore = None
+
+
+def construir_arvore(assinatura=None, modelo=None):
+    if modelo is None:
+        from .models import FundamentoLegal as modelo
+
+    linhas = modelo.objects.order_by().values_list('seq', 'pai_id', 'descricao')
+    return ArvoreFundamentos(linhas, assinatura=assinatura)
+
+
+def obter_arvore():
+    """Retorna o índice do processo, reconstruindo-o se os dados mudaram"""
+    global _arvore
+    assinatura = assinatura_dados()
+    arvore = _arvore
+    if arvore is None or arvore.assinatura != assinatura:
+        with _lock:
+            if _arvore is None or _arvore.assinatura != assinatura:
+                _arvore = construir_arvore(assinatura)
+            arvore = _arvore
+    return arvore
+
+
+def invalidar_arvore():
+    global _arvore
+    with _lock:
+        _arvore = None
+
+
+COLUNAS_HIERARQUIA = [
+    'caminho_materializado', 'nivel', 'lft', 'rgt', 'num_filhos', 'num_descendentes',
+]
+
+
+def recalcular_hierarquia(modelo=None, batch_size=500):
+    """
+    Recalcula em uma passada as colunas desnormalizadas da hierarquia e grava
+    apenas as linhas que mudaram. Retorna o número de linhas atualizadas.
+    """
+    if modelo is None:
+        from .models import FundamentoLegal as modelo
+
+    arvore = construir_arvore(modelo=modelo)
+    alterados = []
+    for fundamento in modelo.objects.order_by().only('seq', *COLUNAS_HIERARQUIA):
+        seq = fundamento.seq
+        lft, rgt = arvore.intervalo(seq)
+        valores = {
+            'caminho_materializado': arvore.caminho_materializado(seq),
+            'nivel': arvore.nivel(seq),
+            'lft': lft,
+            'rgt': rgt,
+            'num_filhos': len(arvore.filhos(seq)),
+            'num_descendentes': arvore.num_descendentes(seq),
+        }
+        if any(getattr(fundamento, campo) != valor for campo, valor in valores.items()):
+            for campo, valor in valores.items():
+                setattr(fundamento, campo, valor)
+            alterados.append(fundamento)
+
+    modelo.objects.bulk_update(alterados, COLUNAS_HIERARQUIA, batch_size=batch_size)
+    return len(alterados)
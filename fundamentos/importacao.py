@@ -0,0 +1,320 @@
+"""
+Leitura dos arquivos de fundamentos do STJ (CSV separado por '#').
+
+ler_fundamentos() usa o módulo csv da biblioteca padrão e gera um
+RegistroFundamento por linha, sem carregar o arquivo inteiro.
+ler_fundamentos_pandas() produz os mesmos registros com pandas, que é
+opcional (importar_fundamentos --leitor pandas). Com um Reparador
+(fundamentos.reparo), as linhas são reparadas à medida que são lidas.
+
+ler_arquivos() lê e valida cada arquivo em um processo separado
+(importar_fundamentos --jobs N); o resultado só contém tuplas, que o
+comando junta e grava de uma vez.
+"""
+import csv
+import hashlib
+import io
+import re
+import time
+from collections import Counter, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+
+from .models import Categoria
+from .reparo import Reparador
+
+SEPARADOR = '#'
+
+# Mapeamento de tipos de recurso para arquivos
+ARQUIVOS = {
+    'AFIRE': 'AFIRE_202505141514.csv',
+    'AFIPO_RESP': 'AFIPO_(REsp_e AREsp)_202505141515.csv',
+    'AFIPO_RMS': 'AFIPO_(RMS)_202505141515.csv',
+    'AFIREQ': 'AFIREQ_202505141516.csv',
+}
+ARQUIVO_TEXTOS = 'texto_fundamentos.txt'
+
+COLUNAS_OBRIGATORIAS = ('SEQ_FUNDAMENTO_LEGAL', 'DESCRICAO')
+
+RegistroFundamento = namedtuple('RegistroFundamento', [
+    'seq', 'pai_seq', 'descricao', 'glossario', 'tipo_recurso', 'categoria',
+    'neutro', 'informacao', 'justificativa', 'selecionavel',
+])
+
+# linha: número da linha do arquivo em que o registro começa
+RegistroTexto = namedtuple('RegistroTexto', ['seq', 'legislacao', 'texto_html', 'linha'])
+Rejeicao = namedtuple('Rejeicao', ['linha', 'motivo', 'conteudo'])
+
+# Início de um registro de texto: SEQ seguido de tabulação
+INICIO_TEXTO = re.compile(r'^\d+\s*\t')
+
+# Resultado da leitura de um arquivo: registros, avisos de validação,
+# duração, linhas rejeitadas e correções de encoding por tipo
+Leitura = namedtuple(
+    'Leitura', ['registros', 'avisos', 'segundos', 'rejeitados', 'correcoes'],
+    defaults=((), {}),
+)
+
+
+def categoria_da_descricao(descricao):
+    desc_upper = descricao.upper()
+    if 'CÍVEL' in desc_upper or 'CIVEL' in desc_upper:
+        return Categoria.CIVEL.value
+    if 'CRIMINAL' in desc_upper:
+        return Categoria.CRIMINAL.value
+    return Categoria.GERAL.value
+
+
+def registro_da_linha(linha, tipo_recurso):
+    """
+    Converte uma linha (dict coluna -> texto, vazios como '') em
+    RegistroFundamento, ou None se o seq não for numérico.
+    """
+    try:
+        seq = int(linha['SEQ_FUNDAMENTO_LEGAL'])
+    except (ValueError, KeyError):
+        return None
+
+    pai_seq = None
+    if linha.get('SEQ_FUNDAMENTO_LEGAL_PAI', '').strip():
+        try:
+            pai_seq = int(linha['SEQ_FUNDAMENTO_LEGAL_PAI'])
+        except ValueError:
+            pai_seq = None
+
+    descricao = linha.get('DESCRICAO', '').strip()
+    return RegistroFundamento(
+        seq=seq,
+        pai_seq=pai_seq,
+        descricao=descricao,
+        glossario=linha.get('GLOSSARIO', '').strip() or None,
+        tipo_recurso=tipo_recurso,
+        categoria=categoria_da_descricao(descricao),
+        # Campos específicos do AFIRE
+        neutro=linha.get('NEUTRO', 'N') == 'S',
+        informacao=linha.get('INFORMACAO', 'N') == 'S',
+        justificativa=linha.get('JUSTIFICATIVA', 'N') == 'S',
+        selecionavel=linha.get('SELECIONAVEL', 'S') == 'S',
+    )
+
+
+def colunas_ausentes(colunas):
+    faltando = [coluna for coluna in COLUNAS_OBRIGATORIAS if coluna not in colunas]
+    if faltando:
+        return f"colunas obrigatórias ausentes: {', '.join(faltando)}"
+    return None
+
+
+def registros_csv(linhas, tipo_recurso, rejeitados=None):
+    """
+    Gera os registros das linhas do CSV. O cabeçalho sem as colunas
+    obrigatórias e as linhas descartadas (sem SEQ numérico, como as
+    continuações de um campo com quebra de linha sem aspas) vão para
+    rejeitados como Rejeicao(linha, motivo, conteudo); a linha 1 é o cabeçalho.
+    """
+    leitor = csv.reader(linhas, delimiter=SEPARADOR)
+    colunas = next(leitor, None)
+    if colunas is None:
+        if rejeitados is not None:
+            rejeitados.append(Rejeicao(1, 'arquivo vazio', ''))
+        return
+    if rejeitados is not None and (motivo := colunas_ausentes(colunas)):
+        rejeitados.append(Rejeicao(1, motivo, SEPARADOR.join(colunas)[:200]))
+    for valores in leitor:
+        if not valores:
+            continue
+        linha = dict(zip(colunas, valores))
+        registro = registro_da_linha(linha, tipo_recurso)
+        if registro is not None:
+            yield registro
+        elif rejeitados is not None:
+            rejeitados.append(Rejeicao(
+                leitor.line_num, 'SEQ ausente ou não numérico', SEPARADOR.join(valores)[:200]
+            ))
+
+
+def ler_fundamentos(caminho, tipo_recurso, reparador=None, rejeitados=None):
+    """Gera os registros do arquivo, uma linha por vez (reparadas, com reparador)"""
+    if reparador is not None:
+        yield from registros_csv(reparador.linhas(caminho), tipo_recurso, rejeitados)
+        return
+    with open(caminho, encoding='utf-8', newline='') as arquivo:
+        yield from registros_csv(arquivo, tipo_recurso, rejeitados)
+
+
+def ler_fundamentos_pandas(caminho, tipo_recurso, reparador=None, rejeitados=None):
+    """Mesmos registros de ler_fundamentos(), lidos com pandas"""
+    import pandas as pd
+
+    if reparador is not None:
+        caminho = io.StringIO(''.join(reparador.linhas(caminho)))
+    df = pd.read_csv(caminho, sep=SEPARADOR, encoding='utf-8', dtype=str)
+    df = df.fillna('')
+    if rejeitados is not None and (motivo := colunas_ausentes(df.columns)):
+        rejeitados.append(Rejeicao(1, motivo, SEPARADOR.join(df.columns)[:200]))
+    # Sem quebras de linha dentro de campos, o registro i está na linha i + 2
+    for numero, linha in enumerate(df.to_dict('records'), start=2):
+        registro = registro_da_linha(linha, tipo_recurso)
+        if registro is not None:
+            yield registro
+        elif rejeitados is not None:
+            rejeitados.append(Rejeicao(
+                numero, 'SEQ ausente ou não numérico', SEPARADOR.join(linha.values())[:200]
+            ))
+
+
+LEITORES = {
+    'csv': ler_fundamentos,
+    'pandas': ler_fundamentos_pandas,
+}
+
+
+def hash_valores(valores):
+    return hashlib.sha1(repr(tuple(valores)).encode('utf-8')).hexdigest()
+
+
+class HashSequencia:
+    """
+    hash_valores() de uma sequência recebida item a item: o SHA-1 é
+    alimentado com o repr da tupla em partes, sem guardar os itens.
+    """
+
+    def __init__(self):
+        self.sha = hashlib.sha1(b'(')
+        self.itens = 0
+
+    def update(self, valor):
+        prefixo = ', ' if self.itens else ''
+        self.sha.update((prefixo + repr(valor)).encode('utf-8'))
+        self.itens += 1
+
+    def hexdigest(self):
+        sha = self.sha.copy()
+        sha.update(b',)' if self.itens == 1 else b')')
+        return sha.hexdigest()
+
+
+def linhas_utf8(caminho):
+    """Gera (linha, erro) de cada linha do arquivo, decodificada como UTF-8 estrito"""
+    with open(caminho, 'rb') as arquivo:
+        for numero, bruta in enumerate(arquivo, start=1):
+            try:
+                yield bruta.decode('utf-8'), None
+            except UnicodeDecodeError as excecao:
+                yield (bruta.decode('utf-8', 'backslashreplace'),
+                       f'UTF-8 inválido na linha {numero}, byte {excecao.start + 1}')
+
+
+def ler_textos(caminho, rejeitados=None, reparador=None):
+    """
+    Gera um RegistroTexto por registro de texto_fundamentos.txt (SEQ,
+    legislação e HTML separados por tabulação). Um registro começa na linha
+    que casa com INICIO_TEXTO; as linhas seguintes que não casam continuam
+    o HTML. O arquivo é lido linha a linha e cada linha é decodificada como
+    UTF-8 estrito (ou reparada, com reparador): registros inválidos vão
+    para rejeitados como Rejeicao(linha, motivo, conteudo).
+    """
+    def rejeitar(linha, motivo, conteudo=''):
+        if rejeitados is not None:
+            rejeitados.append(Rejeicao(linha, motivo, conteudo[:200]))
+
+    def registro(inicio, partes, erro):
+        if erro:
+            rejeitar(inicio, erro, partes[0] if partes else '')
+            return None
+        campos = '\n'.join(partes).split('\t', 2)
+        if len(campos) < 3:
+            rejeitar(inicio, f'esperados 3 campos separados por tabulação, há {len(campos)}', campos[0])
+            return None
+        return RegistroTexto(int(campos[0]), campos[1].strip(), campos[2].strip(), inicio)
+
+    if reparador is not None:
+        linhas = ((linha, None) for linha in reparador.linhas(caminho))
+    else:
+        linhas = linhas_utf8(caminho)
+    next(linhas, None)  # cabeçalho
+
+    inicio, partes, erro = None, [], None
+    for numero, (linha, motivo) in enumerate(linhas, start=2):
+        linha = linha.rstrip('\r\n')
+        if INICIO_TEXTO.match(linha):
+            if inicio is not None and (texto := registro(inicio, partes, erro)):
+                yield texto
+            inicio, partes, erro = numero, [linha], motivo
+        elif inicio is not None:
+            partes.append(linha)
+            erro = erro or motivo
+        elif linha.strip():
+            rejeitar(numero, motivo or 'linha fora de um registro (sem SEQ no início)', linha)
+
+    if inicio is not None and (texto := registro(inicio, partes, erro)):
+        yield texto
+
+
+def avisos_fundamentos(registros, rejeitados=()):
+    """Avisos de validação dos registros lidos de um CSV e das linhas descartadas"""
+    avisos = [
+        f'seq {seq} repetido {vezes} vezes (vale a última linha)'
+        for seq, vezes in Counter(r.seq for r in registros).items() if vezes > 1
+    ]
+    avisos.extend(
+        f'seq {r.seq} indica a si mesmo como pai' for r in registros if r.pai_seq == r.seq
+    )
+    avisos.extend(f'linha {r.linha}: {r.motivo}' for r in rejeitados if r.linha == 1)
+    descartadas = [r.linha for r in rejeitados if r.linha > 1]
+    if descartadas:
+        avisos.append(
+            f'{len(descartadas)} linhas descartadas (SEQ ausente ou não numérico): '
+            + ', '.join(map(str, descartadas[:20])) + (', ...' if len(descartadas) > 20 else '')
+        )
+    return avisos
+
+
+def ler_arquivo_fundamentos(caminho, tipo_recurso, leitor='csv', reparar=False):
+    """Lê e valida um CSV de fundamentos (seqs repetidos, pai igual ao próprio seq)"""
+    inicio = time.perf_counter()
+    reparador = Reparador() if reparar else None
+    rejeitados = []
+    registros = list(LEITORES[leitor](caminho, tipo_recurso, reparador, rejeitados))
+    avisos = avisos_fundamentos(registros, rejeitados)
+    correcoes = dict(reparador.contagem) if reparar else {}
+    return Leitura(registros, avisos, time.perf_counter() - inicio, (), correcoes)
+
+
+def ler_arquivo_textos(caminho, reparar=False):
+    """
+    Primeira passada em texto_fundamentos.txt: só o hash dos textos de cada
+    seq e as linhas onde eles começam ({seq: (hash, [linhas])}). Os HTMLs
+    são lidos de novo, em lotes, na gravação.
+    """
+    inicio = time.perf_counter()
+    reparador = Reparador() if reparar else None
+    rejeitados = []
+    hashes = {}
+    linhas = {}
+    for texto in ler_textos(caminho, rejeitados, reparador):
+        if texto.seq not in hashes:
+            hashes[texto.seq] = HashSequencia()
+            linhas[texto.seq] = []
+        hashes[texto.seq].update((texto.legislacao, texto.texto_html))
+        linhas[texto.seq].append(texto.linha)
+    registros = {seq: (sha.hexdigest(), linhas[seq]) for seq, sha in hashes.items()}
+    correcoes = dict(reparador.contagem) if reparar else {}
+    return Leitura(registros, [], time.perf_counter() - inicio, rejeitados, correcoes)
+
+
+def ler_arquivos(tarefas, jobs=1):
+    """
+    Executa as leituras {nome: (função, *args)} e devolve {nome: Leitura},
+    na mesma ordem. Com jobs > 1, cada arquivo é lido em um processo do pool.
+    """
+    if jobs <= 1 or len(tarefas) <= 1:
+        return {nome: funcao(*args) for nome, (funcao, *args) in tarefas.items()}
+    # django.setup: os processos iniciados com spawn precisam carregar os apps
+    with ProcessPoolExecutor(max_workers=min(jobs, len(tarefas)),
+                             initializer=django.setup) as executor:
+        futuros = {
+            nome: executor.submit(funcao, *args) for nome, (funcao, *args) in tarefas.items()
+        }
+        return {nome: futuro.result() for nome, futuro in futuros.items()}
@@ -0,0 +1,236 @@
+"""
+Índice invertido em memória com ranqueamento BM25F.
+
+Indexa descrição, glossário, legislação e o texto plano dos textos HTML de
+cada fundamento, com tokenização em português (sem acentos e sem palavras
+vazias) e pesos por campo. O índice é construído no primeiro uso em cada
+processo, ou carregado do arquivo gerado por importar_fundamentos
+(FUNDAMENTOS_INDICE_ARQUIVO) quando este corresponde aos dados atuais.
+"""
+import bisect
+import math
+import os
+import pickle
+import re
+import threading
+import unicodedata
+
+from django.conf import settings
+
+from .versao import assinatura_dados
+
+# Pesos de cada campo no BM25F
+CAMPOS_INDICE = {
+    'descricao': 3.0,
+    'glossario': 1.5,
+    'legislacao': 1.0,
+    'texto': 1.0,
+}
+
+K1 = 1.2
+B = 0.75
+
+STOPWORDS = frozenset("""
+    a ao aos as ate com como da das de dela dele deles do dos e ela elas ele
+    eles em entre era essa esse esta este eu foi for ha isso isto ja la lhe
+    mais mas me mesmo na nao nas nem no nos num numa o os ou para pela pelas
+    pelo pelos por qual quando que se sem ser seu seus sob sobre sua suas tambem
+    te tem ter um uma umas uns
+""".split())
+
+_palavra = re.compile(r'\w+')
+
+
+def normalizar(texto):
+    """Minúsculas e sem acentos"""
+    decomposto = unicodedata.normalize('NFKD', (texto or '').lower())
+    return ''.join(c for c in decomposto if not unicodedata.combining(c))
+
+
+def palavras(texto):
+    """Palavras normalizadas, na ordem do texto"""
+    return _palavra.findall(normalizar(texto))
+
+
+def tokenizar(texto):
+    return [termo for termo in palavras(texto) if termo not in STOPWORDS]
+
+
+class IndiceInvertido:
+    """
+    Listas invertidas termo -> [(documento, peso BM25F)], com o peso de cada
+    documento já normalizado pelo tamanho dos campos.
+    """
+
+    def __init__(self, documentos, assinatura=None):
+        self.assinatura = assinatura
+        self.seqs = []
+        self.filtros = []
+        frequencias = []
+        tamanhos = {campo: 0 for campo in CAMPOS_INDICE}
+
+        for documento in documentos:
+            self.seqs.append(documento['seq'])
+            self.filtros.append((documento['tipo_recurso'], documento['categoria']))
+            por_campo = {}
+            for campo in CAMPOS_INDICE:
+                termos = tokenizar(documento.get(campo))
+                tamanhos[campo] += len(termos)
+                contagem = {}
+                for termo in termos:
+                    contagem[termo] = contagem.get(termo, 0) + 1
+                por_campo[campo] = (len(termos), contagem)
+            frequencias.append(por_campo)
+
+        total = len(self.seqs) or 1
+        medias = {campo: (tamanhos[campo] / total) or 1.0 for campo in CAMPOS_INDICE}
+
+        listas = {}
+        for doc, por_campo in enumerate(frequencias):
+            pesos = {}
+            for campo, (tamanho, contagem) in por_campo.items():
+                normalizacao = 1 - B + B * tamanho / medias[campo]
+                for termo, tf in contagem.items():
+                    pesos[termo] = pesos.get(termo, 0.0) + CAMPOS_INDICE[campo] * tf / normalizacao
+            for termo, peso in pesos.items():
+                listas.setdefault(termo, []).append((doc, peso))
+
+        self.listas = {}
+        for termo, postagens in listas.items():
+            idf = math.log(1 + (total - len(postagens) + 0.5) / (len(postagens) + 0.5))
+            self.listas[termo] = [
+                (doc, idf * peso * (K1 + 1) / (peso + K1)) for doc, peso in postagens
+            ]
+        self.vocabulario = sorted(self.listas)
+
+    def __len__(self):
+        return len(self.seqs)
+
+    def expandir(self, prefixo, limite=50):
+        """Termos do vocabulário que começam com prefixo"""
+        inicio = bisect.bisect_left(self.vocabulario, prefixo)
+        termos = []
+        for termo in self.vocabulario[inicio:inicio + limite]:
+            if not termo.startswith(prefixo):
+                break
+            termos.append(termo)
+        return termos
+
+    def buscar(self, consulta, tipo=None, categoria=None):
+        """
+        Retorna [(seq, pontuação)] em ordem decrescente de relevância. Todos
+        os termos precisam ocorrer; o último também casa como prefixo.
+        """
+        termos = tokenizar(consulta)
+        if not termos:
+            return []
+
+        pontuacoes = None
+        for posicao, termo in enumerate(termos):
+            variantes = [termo]
+            if posicao == len(termos) - 1:
+                variantes = self.expandir(termo) or variantes
+            parcial = {}
+            for variante in variantes:
+                for doc, peso in self.listas.get(variante, ()):
+                    parcial[doc] = max(parcial.get(doc, 0.0), peso)
+            if pontuacoes is None:
+                pontuacoes = parcial
+            else:
+                pontuacoes = {
+                    doc: pontuacao + parcial[doc]
+                    for doc, pontuacao in pontuacoes.items() if doc in parcial
+                }
+            if not pontuacoes:
+                return []
+
+        resultado = []
+        for doc, pontuacao in pontuacoes.items():
+            tipo_doc, categoria_doc = self.filtros[doc]
+            if tipo and tipo_doc != tipo:
+                continue
+            if categoria and categoria_doc != categoria:
+                continue
+            resultado.append((self.seqs[doc], pontuacao))
+        resultado.sort(key=lambda item: (-item[1], item[0]))
+        return resultado
+
+    def salvar(self, caminho):
+        os.makedirs(os.path.dirname(caminho) or '.', exist_ok=True)
+        temporario = f'{caminho}.tmp'
+        with open(temporario, 'wb') as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporario, caminho)
+
+    @staticmethod
+    def carregar(caminho):
+        with open(caminho, 'rb') as f:
+            return pickle.load(f)
+
+
+def documentos_indice():
+    """Fundamentos com seus textos em texto plano, em duas consultas"""
+    from .busca import texto_plano
+    from .models import FundamentoLegal, TextoFundamento
+
+    legislacoes = {}
+    textos = {}
+    for seq, legislacao, texto_html in TextoFundamento.objects.order_by().values_list(
+        'fundamento_id', 'legislacao', 'texto_html'
+    ):
+        if legislacao:
+            legislacoes.setdefault(seq, []).append(legislacao)
+        textos.setdefault(seq, []).append(texto_plano(texto_html))
+
+    campos = ('seq', 'descricao', 'glossario', 'tipo_recurso', 'categoria')
+    for documento in FundamentoLegal.objects.order_by('seq').values(*campos):
+        seq = documento['seq']
+        documento['legislacao'] = ' '.join(legislacoes.get(seq, []))
+        documento['texto'] = ' '.join(textos.get(seq, []))
+        yield documento
+
+
+def construir_indice(assinatura=None):
+    return IndiceInvertido(documentos_indice(), assinatura=assinatura)
+
+
+def arquivo_indice():
+    return getattr(settings, 'FUNDAMENTOS_INDICE_ARQUIVO', None)
+
+
+def gerar_arquivo_indice():
+    """Constrói o índice dos dados atuais e o grava em FUNDAMENTOS_INDICE_ARQUIVO"""
+    caminho = arquivo_indice()
+    indice = construir_indice(assinatura_dados())
+    if caminho:
+        indice.salvar(caminho)
+    return indice
+
+
+_lock = threading.Lock()
+_indice = None
+
+
+def _carregar_ou_construir(assinatura):
+    caminho = arquivo_indice()
+    if caminho and os.path.exists(caminho):
+        try:
+            indice = IndiceInvertido.carregar(caminho)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            indice = None
+        if indice is not None and indice.assinatura == assinatura:
+            return indice
+    return construir_indice(assinatura)
+
+
+def obter_indice():
+    """Retorna o índice do processo, recarregando-o se os dados mudaram"""
+    global _indice
+    assinatura = assinatura_dados()
+    indice = _indice
+    if indice is None or indice.assinatura != assinatura:
+        with _lock:
+            if _indice is None or _indice.assinatura != assinatura:
+                _indice = _carregar_ou_construir(assinatura)
+            indice = _indice
+    return indice
@@ -0,0 +1,68 @@
+import importlib
+import os
+import sys
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand, CommandError
+
+from fundamentos.importacao import ARQUIVOS, LEITORES
+
+
+class Command(BaseCommand):
+    help = 'Compara tempo e pico de memória dos leitores de CSV de importar_fundamentos'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dir',
+            type=str,
+            default='./data',
+            help='Diretório com os arquivos CSV'
+        )
+        parser.add_argument(
+            '--repeticoes',
+            type=int,
+            default=5,
+            help='Quantas vezes cada arquivo é lido (usa-se o melhor tempo)'
+        )
+
+    def handle(self, *args, **options):
+        arquivos = {
+            tipo: os.path.join(options['dir'], arquivo)
+            for tipo, arquivo in ARQUIVOS.items()
+            if os.path.exists(os.path.join(options['dir'], arquivo))
+        }
+        if not arquivos:
+            raise CommandError(f'Nenhum CSV em {options["dir"]}')
+
+        leitores = dict(LEITORES)
+        if 'pandas' not in sys.modules:
+            inicio = time.perf_counter()
+            try:
+                importlib.import_module('pandas')
+            except ImportError:
+                del leitores['pandas']
+                self.stdout.write(self.style.WARNING('pandas não instalado; leitor omitido.'))
+            else:
+                self.stdout.write(f'import pandas: {(time.perf_counter() - inicio) * 1000:.0f} ms')
+
+        self.stdout.write(
+            f'{"tipo":<12} {"leitor":<8} {"linhas":>7} {"tempo (ms)":>11} {"pico (KiB)":>11}'
+        )
+        for tipo, caminho in arquivos.items():
+            for rotulo, leitor in leitores.items():
+                melhor = float('inf')
+                for _ in range(options['repeticoes']):
+                    inicio = time.perf_counter()
+                    linhas = sum(1 for _ in leitor(caminho, tipo))
+                    melhor = min(melhor, time.perf_counter() - inicio)
+
+                tracemalloc.start()
+                for _ in leitor(caminho, tipo):
+                    pass
+                pico = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+
+                self.stdout.write(
+                    f'{tipo:<12} {rotulo:<8} {linhas:>7} {melhor * 1000:>11.2f} {pico / 1024:>11.0f}'
+                )
@@ -0,0 +1,63 @@
+import time
+
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from fundamentos.hierarquia import CAMPOS_NO_ARVORE, montar_arvore
+from fundamentos.models import FundamentoLegal
+from fundamentos.renderers import MessagePackRenderer, OrjsonRenderer, msgpack, orjson
+from fundamentos.serializers import FundamentoLegalListSerializer
+
+
+class Command(BaseCommand):
+    help = 'Compara tempo de codificação e tamanho das respostas arvore e lista por renderer'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repeticoes',
+            type=int,
+            default=20,
+            help='Quantas vezes cada resposta é codificada (usa-se o melhor tempo)'
+        )
+        parser.add_argument(
+            '--page-size',
+            type=int,
+            default=200,
+            help='Tamanho da página da listagem'
+        )
+
+    def handle(self, *args, **options):
+        linhas = (
+            FundamentoLegal.objects.order_by('tipo_recurso', 'seq')
+            .values(*CAMPOS_NO_ARVORE, 'pai')
+        )
+        pagina = FundamentoLegal.objects.order_by('seq')[:options['page_size']]
+        respostas = {
+            'arvore': montar_arvore(linhas),
+            f'lista ({options["page_size"]})': FundamentoLegalListSerializer(pagina, many=True).data,
+        }
+
+        renderers = [('json (DRF)', JSONRenderer())]
+        if orjson is not None:
+            renderers.append(('orjson', OrjsonRenderer()))
+        else:
+            self.stdout.write(self.style.WARNING('orjson não instalado; OrjsonRenderer usaria json.'))
+        if msgpack is not None:
+            renderers.append(('msgpack', MessagePackRenderer()))
+        else:
+            self.stdout.write(self.style.WARNING('msgpack não instalado; MessagePack omitido.'))
+
+        self.stdout.write(f'{"resposta":<14} {"renderer":<12} {"tempo (ms)":>11} {"bytes":>10}')
+        for nome, dados in respostas.items():
+            base = None
+            for rotulo, renderer in renderers:
+                melhor = float('inf')
+                for _ in range(options['repeticoes']):
+                    inicio = time.perf_counter()
+                    conteudo = renderer.render(dados, renderer.media_type)
+                    melhor = min(melhor, time.perf_counter() - inicio)
+                base = base or melhor
+                self.stdout.write(
+                    f'{nome:<14} {rotulo:<12} {melhor * 1000:>11.2f} {len(conteudo):>10}'
+                    f'  ({base / melhor:.1f}x)'
+                )
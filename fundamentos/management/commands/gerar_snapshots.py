@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from fundamentos.snapshots import brotli, diretorio_snapshots, gerar_snapshots
+from fundamentos.versao import assinatura_dados
+
+
+class Command(BaseCommand):
+    help = 'Gera snapshots JSON pré-comprimidos das árvores, estatísticas e lista em STATIC_ROOT'
+
+    def handle(self, *args, **options):
+        if not assinatura_dados():
+            self.stdout.write(self.style.WARNING(
+                'Nenhuma versão dos dados registrada; execute importar_fundamentos antes.'
+            ))
+            return
+
+        arquivos = gerar_snapshots()
+        for nome, arquivo in arquivos.items():
+            self.stdout.write(f'  -> {nome}: {arquivo}')
+        if brotli is None:
+            self.stdout.write(self.style.WARNING('Brotli não instalado; apenas .gz gerados.'))
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(arquivos)} snapshots gravados em {diretorio_snapshots()}'
+        ))
@@ -1,8 +1,42 @@
+import csv
 import os
-import pandas as pd
-from django.core.management.base import BaseCommand
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
-from fundamentos.models import FundamentoLegal, TextoFundamento, TipoRecurso, Categoria
+from fundamentos import carga_postgres
+from fundamentos.busca import reindexar
+from fundamentos.hierarquia import recalcular_hierarquia
+from fundamentos.importacao import (
+    ARQUIVO_TEXTOS, ARQUIVOS, LEITORES, Rejeicao, hash_valores, ler_arquivo_fundamentos,
+    ler_arquivo_textos, ler_arquivos, ler_textos,
+)
+from fundamentos.indice import arquivo_indice, gerar_arquivo_indice
+from fundamentos.models import FundamentoLegal, TextoFundamento
+from fundamentos.reparo import Reparador
+from fundamentos.versao import registrar_versao
+
+# Colunas atualizadas quando o seq já existe (criado_em é preservado)
+CAMPOS_IMPORTADOS = [
+    'pai', 'descricao', 'glossario', 'tipo_recurso', 'categoria',
+    'neutro', 'informacao', 'justificativa', 'selecionavel', 'atualizado_em',
+]
+
+ARQUIVO_REJEITADOS = 'texto_fundamentos.rejeitados.tsv'
+
+TIPOS_CORRECAO = {
+    'caixa': 'caracteres de desenho de caixa',
+    'latin1': 'bytes Latin-1',
+    'mojibake': 'sequências de mojibake',
+}
+
+# Valores de cada linha que compõem hash_conteudo
+CAMPOS_HASH = [
+    'pai_id', 'descricao', 'glossario', 'tipo_recurso', 'categoria',
+    'neutro', 'informacao', 'justificativa', 'selecionavel',
+]
 
 
 class Command(BaseCommand):
@@ -20,138 +54,417 @@ class Command(BaseCommand):
             action='store_true',
             help='Limpar dados existentes antes de importar'
         )
+        parser.add_argument(
+            '--incremental',
+            action='store_true',
+            help='Aplicar apenas inserções, alterações e exclusões em relação à última importação'
+        )
+        parser.add_argument(
+            '--leitor',
+            choices=sorted(LEITORES),
+            default='csv',
+            help='Leitor dos CSVs: csv (padrão, biblioteca padrão) ou pandas (opcional)'
+        )
+        parser.add_argument(
+            '--jobs',
+            type=int,
+            default=1,
+            help='Processos para ler os arquivos em paralelo (um arquivo por processo)'
+        )
+        parser.add_argument(
+            '--reparar-encoding',
+            action='store_true',
+            help='Corrigir encoding durante a leitura (Latin-1, desenho de caixa, mojibake)'
+        )
+        parser.add_argument(
+            '--rejeitados',
+            type=str,
+            help='Arquivo com as linhas rejeitadas de texto_fundamentos.txt '
+                 '(padrão: texto_fundamentos.rejeitados.tsv no --dir)'
+        )
+        parser.add_argument(
+            '--carga',
+            choices=['auto', 'orm', 'copy'],
+            default='auto',
+            help='Gravação com bulk_create (orm) ou COPY (copy, só PostgreSQL); '
+                 'auto usa COPY quando disponível'
+        )
+        parser.add_argument(
+            '--suspender-indices',
+            action='store_true',
+            help='Com COPY na carga completa, remover os índices secundários e recriá-los '
+                 'no fim; bloqueia as leituras das tabelas até o fim da importação'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Registros por INSERT em lote'
+        )
 
     def handle(self, *args, **options):
         data_dir = options['dir']
-        
+        self.tempos = {}
+        self.internas = []
+        self.rejeitados = []
+        self.caminho_textos = None
+        self.reparar = options['reparar_encoding']
+
+        if options['clear'] and options['incremental']:
+            raise CommandError('--clear e --incremental não podem ser usados juntos')
+
+        if options['carga'] == 'copy' and not carga_postgres.copy_disponivel():
+            raise CommandError('--carga copy requer PostgreSQL com psycopg2')
+        self.copy = options['carga'] != 'orm' and carga_postgres.copy_disponivel()
+        self.suspender = options['suspender_indices']
+
         if options['clear']:
             self.stdout.write('Limpando dados existentes...')
-            TextoFundamento.objects.all().delete()
-            FundamentoLegal.objects.all().delete()
-
-        # Mapeamento de arquivos para tipos de recurso
-        arquivos = {
-            'AFIRE': 'AFIRE_202505141514.csv',
-            'AFIPO_RESP': 'AFIPO_(REsp_e AREsp)_202505141515.csv',
-            'AFIPO_RMS': 'AFIPO_(RMS)_202505141515.csv',
-            'AFIREQ': 'AFIREQ_202505141516.csv',
-        }
+            if self.copy:
+                carga_postgres.truncar()
+            else:
+                TextoFundamento.objects.all().delete()
+                FundamentoLegal.objects.all().delete()
 
-        for tipo, arquivo in arquivos.items():
+        # Leitura e validação: um arquivo por processo com --jobs N
+        tarefas = {}
+        # Tipos cujos CSVs foram lidos: --incremental só exclui fundamentos desses tipos
+        self.tipos_lidos = set()
+        for tipo, arquivo in ARQUIVOS.items():
             filepath = os.path.join(data_dir, arquivo)
             if os.path.exists(filepath):
-                self.stdout.write(f'Importando {arquivo}...')
-                self.importar_csv(filepath, tipo)
+                tarefas[arquivo] = (
+                    ler_arquivo_fundamentos, filepath, tipo, options['leitor'], self.reparar
+                )
+                self.tipos_lidos.add(tipo)
             else:
                 self.stdout.write(self.style.WARNING(f'Arquivo não encontrado: {filepath}'))
-
-        # Importar textos de fundamentos
-        texto_file = os.path.join(data_dir, 'texto_fundamentos.txt')
+        texto_file = os.path.join(data_dir, ARQUIVO_TEXTOS)
+        arquivo_rejeitados = options['rejeitados'] or os.path.join(data_dir, ARQUIVO_REJEITADOS)
         if os.path.exists(texto_file):
-            self.stdout.write('Importando textos de fundamentos...')
-            self.importar_textos(texto_file)
+            tarefas[ARQUIVO_TEXTOS] = (ler_arquivo_textos, texto_file, self.reparar)
 
-        # Atualizar relacionamentos pai-filho
-        self.stdout.write('Atualizando relacionamentos hierárquicos...')
-        self.atualizar_relacionamentos()
+        self.stdout.write(f'Lendo {len(tarefas)} arquivos ({options["jobs"]} processos)...')
+        with self.etapa('leitura'):
+            leituras = ler_arquivos(tarefas, options['jobs'])
+
+        registros = []
+        textos = None
+        correcoes = Counter()
+        for arquivo, leitura in leituras.items():
+            if arquivo == ARQUIVO_TEXTOS:
+                lidos = sum(len(linhas) for _, linhas in leitura.registros.values())
+            else:
+                lidos = len(leitura.registros)
+            self.stdout.write(
+                f'  -> {arquivo}: {lidos} registros lidos ({leitura.segundos * 1000:.0f} ms)'
+            )
+            for aviso in leitura.avisos:
+                self.stdout.write(self.style.WARNING(f'     {aviso}'))
+            if leitura.correcoes:
+                self.stdout.write(f'     encoding: {self.descrever_correcoes(leitura.correcoes)}')
+            correcoes.update(leitura.correcoes)
+            if arquivo == ARQUIVO_TEXTOS:
+                # {seq: (hash, linhas)}; os HTMLs são relidos na gravação
+                textos = leitura.registros
+                self.caminho_textos = texto_file
+                self.rejeitados.extend(leitura.rejeitados)
+            else:
+                registros.extend(self.instanciar(leitura.registros))
+        if self.reparar:
+            self.stdout.write(
+                f'  -> {sum(correcoes.values())} correções de encoding'
+                + (f' ({self.descrever_correcoes(correcoes)})' if correcoes else '')
+            )
+
+        if options['incremental']:
+            self.stdout.write('Comparando com a última importação...')
+            with self.etapa('gravação'):
+                resumo, alterados = self.carregar_incremental(
+                    registros, textos, options['batch_size']
+                )
+            self.stdout.write(
+                f"  -> {resumo['inseridos']} inseridos, {resumo['atualizados']} atualizados "
+                f"({resumo['movidos']} com novo pai), {resumo['excluidos']} excluídos, "
+                f"{resumo['textos']} com textos alterados"
+            )
+            self.gravar_rejeitados(arquivo_rejeitados)
+            if not alterados:
+                self.stdout.write(self.style.SUCCESS('Nenhuma alteração; dados e caches mantidos.'))
+                self.relatar_etapas()
+                return
+            self.atualizar_derivados(alterados)
+        else:
+            # Carga completa em uma transação; com COPY e --suspender-indices,
+            # os índices secundários são recriados uma única vez, no fim
+            with transaction.atomic(), self.indices_suspensos():
+                self.stdout.write(f'Gravando fundamentos e textos ({"COPY" if self.copy else "ORM"})...')
+                with self.etapa('gravação'):
+                    total_fundamentos, total_textos = self.carregar(
+                        registros, textos, options['batch_size']
+                    )
+                self.stdout.write(f'  -> {total_fundamentos} fundamentos e {total_textos} textos gravados')
+                self.gravar_rejeitados(arquivo_rejeitados)
+                self.atualizar_derivados(None)
+
+        with self.etapa('versão e índice em arquivo'):
+            versao = registrar_versao('importacao')
+            self.stdout.write(f'Versão dos dados: {versao.hash[:12]}')
+
+            indice = gerar_arquivo_indice()
+            if arquivo_indice():
+                self.stdout.write(f'  -> índice em memória gravado em {arquivo_indice()} ({len(indice)} documentos)')
+
+        self.relatar_etapas()
 
         total = FundamentoLegal.objects.count()
         self.stdout.write(self.style.SUCCESS(f'Importação concluída! {total} fundamentos importados.'))
 
-    @transaction.atomic
-    def importar_csv(self, filepath, tipo_recurso):
-        df = pd.read_csv(filepath, sep='#', encoding='utf-8', dtype=str)
-        df = df.fillna('')
-        
-        registros = []
-        for _, row in df.iterrows():
-            try:
-                seq = int(row['SEQ_FUNDAMENTO_LEGAL'])
-            except (ValueError, KeyError):
-                continue
-
-            pai_seq = None
-            if row.get('SEQ_FUNDAMENTO_LEGAL_PAI', '').strip():
-                try:
-                    pai_seq = int(row['SEQ_FUNDAMENTO_LEGAL_PAI'])
-                except ValueError:
-                    pai_seq = None
-
-            descricao = row.get('DESCRICAO', '').strip()
-            glossario = row.get('GLOSSARIO', '').strip() or None
-            
-            # Campos específicos do AFIRE
-            neutro = row.get('NEUTRO', 'N') == 'S'
-            informacao = row.get('INFORMACAO', 'N') == 'S'
-            justificativa = row.get('JUSTIFICATIVA', 'N') == 'S'
-            selecionavel = row.get('SELECIONAVEL', 'S') == 'S'
-
-            # Determinar categoria
-            categoria = Categoria.GERAL
-            desc_upper = descricao.upper()
-            if 'CÍVEL' in desc_upper or 'CIVEL' in desc_upper:
-                categoria = Categoria.CIVEL
-            elif 'CRIMINAL' in desc_upper:
-                categoria = Categoria.CRIMINAL
-
-            fundamento = FundamentoLegal(
-                seq=seq,
-                descricao=descricao,
-                glossario=glossario,
-                tipo_recurso=tipo_recurso,
-                categoria=categoria,
-                neutro=neutro,
-                informacao=informacao,
-                justificativa=justificativa,
-                selecionavel=selecionavel,
-            )
-            registros.append((fundamento, pai_seq))
+    def atualizar_derivados(self, alterados):
+        """Hierarquia e índice de busca depois da gravação (alterados=None: todos)"""
+        # Atualizar relacionamentos pai-filho
+        self.stdout.write('Atualizando relacionamentos hierárquicos...')
+        with self.etapa('hierarquia'):
+            self.atualizar_relacionamentos()
+
+        self.stdout.write('Atualizando índice de busca...')
+        with self.etapa('índice de busca'):
+            self.stdout.write(f'  -> {reindexar(alterados)} fundamentos indexados')
+
+    @contextmanager
+    def indices_suspensos(self):
+        if not (self.copy and self.suspender):
+            yield
+            return
+        with self.etapa('índices'), carga_postgres.indices_suspensos() as nomes:
+            self.stdout.write(f'  -> {len(nomes)} índices secundários suspensos até o fim da carga')
+            yield
+
+    @contextmanager
+    def etapa(self, nome):
+        """Acumula a duração da etapa em self.tempos, sem as etapas internas"""
+        inicio = time.perf_counter()
+        self.internas.append(0)
+        try:
+            yield
+        finally:
+            duracao = time.perf_counter() - inicio
+            self.tempos[nome] = self.tempos.get(nome, 0) + duracao - self.internas.pop()
+            if self.internas:
+                self.internas[-1] += duracao
+
+    def relatar_etapas(self):
+        self.stdout.write('Tempo por etapa:')
+        for nome, segundos in self.tempos.items():
+            self.stdout.write(f'  {nome:<28} {segundos * 1000:>9.0f} ms')
+        self.stdout.write(f'  {"total":<28} {sum(self.tempos.values()) * 1000:>9.0f} ms')
+
+    def gravar_rejeitados(self, caminho):
+        """Grava as linhas rejeitadas dos textos (linha, motivo, conteúdo) em TSV"""
+        if not self.rejeitados:
+            return
+        self.rejeitados.sort()
+        try:
+            with open(caminho, 'w', encoding='utf-8', newline='') as arquivo:
+                escritor = csv.writer(arquivo, delimiter='\t')
+                escritor.writerow(Rejeicao._fields)
+                escritor.writerows(self.rejeitados)
+        except OSError as erro:
+            self.stdout.write(self.style.WARNING(
+                f'  -> {len(self.rejeitados)} linhas de textos rejeitadas; '
+                f'não foi possível gravar {caminho}: {erro}'
+            ))
+            return
+        self.stdout.write(self.style.WARNING(
+            f'  -> {len(self.rejeitados)} linhas de textos rejeitadas, ver {caminho}'
+        ))
+
+    def descrever_correcoes(self, correcoes):
+        return ', '.join(
+            f'{total} {TIPOS_CORRECAO.get(tipo, tipo)}' for tipo, total in sorted(correcoes.items())
+        )
 
-        # Primeiro, criar todos os fundamentos sem pai
-        for fundamento, _ in registros:
-            fundamento.save()
+    def instanciar(self, registros):
+        """[RegistroFundamento] -> [(FundamentoLegal sem pai, seq do pai)], sem acessar o banco"""
+        instancias = []
+        for registro in registros:
+            campos = registro._asdict()
+            pai_seq = campos.pop('pai_seq')
+            instancias.append((FundamentoLegal(**campos), pai_seq))
+        return instancias
 
-        # Depois, atualizar os pais
+    def preparar(self, registros, textos, conhecidos):
+        """
+        Liga os pais em memória (entre todos os arquivos) e calcula o hash de
+        cada fundamento; hash_textos vem da leitura dos textos. Retorna
+        ({seq: fundamento}, {seq: hash dos textos} ou None sem arquivo de
+        textos). Textos de seqs desconhecidos vão para self.rejeitados.
+        """
+        fundamentos = {}
+        pais = {}
         for fundamento, pai_seq in registros:
-            if pai_seq:
-                try:
-                    pai = FundamentoLegal.objects.get(seq=pai_seq)
-                    fundamento.pai = pai
-                    fundamento.save(update_fields=['pai'])
-                except FundamentoLegal.DoesNotExist:
-                    pass
-
-        self.stdout.write(f'  -> {len(registros)} registros importados')
-
-    def importar_textos(self, filepath):
-        with open(filepath, 'r', encoding='utf-8', errors='replace') as f:
-            lines = f.readlines()
-
-        # Pular cabeçalho
-        for line in lines[1:]:
-            parts = line.strip().split('\t')
-            if len(parts) >= 3:
-                try:
-                    seq = int(parts[0].strip())
-                    legislacao = parts[1].strip() if len(parts) > 1 else ''
-                    texto_html = parts[2].strip() if len(parts) > 2 else ''
-                    
-                    try:
-                        fundamento = FundamentoLegal.objects.get(seq=seq)
-                        TextoFundamento.objects.create(
-                            fundamento=fundamento,
-                            legislacao=legislacao,
-                            texto_html=texto_html
-                        )
-                    except FundamentoLegal.DoesNotExist:
-                        pass
-                except ValueError:
-                    continue
+            fundamentos[fundamento.seq] = fundamento
+            pais[fundamento.seq] = pai_seq
+        conhecidos = conhecidos | fundamentos.keys()
+
+        for seq, fundamento in fundamentos.items():
+            pai_seq = pais[seq]
+            fundamento.pai_id = pai_seq if pai_seq in conhecidos and pai_seq != seq else None
+            fundamento.hash_conteudo = hash_valores(
+                getattr(fundamento, campo) for campo in CAMPOS_HASH
+            )
+
+        if textos is None:
+            return fundamentos, None
+        hashes = {}
+        for seq, (hash_textos, linhas) in textos.items():
+            if seq in conhecidos:
+                hashes[seq] = hash_textos
+            else:
+                self.rejeitados.extend(
+                    Rejeicao(linha, f'fundamento {seq} não existe', '') for linha in linhas
+                )
+        sem_textos = hash_valores(())
+        for seq, fundamento in fundamentos.items():
+            fundamento.hash_textos = hashes.get(seq, sem_textos)
+        return fundamentos, hashes
+
+    def gravar(self, fundamentos, textos, seqs_textos, batch_size):
+        """
+        INSERT ... ON CONFLICT dos fundamentos e substituição dos textos de
+        seqs_textos, relidos do arquivo e inseridos em lotes de batch_size.
+        """
+        campos = CAMPOS_IMPORTADOS + ['hash_conteudo']
+        if textos is not None:
+            campos.append('hash_textos')
+        if self.copy:
+            return carga_postgres.gravar(
+                fundamentos, campos,
+                None if textos is None else self.textos_do_arquivo(seqs_textos),
+                seqs_textos, batch_size,
+            )
+        FundamentoLegal.objects.bulk_create(
+            fundamentos,
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=['seq'],
+            update_fields=campos,
+        )
+
+        if textos is None:
+            return 0
+        seqs = sorted(seqs_textos)
+        for inicio in range(0, len(seqs), batch_size):
+            TextoFundamento.objects.filter(
+                fundamento_id__in=seqs[inicio:inicio + batch_size]
+            ).delete()
+
+        total = 0
+        lote = []
+        for seq, legislacao, texto_html in self.textos_do_arquivo(seqs_textos):
+            lote.append(TextoFundamento(
+                fundamento_id=seq, legislacao=legislacao, texto_html=texto_html
+            ))
+            if len(lote) >= batch_size:
+                TextoFundamento.objects.bulk_create(lote)
+                total += len(lote)
+                lote = []
+        TextoFundamento.objects.bulk_create(lote)
+        return total + len(lote)
+
+    def textos_do_arquivo(self, seqs):
+        """(seq, legislacao, texto_html) dos textos de seqs, relidos do arquivo"""
+        reparador = Reparador() if self.reparar else None
+        for texto in ler_textos(self.caminho_textos, reparador=reparador):
+            if texto.seq in seqs:
+                yield texto.seq, texto.legislacao, texto.texto_html
+
+    def carregar(self, registros, textos, batch_size):
+        """
+        Grava fundamentos e textos em lotes, em uma única transação. A FK do
+        pai é verificada só no commit, então a ordem das linhas não importa.
+        """
+        with transaction.atomic():
+            existentes = set(FundamentoLegal.objects.values_list('seq', flat=True))
+            with self.etapa('junção e pais'):
+                fundamentos, textos = self.preparar(registros, textos, existentes)
+            # Os textos dos fundamentos importados são substituídos pelos do arquivo
+            seqs_textos = fundamentos.keys() | (textos or {}).keys()
+            total_textos = self.gravar(fundamentos.values(), textos, seqs_textos, batch_size)
+        return len(fundamentos), total_textos
+
+    def carregar_incremental(self, registros, textos, batch_size):
+        """
+        Compara os hashes das linhas lidas com os gravados e aplica só as
+        diferenças, em uma transação. Fundamentos ausentes dos arquivos são
+        excluídos, mas só os dos tipos cujo CSV foi lido: os de um arquivo
+        que falta são mantidos (e continuam valendo como pais). Um mantido
+        cujo pai é excluído vira raiz, em vez de ser excluído em cascata.
+        Retorna o resumo e os seqs alterados.
+        """
+        with transaction.atomic():
+            gravados = {
+                seq: (hash_conteudo, hash_textos, pai_id, tipo_recurso)
+                for seq, hash_conteudo, hash_textos, pai_id, tipo_recurso
+                in FundamentoLegal.objects.values_list(
+                    'seq', 'hash_conteudo', 'hash_textos', 'pai_id', 'tipo_recurso'
+                )
+            }
+            mantidos = {
+                seq for seq, gravado in gravados.items() if gravado[3] not in self.tipos_lidos
+            }
+            with self.etapa('junção e pais'):
+                fundamentos, textos = self.preparar(registros, textos, mantidos)
+
+            inseridos = [seq for seq in fundamentos if seq not in gravados]
+            excluidos = [
+                seq for seq in gravados if seq not in fundamentos and seq not in mantidos
+            ]
+            atualizados = [
+                seq for seq, fundamento in fundamentos.items()
+                if seq in gravados and fundamento.hash_conteudo != gravados[seq][0]
+            ]
+            movidos = [seq for seq in atualizados if fundamentos[seq].pai_id != gravados[seq][2]]
+            seqs_textos = set()
+            if textos is not None:
+                seqs_textos = {
+                    seq for seq, fundamento in fundamentos.items()
+                    if (fundamento.hash_textos != gravados[seq][1] if seq in gravados
+                        else seq in textos)
+                }
+
+            alterados = set(inseridos) | set(atualizados) | seqs_textos
+            self.gravar(
+                [fundamentos[seq] for seq in sorted(alterados)],
+                textos, seqs_textos, batch_size,
+            )
+            # Mantidos não são regravados: os filhos de excluídos são desligados antes
+            # do delete (CASCADE). O hash vazio faz o próximo CSV do tipo regravá-los
+            conjunto_excluidos = set(excluidos)
+            desligados = sorted(seq for seq in mantidos if gravados[seq][2] in conjunto_excluidos)
+            for inicio in range(0, len(desligados), batch_size):
+                FundamentoLegal.objects.filter(
+                    seq__in=desligados[inicio:inicio + batch_size]
+                ).update(pai=None, hash_conteudo='')
+            atualizados += desligados
+            movidos += desligados
+            alterados.update(desligados)
+            for inicio in range(0, len(excluidos), batch_size):
+                FundamentoLegal.objects.filter(seq__in=excluidos[inicio:inicio + batch_size]).delete()
+
+        resumo = {
+            'inseridos': len(inseridos),
+            'atualizados': len(atualizados),
+            'movidos': len(movidos),
+            'excluidos': len(excluidos),
+            'textos': len(seqs_textos),
+        }
+        return resumo, alterados | set(excluidos)
 
     def atualizar_relacionamentos(self):
-        """Corrige relacionamentos pai-filho após importação completa"""
-        fundamentos_sem_pai = FundamentoLegal.objects.filter(
-            pai__isnull=True
-        ).exclude(seq__in=FundamentoLegal.objects.values_list('pai__seq', flat=True))
-        
-        self.stdout.write(f'  -> {fundamentos_sem_pai.count()} fundamentos raiz identificados')
+        """Recalcula as colunas de hierarquia após importação completa"""
+        alterados = recalcular_hierarquia()
+        raizes = FundamentoLegal.objects.filter(pai__isnull=True).count()
+
+        self.stdout.write(f'  -> {raizes} fundamentos raiz identificados')
+        self.stdout.write(f'  -> {alterados} fundamentos com hierarquia atualizada')
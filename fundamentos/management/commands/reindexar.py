@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from fundamentos.busca import obter_backend
+
+
+class Command(BaseCommand):
+    help = (
+        'Recria o índice de busca textual de todos os fundamentos '
+        '(após a migração 0003 em um banco que já tinha dados)'
+    )
+
+    def handle(self, *args, **options):
+        backend = obter_backend()
+        total = backend.reindexar()
+        self.stdout.write(self.style.SUCCESS(
+            f'{total} fundamentos indexados ({type(backend).__name__})'
+        ))
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from fundamentos.hierarquia import recalcular_hierarquia
+from fundamentos.versao import registrar_versao
+
+
+class Command(BaseCommand):
+    help = 'Recalcula as colunas desnormalizadas da hierarquia de fundamentos'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verificar',
+            action='store_true',
+            help='Apenas informa quantos fundamentos estão inconsistentes, sem gravar'
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            alterados = recalcular_hierarquia()
+            if options['verificar']:
+                transaction.set_rollback(True)
+
+        if options['verificar']:
+            if alterados:
+                self.stdout.write(self.style.WARNING(
+                    f'{alterados} fundamentos com hierarquia inconsistente.'
+                ))
+            else:
+                self.stdout.write(self.style.SUCCESS('Hierarquia consistente.'))
+            return
+
+        # Também publica a versão, caso os dados tenham sido alterados fora do importador
+        registrar_versao('reparo')
+        self.stdout.write(self.style.SUCCESS(
+            f'Hierarquia recalculada: {alterados} fundamentos atualizados.'
+        ))
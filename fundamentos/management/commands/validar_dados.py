@@ -0,0 +1,41 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from fundamentos.validacao import validar_diretorio
+
+
+class Command(BaseCommand):
+    help = (
+        'Valida os arquivos de dados do STJ (caracteres proibidos, UTF-8, estrutura) '
+        'e imprime o relatório em JSON; termina com erro se algum arquivo falhar'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dir',
+            type=str,
+            default='./data',
+            help='Diretório com os arquivos CSV'
+        )
+        parser.add_argument(
+            '--sem-cache',
+            action='store_true',
+            help='Revalidar todos os arquivos, sem usar os resultados de FUNDAMENTOS_VALIDACAO_CACHE'
+        )
+        parser.add_argument(
+            '--estrito',
+            action='store_true',
+            help='Avisos (WARN) também reprovam a validação'
+        )
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        relatorio = validar_diretorio(options['dir'], usar_cache=not options['sem_cache'])
+        relatorio['milissegundos'] = round((time.perf_counter() - inicio) * 1000, 1)
+        self.stdout.write(json.dumps(relatorio, ensure_ascii=False, indent=2))
+
+        reprovados = {'FAIL', 'WARN'} if options['estrito'] else {'FAIL'}
+        if relatorio['status'] in reprovados:
+            raise CommandError(f"Validação dos dados: {relatorio['status']}", returncode=1)
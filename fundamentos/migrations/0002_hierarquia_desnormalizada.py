@@ -0,0 +1,119 @@
+# Generated by Django 4.2.30 on 2026-10-17 18:33
+
+from django.db import migrations, models
+
+
+COLUNAS = ['caminho_materializado', 'nivel', 'lft', 'rgt', 'num_filhos', 'num_descendentes']
+
+
+def calcular_colunas(pais):
+    """
+    Colunas da hierarquia de cada seq, a partir de {seq: pai}, com a mesma
+    regra do índice da hierarquia do app (copiada aqui para a migração não
+    depender do código atual): filhos em ordem de seq, pai inexistente e
+    ciclos viram raízes.
+    """
+    filhos = {seq: [] for seq in pais}
+    raizes = []
+    for seq in sorted(pais):
+        pai = pais[seq]
+        if pai is None or pai not in pais:
+            raizes.append(seq)
+        else:
+            filhos[pai].append(seq)
+
+    valores = {}
+    contador = 0
+
+    def percorrer(raiz):
+        nonlocal contador
+        pilha = [(raiz, (raiz,), False)]
+        while pilha:
+            seq, caminho, saindo = pilha.pop()
+            if saindo:
+                contador += 1
+                colunas = valores[seq]
+                colunas['rgt'] = contador
+                colunas['num_descendentes'] = (contador - colunas['lft'] - 1) // 2
+                continue
+            if seq in valores:
+                continue
+            contador += 1
+            valores[seq] = {
+                'caminho_materializado': '/' + '/'.join(str(s) for s in caminho) + '/',
+                'nivel': len(caminho) - 1,
+                'lft': contador,
+                'num_filhos': len(filhos[seq]),
+            }
+            pilha.append((seq, caminho, True))
+            for filho in reversed(filhos[seq]):
+                pilha.append((filho, caminho + (filho,), False))
+
+    for raiz in raizes:
+        percorrer(raiz)
+    for seq in sorted(pais):
+        if seq not in valores:
+            filhos[pais[seq]].remove(seq)
+            percorrer(seq)
+    return valores
+
+
+def preencher_hierarquia(apps, schema_editor):
+    FundamentoLegal = apps.get_model('fundamentos', 'FundamentoLegal')
+
+    valores = calcular_colunas(dict(FundamentoLegal.objects.values_list('seq', 'pai_id')))
+    fundamentos = []
+    for fundamento in FundamentoLegal.objects.only('seq', *COLUNAS):
+        for campo, valor in valores[fundamento.seq].items():
+            setattr(fundamento, campo, valor)
+        fundamentos.append(fundamento)
+    FundamentoLegal.objects.bulk_update(fundamentos, COLUNAS, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fundamentos', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fundamentolegal',
+            name='caminho_materializado',
+            field=models.CharField(default='', editable=False, max_length=255, verbose_name='Caminho materializado'),
+        ),
+        migrations.AddField(
+            model_name='fundamentolegal',
+            name='lft',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='fundamentolegal',
+            name='nivel',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, verbose_name='Nível hierárquico'),
+        ),
+        migrations.AddField(
+            model_name='fundamentolegal',
+            name='num_descendentes',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Número de descendentes'),
+        ),
+        migrations.AddField(
+            model_name='fundamentolegal',
+            name='num_filhos',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Número de filhos'),
+        ),
+        migrations.AddField(
+            model_name='fundamentolegal',
+            name='rgt',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='fundamentolegal',
+            index=models.Index(fields=['lft', 'rgt'], name='fundamentos_lft_8daf6f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='fundamentolegal',
+            index=models.Index(fields=['caminho_materializado'], name='fundamentos_caminho_8386f4_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.RunPython(preencher_hierarquia, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,113 @@
+import html
+
+from django.db import migrations
+from django.utils.html import strip_tags
+
+SQL_POSTGRES = [
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    """
+    DO $$
+    BEGIN
+        IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = 'pt_unaccent') THEN
+            CREATE TEXT SEARCH CONFIGURATION pt_unaccent (COPY = portuguese);
+            ALTER TEXT SEARCH CONFIGURATION pt_unaccent
+                ALTER MAPPING FOR hword, hword_part, word WITH unaccent, portuguese_stem;
+        END IF;
+    END
+    $$
+    """,
+    "ALTER TABLE fundamentos_fundamentolegal ADD COLUMN IF NOT EXISTS busca_vetor tsvector",
+    "CREATE INDEX IF NOT EXISTS fundamentos_busca_vetor_idx "
+    "ON fundamentos_fundamentolegal USING GIN (busca_vetor)",
+]
+
+SQL_POSTGRES_REVERSO = [
+    "DROP INDEX IF EXISTS fundamentos_busca_vetor_idx",
+    "ALTER TABLE fundamentos_fundamentolegal DROP COLUMN IF EXISTS busca_vetor",
+]
+
+SQL_SQLITE = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS fundamentos_busca USING fts5("
+    "descricao, glossario, textos, tokenize = 'unicode61 remove_diacritics 2')",
+]
+
+SQL_SQLITE_REVERSO = [
+    "DROP TABLE IF EXISTS fundamentos_busca",
+]
+
+
+INSERIR_SQLITE = (
+    "INSERT INTO fundamentos_busca (rowid, descricao, glossario, textos) VALUES (%s, %s, %s, %s)"
+)
+
+ATUALIZAR_POSTGRES = (
+    "UPDATE fundamentos_fundamentolegal SET busca_vetor = "
+    "setweight(to_tsvector('pt_unaccent', %s), 'A') || "
+    "setweight(to_tsvector('pt_unaccent', %s), 'B') || "
+    "setweight(to_tsvector('pt_unaccent', %s), 'C') "
+    "WHERE seq = %s"
+)
+
+
+def documentos(apps):
+    """(seq, descricao, glossario, textos em texto plano) dos fundamentos já gravados"""
+    FundamentoLegal = apps.get_model('fundamentos', 'FundamentoLegal')
+    TextoFundamento = apps.get_model('fundamentos', 'TextoFundamento')
+
+    textos = {}
+    for seq, legislacao, texto_html in TextoFundamento.objects.order_by('id').values_list(
+        'fundamento_id', 'legislacao', 'texto_html'
+    ).iterator():
+        partes = textos.setdefault(seq, [])
+        if legislacao:
+            partes.append(legislacao)
+        partes.append(html.unescape(strip_tags(texto_html or '')))
+
+    for seq, descricao, glossario in FundamentoLegal.objects.order_by('seq').values_list(
+        'seq', 'descricao', 'glossario'
+    ).iterator():
+        yield seq, descricao or '', glossario or '', ' '.join(textos.get(seq, []))
+
+
+def criar_indice(apps, schema_editor):
+    # Sem depender do código atual do app: a estrutura e o preenchimento
+    # inicial ficam aqui; depois, o importador e o admin mantêm o índice
+    vendor = schema_editor.connection.vendor
+    comandos = {
+        'postgresql': SQL_POSTGRES,
+        'sqlite': SQL_SQLITE,
+    }.get(vendor, [])
+    for sql in comandos:
+        schema_editor.execute(sql)
+
+    if vendor not in ('postgresql', 'sqlite'):
+        return
+    linhas = list(documentos(apps))
+    if vendor == 'postgresql':
+        sql = ATUALIZAR_POSTGRES
+        linhas = [(descricao, glossario, textos, seq) for seq, descricao, glossario, textos in linhas]
+    else:
+        sql = INSERIR_SQLITE
+    with schema_editor.connection.cursor() as cursor:
+        cursor.executemany(sql, linhas)
+
+
+def remover_indice(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    comandos = {
+        'postgresql': SQL_POSTGRES_REVERSO,
+        'sqlite': SQL_SQLITE_REVERSO,
+    }.get(vendor, [])
+    for sql in comandos:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fundamentos', '0002_hierarquia_desnormalizada'),
+    ]
+
+    operations = [
+        migrations.RunPython(criar_indice, remover_indice),
+    ]
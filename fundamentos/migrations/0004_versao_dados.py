@@ -0,0 +1,61 @@
+# Generated by Django 4.2.30 on 2026-10-17 18:40
+
+import hashlib
+
+from django.db import migrations, models
+from django.utils import timezone
+
+# Cópia congelada dos campos do hash nesta migração: se os do app mudarem,
+# a próxima importação apenas registra uma nova versão
+CAMPOS_HASH_FUNDAMENTO = (
+    'seq', 'pai_id', 'descricao', 'glossario', 'tipo_recurso', 'categoria',
+    'neutro', 'informacao', 'justificativa', 'selecionavel',
+)
+CAMPOS_HASH_TEXTO = ('fundamento_id', 'legislacao', 'texto_html')
+
+
+def registrar_versao_inicial(apps, schema_editor):
+    FundamentoLegal = apps.get_model('fundamentos', 'FundamentoLegal')
+    TextoFundamento = apps.get_model('fundamentos', 'TextoFundamento')
+    VersaoDados = apps.get_model('fundamentos', 'VersaoDados')
+    if not FundamentoLegal.objects.exists():
+        return
+
+    resumo = hashlib.sha256()
+    consultas = (
+        FundamentoLegal.objects.order_by('seq').values_list(*CAMPOS_HASH_FUNDAMENTO),
+        TextoFundamento.objects.order_by('fundamento_id', 'id').values_list(*CAMPOS_HASH_TEXTO),
+    )
+    for consulta in consultas:
+        for linha in consulta.iterator(chunk_size=2000):
+            resumo.update(repr(linha).encode('utf-8'))
+            resumo.update(b'\n')
+        resumo.update(b'--\n')
+    VersaoDados.objects.update_or_create(
+        pk=1,
+        defaults={'hash': resumo.hexdigest(), 'atualizado_em': timezone.now(), 'origem': 'migracao'},
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fundamentos', '0003_indice_busca'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VersaoDados',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hash', models.CharField(max_length=64, verbose_name='Hash do conteúdo')),
+                ('atualizado_em', models.DateTimeField(verbose_name='Atualizado em')),
+                ('origem', models.CharField(blank=True, max_length=20, verbose_name='Origem')),
+            ],
+            options={
+                'verbose_name': 'Versão dos Dados',
+                'verbose_name_plural': 'Versões dos Dados',
+            },
+        ),
+        migrations.RunPython(registrar_versao_inicial, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-17 18:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fundamentos', '0004_versao_dados'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='fundamentolegal',
+            index=models.Index(fields=['tipo_recurso', 'seq'], name='fundamentos_tipo_re_d394a0_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-17 18:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fundamentos', '0005_indice_cursor'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fundamentolegal',
+            name='hash_conteudo',
+            field=models.CharField(blank=True, default='', editable=False, max_length=40),
+        ),
+        migrations.AddField(
+            model_name='fundamentolegal',
+            name='hash_textos',
+            field=models.CharField(blank=True, default='', editable=False, max_length=40),
+        ),
+    ]
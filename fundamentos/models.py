@@ -14,6 +14,30 @@ class Categoria(models.TextChoices):
     GERAL = 'GERAL', 'Geral'
 
 
+# Faixa de valores de seq (IntegerField: 32 bits no PostgreSQL). Valores
+# fora dela vindos da requisição nunca existem e não devem chegar ao banco
+SEQ_MINIMO, SEQ_MAXIMO = -2 ** 31, 2 ** 31 - 1
+
+
+def seq_valido(valor):
+    """valor é um int (não bool) na faixa de seq"""
+    return type(valor) is int and SEQ_MINIMO <= valor <= SEQ_MAXIMO
+
+
+class FundamentoLegalQuerySet(models.QuerySet):
+    """Consultas hierárquicas sobre as colunas desnormalizadas (lft/rgt)"""
+
+    def descendentes_de(self, fundamento):
+        return self.filter(
+            lft__gt=fundamento.lft, rgt__lt=fundamento.rgt
+        ).order_by('lft')
+
+    def ancestrais_de(self, fundamento):
+        return self.filter(
+            lft__lt=fundamento.lft, rgt__gt=fundamento.rgt
+        ).order_by('lft')
+
+
 class FundamentoLegal(models.Model):
     """
     Modelo principal para fundamentos legais do STJ.
@@ -48,36 +72,72 @@ class FundamentoLegal(models.Model):
     justificativa = models.BooleanField(default=False, verbose_name='Justificativa')
     selecionavel = models.BooleanField(default=True, verbose_name='Selecionável')
     
+    # Hierarquia desnormalizada, mantida por recalcular_hierarquia()
+    caminho_materializado = models.CharField(
+        max_length=255,
+        default='',
+        editable=False,
+        verbose_name='Caminho materializado'
+    )
+    nivel = models.PositiveSmallIntegerField(
+        default=0, editable=False, verbose_name='Nível hierárquico'
+    )
+    lft = models.PositiveIntegerField(default=0, editable=False)
+    rgt = models.PositiveIntegerField(default=0, editable=False)
+    num_filhos = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name='Número de filhos'
+    )
+    num_descendentes = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name='Número de descendentes'
+    )
+
+    # Hashes da linha do CSV e dos textos na última importação (--incremental)
+    hash_conteudo = models.CharField(max_length=40, blank=True, default='', editable=False)
+    hash_textos = models.CharField(max_length=40, blank=True, default='', editable=False)
+
     # Metadados
     criado_em = models.DateTimeField(auto_now_add=True)
     atualizado_em = models.DateTimeField(auto_now=True)
 
+    objects = FundamentoLegalQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'Fundamento Legal'
         verbose_name_plural = 'Fundamentos Legais'
         ordering = ['tipo_recurso', 'seq']
         indexes = [
             models.Index(fields=['tipo_recurso']),
+            # Chave da paginação por cursor na ordem padrão (tipo_recurso, seq)
+            models.Index(fields=['tipo_recurso', 'seq']),
             models.Index(fields=['categoria']),
             models.Index(fields=['descricao']),
+            models.Index(fields=['lft', 'rgt']),
+            # varchar_pattern_ops permite buscas por prefixo (LIKE 'x%') no PostgreSQL
+            models.Index(
+                fields=['caminho_materializado'],
+                name='fundamentos_caminho_8386f4_idx',
+                opclasses=['varchar_pattern_ops'],
+            ),
         ]
 
     def __str__(self):
         return f"[{self.seq}] {self.descricao[:80]}..."
 
-    @property
-    def nivel(self):
-        """Retorna o nível hierárquico do fundamento"""
-        nivel = 0
-        atual = self
-        while atual.pai:
-            nivel += 1
-            atual = atual.pai
-        return nivel
-
     @property
     def caminho(self):
-        """Retorna o caminho completo até o fundamento raiz"""
+        """
+        Retorna o caminho completo até o fundamento raiz, como uma lista de
+        NoHierarquia (seq, descricao) da raiz até o próprio fundamento.
+        """
+        from .hierarquia import NoHierarquia, obter_arvore
+
+        arvore = obter_arvore()
+        if self.seq in arvore:
+            return arvore.nos_caminho(self.seq)
+        return [NoHierarquia(f.seq, f.descricao) for f in self._caminho_orm()]
+
+    def _caminho_orm(self):
+        """Caminho percorrendo o ORM, para instâncias ainda fora do índice"""
         caminho = [self]
         atual = self
         while atual.pai:
@@ -86,11 +146,12 @@ class FundamentoLegal(models.Model):
         return caminho
 
     def get_descendentes(self):
-        """Retorna todos os descendentes recursivamente"""
-        descendentes = list(self.filhos.all())
-        for filho in self.filhos.all():
-            descendentes.extend(filho.get_descendentes())
-        return descendentes
+        """Retorna todos os descendentes, em pré-ordem"""
+        return list(FundamentoLegal.objects.descendentes_de(self))
+
+    def eh_descendente_de(self, outro):
+        """Indica se o fundamento está abaixo de outro na hierarquia"""
+        return outro.lft < self.lft and self.rgt < outro.rgt
 
 
 class TextoFundamento(models.Model):
@@ -117,3 +178,20 @@ class TextoFundamento(models.Model):
 
     def __str__(self):
         return f"Texto para fundamento {self.fundamento.seq}"
+
+
+class VersaoDados(models.Model):
+    """
+    Versão do conjunto de dados (registro único), gravada pelo importador e
+    pelo admin. Os caches de dados derivados são indexados pelo hash.
+    """
+    hash = models.CharField(max_length=64, verbose_name='Hash do conteúdo')
+    atualizado_em = models.DateTimeField(verbose_name='Atualizado em')
+    origem = models.CharField(max_length=20, blank=True, verbose_name='Origem')
+
+    class Meta:
+        verbose_name = 'Versão dos Dados'
+        verbose_name_plural = 'Versões dos Dados'
+
+    def __str__(self):
+        return f"{self.hash[:12]} ({self.atualizado_em:%d/%m/%Y %H:%M})"
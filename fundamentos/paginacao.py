@@ -0,0 +1,188 @@
+"""
+Paginação da API de fundamentos.
+
+- StandardPagination: por número de página, com o COUNT(*) guardado no
+  cache por combinação de filtros até a próxima versão dos dados.
+- CursorPagination: keyset sobre (seq) ou (tipo_recurso, seq), escolhida
+  com ?paginacao=cursor (&ordem=seq|tipo). Cada página é uma consulta
+  indexada WHERE chave > última chave, sem OFFSET.
+"""
+import base64
+import binascii
+import json
+from collections import OrderedDict
+from functools import partial
+
+from django.core.paginator import Paginator
+from django.db.models import Q, QuerySet
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from .models import seq_valido
+from .versao import cache_versionado
+
+# Parâmetros que não alteram o conjunto de resultados
+PARAMETROS_SEM_FILTRO = frozenset({
+    'page', 'page_size', 'cursor', 'paginacao', 'ordem', 'ordering', 'format',
+})
+
+ORDENS_CURSOR = {
+    'seq': ('seq',),
+    'tipo': ('tipo_recurso', 'seq'),
+}
+
+# Validação de cada campo da chave de um cursor recebido
+VALIDADORES_CURSOR = {
+    'seq': seq_valido,
+    'tipo_recurso': lambda valor: isinstance(valor, str),
+}
+
+
+def chave_filtros(request):
+    """Caminho e parâmetros de filtro normalizados (ordenados, sem paginação)"""
+    parametros = sorted(
+        (nome, tuple(sorted(valores)))
+        for nome, valores in request.query_params.lists()
+        if nome not in PARAMETROS_SEM_FILTRO
+    )
+    return request.path, tuple(parametros)
+
+
+def contar(queryset, request):
+    """COUNT(*) do queryset, calculado uma vez por versão dos dados e filtros"""
+    return cache_versionado('contagem', queryset.count, *chave_filtros(request))
+
+
+class PaginadorContagemCache(Paginator):
+    """Paginator do Django cuja contagem vem do cache (somente para querysets)"""
+
+    def __init__(self, object_list, per_page, request=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.request = request
+
+    @cached_property
+    def count(self):
+        if self.request is None or not isinstance(self.object_list, QuerySet):
+            return super().count
+        return contar(self.object_list, self.request)
+
+
+class StandardPagination(PageNumberPagination):
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.django_paginator_class = partial(PaginadorContagemCache, request=request)
+        return super().paginate_queryset(queryset, request, view)
+
+
+class CursorPagination(BasePagination):
+    """
+    Paginação keyset. O cursor (base64 de JSON) guarda a ordem, a chave da
+    linha de referência e o sentido; a resposta traz next, previous, a
+    contagem em cache e os resultados.
+    """
+    cursor_query_param = 'cursor'
+    ordem_query_param = 'ordem'
+    page_size = StandardPagination.page_size
+    page_size_query_param = StandardPagination.page_size_query_param
+    max_page_size = StandardPagination.max_page_size
+
+    def get_page_size(self, request):
+        try:
+            tamanho = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(tamanho, self.max_page_size) if tamanho > 0 else self.page_size
+
+    def decodificar_cursor(self, request):
+        valor = request.query_params.get(self.cursor_query_param)
+        if not valor:
+            return None
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(valor.encode('ascii')))
+            ordem, chave, reverso = cursor['o'], cursor['c'], cursor['r']
+        except (binascii.Error, ValueError, KeyError, TypeError, UnicodeError):
+            raise NotFound('Cursor inválido')
+        # Cursores adulterados não podem chegar ao ORM
+        campos = ORDENS_CURSOR.get(ordem) if isinstance(ordem, str) else None
+        if campos is None or not isinstance(chave, list) or len(chave) != len(campos) \
+                or type(reverso) is not int or reverso not in (0, 1) \
+                or not all(VALIDADORES_CURSOR[campo](valor) for campo, valor in zip(campos, chave)):
+            raise NotFound('Cursor inválido')
+        return ordem, chave, bool(reverso)
+
+    def codificar_cursor(self, chave, reverso):
+        cursor = json.dumps({'o': self.ordem, 'c': list(chave), 'r': int(reverso)})
+        valor = base64.urlsafe_b64encode(cursor.encode('utf-8')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, valor)
+
+    def filtro_apos(self, chave, reverso):
+        """Q equivalente a (campos) > chave, ou < chave no sentido reverso"""
+        campos = ORDENS_CURSOR[self.ordem]
+        operador = 'lt' if reverso else 'gt'
+        filtro = Q()
+        for posicao in reversed(range(len(campos))):
+            iguais = {campo: valor for campo, valor in zip(campos[:posicao], chave)}
+            atual = Q(**iguais, **{f'{campos[posicao]}__{operador}': chave[posicao]})
+            filtro = atual | filtro if filtro else atual
+        return filtro
+
+    def chave_da_linha(self, linha):
+        campos = ORDENS_CURSOR[self.ordem]
+        if isinstance(linha, tuple):
+            linha = dict(zip(self.nomes, linha))
+            return [linha[campo] for campo in campos]
+        return [getattr(linha, campo) for campo in campos]
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = remove_query_param(
+            request.build_absolute_uri(), self.cursor_query_param
+        )
+        self.count = contar(queryset, request)
+        tamanho = self.get_page_size(request)
+
+        cursor = self.decodificar_cursor(request)
+        if cursor is None:
+            self.ordem = request.query_params.get(self.ordem_query_param, 'seq')
+            if self.ordem not in ORDENS_CURSOR:
+                raise ValidationError({'erro': f"ordem deve ser uma de: {', '.join(ORDENS_CURSOR)}"})
+            chave, reverso = None, False
+        else:
+            self.ordem, chave, reverso = cursor
+        # values_list: posição de cada campo na tupla
+        self.nomes = queryset.query.values_select
+
+        campos = ORDENS_CURSOR[self.ordem]
+        ordenacao = [f'-{campo}' for campo in campos] if reverso else list(campos)
+        queryset = queryset.order_by(*ordenacao)
+        if chave is not None:
+            queryset = queryset.filter(self.filtro_apos(chave, reverso))
+        linhas = list(queryset[:tamanho + 1])
+        mais = len(linhas) > tamanho
+        linhas = linhas[:tamanho]
+        if reverso:
+            linhas.reverse()
+
+        self.proxima = self.anterior = None
+        if linhas:
+            tem_proxima = True if reverso else mais
+            tem_anterior = mais if reverso else chave is not None
+            if tem_proxima:
+                self.proxima = self.codificar_cursor(self.chave_da_linha(linhas[-1]), False)
+            if tem_anterior:
+                self.anterior = self.codificar_cursor(self.chave_da_linha(linhas[0]), True)
+        return linhas
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('count', self.count),
+            ('next', self.proxima),
+            ('previous', self.anterior),
+            ('results', data),
+        ]))
@@ -0,0 +1,78 @@
+"""
+Renderers da API.
+
+- OrjsonRenderer: mesmo JSON compacto do JSONRenderer do DRF, codificado
+  pelo orjson. Sem orjson, ou com indentação pedida (?indent / API
+  navegável), usa o JSONRenderer padrão.
+- MessagePackRenderer: application/msgpack (opcional, requer msgpack),
+  escolhido pelo cabeçalho Accept.
+
+Tipos que o orjson e o msgpack não conhecem (Decimal, strings lazy, etc.)
+são convertidos pelo encoder do DRF.
+"""
+from rest_framework import renderers
+from rest_framework.negotiation import BaseContentNegotiation
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+_encoder = encoders.JSONEncoder()
+
+
+def _converter(obj):
+    return _encoder.default(obj)
+
+
+class OrjsonRenderer(renderers.JSONRenderer):
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Chaves não textuais (ex.: níveis nas estatísticas) viram strings, como no json
+        ret = orjson.dumps(
+            data, default=_converter, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z
+        )
+        # Como o JSONRenderer, escapa U+2028 e U+2029 para manter um subconjunto de JavaScript
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
+
+
+class MessagePackRenderer(renderers.BaseRenderer):
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if msgpack is None:
+            raise RuntimeError('MessagePackRenderer requer o pacote msgpack')
+        return msgpack.packb(data, default=_converter, use_bin_type=True)
+
+
+class NegociacaoFixa(BaseContentNegotiation):
+    """
+    Usa sempre o primeiro renderer, ignorando o Accept. Para views que geram
+    o próprio formato (ex.: exportação), cujas mensagens de erro saem em JSON.
+    """
+
+    def select_parser(self, request, parsers):
+        return parsers[0]
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
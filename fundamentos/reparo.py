@@ -0,0 +1,113 @@
+"""
+Reparo de encoding dos arquivos do STJ durante a leitura
+(importar_fundamentos --reparar-encoding).
+
+Aplica as mesmas correções dos scripts avulsos (corrigir_encoding.py,
+fix_encoding_final.py e fix_texto_fundamentos.py), linha a linha e sem
+gravar arquivos intermediários:
+
+- bytes que não são UTF-8 válido são lidos como Latin-1;
+- caracteres de desenho de caixa usados no lugar de aspas, hífens etc.
+  são trocados por uma única chamada a str.translate;
+- sequências de mojibake (UTF-8 lido como Latin-1) são trocadas por uma
+  única expressão regular, da mais longa para a mais curta.
+
+O arquivo é lido em blocos de bytes por um decodificador incremental, então
+um caractere dividido entre dois blocos não é perdido.
+"""
+import codecs
+import re
+from collections import Counter
+
+TAMANHO_BLOCO = 64 * 1024
+
+# EncodingFixer.char_replacements (corrigir_encoding.py)
+CARACTERES_CAIXA = {
+    '┐': '"',
+    '└': '"',
+    '┌': '"',
+    '┘': '"',
+    '─': '-',
+    '┬': '-',
+    '┴': '-',
+    '│': '|',
+    '├': '|',
+    '┤': '|',
+    '┼': '+',
+}
+
+# CHAR_MAP de fix_encoding_final.py, sem as chaves repetidas que lá eram
+# sobrescritas e sem a entrada 'Ã' -> 'Ã', que não altera nada
+MOJIBAKE = {
+    'Ã§Ã£o': 'ção',
+    'Ã§Ã£': 'çã',
+    'Ã§Ãµ': 'çõ',
+    'REGIÃ\xa0O': 'REGIÃO',
+    'REGIÃ O': 'REGIÃO',
+    'REGIÃ£O': 'REGIÃO',
+    'Ã¡': 'á',
+    'Ã©': 'é',
+    'Ã\xad': 'í',
+    'Ã³': 'ó',
+    'Ãº': 'ú',
+    'Ã¢': 'â',
+    'Ãª': 'ê',
+    'Ã´': 'ô',
+    'Ã£': 'ã',
+    'Ãµ': 'õ',
+    'Ã§': 'ç',
+    'Ã\xa0': 'à',
+    'Ã ': 'à',
+    'Ã‡': 'Ç',
+    'Ã‰': 'É',
+    'Ã"': 'Ô',
+    'Ãš': 'Ú',
+    'Ã‚': 'Â',
+    'ÃŠ': 'Ê',
+    'Ã•': 'Õ',
+    '\xa0': ' ',
+}
+
+# Bytes inválidos chegam como surrogates (U+DC80..U+DCFF) do surrogateescape
+LATIN1 = {chr(0xDC00 + byte): chr(byte) for byte in range(0x80, 0x100)}
+
+TABELA = str.maketrans({**CARACTERES_CAIXA, **LATIN1})
+PADRAO_TABELA = re.compile('[%s]' % ''.join(map(re.escape, {**CARACTERES_CAIXA, **LATIN1})))
+PADRAO_MOJIBAKE = re.compile(
+    '|'.join(map(re.escape, sorted(MOJIBAKE, key=len, reverse=True)))
+)
+
+
+class Reparador:
+    """Repara o texto lido e conta as correções por tipo em self.contagem"""
+
+    def __init__(self):
+        self.contagem = Counter()
+
+    def reparar(self, texto):
+        # Busca antes de traduzir: quase todas as linhas não têm o que corrigir
+        if PADRAO_TABELA.search(texto):
+            for caractere in PADRAO_TABELA.findall(texto):
+                self.contagem['latin1' if caractere in LATIN1 else 'caixa'] += 1
+            texto = texto.translate(TABELA)
+        texto, trocas = PADRAO_MOJIBAKE.subn(lambda m: MOJIBAKE[m.group()], texto)
+        if trocas:
+            self.contagem['mojibake'] += trocas
+        return texto
+
+    def linhas(self, caminho):
+        """Gera as linhas reparadas do arquivo (com o fim de linha original)"""
+        decodificador = codecs.getincrementaldecoder('utf-8')('surrogateescape')
+        resto = ''
+        with open(caminho, 'rb') as arquivo:
+            while True:
+                bloco = arquivo.read(TAMANHO_BLOCO)
+                texto = resto + decodificador.decode(bloco, final=not bloco)
+                linhas = texto.split('\n')
+                resto = linhas.pop()
+                for linha in linhas:
+                    yield self.reparar(linha + '\n')
+                if not bloco:
+                    break
+        if resto:
+            yield self.reparar(resto)
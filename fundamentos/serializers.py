@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from .hierarquia import obter_arvore
 from .models import FundamentoLegal, TextoFundamento
 
 
@@ -16,11 +17,39 @@ class FundamentoLegalListSerializer(serializers.ModelSerializer):
         model = FundamentoLegal
         fields = [
             'seq', 'descricao', 'tipo_recurso', 'categoria',
-            'selecionavel', 'pai', 'tem_filhos'
+            'selecionavel', 'pai', 'tem_filhos', 'num_filhos'
         ]
     
     def get_tem_filhos(self, obj):
-        return obj.filhos.exists()
+        # num_filhos é mantido por recalcular_hierarquia(); nenhuma consulta por linha
+        return obj.num_filhos > 0
+
+
+# Colunas lidas por linhas_lista(), na ordem de desempacotamento
+CAMPOS_LISTA = (
+    'seq', 'descricao', 'tipo_recurso', 'categoria', 'selecionavel', 'pai', 'num_filhos'
+)
+
+
+def linhas_lista(linhas):
+    """
+    Mesma representação de FundamentoLegalListSerializer, montada direto de
+    queryset.values_list(*CAMPOS_LISTA), sem instanciar modelos nem campos
+    do serializer por linha.
+    """
+    return [
+        {
+            'seq': seq,
+            'descricao': descricao,
+            'tipo_recurso': tipo_recurso,
+            'categoria': categoria,
+            'selecionavel': selecionavel,
+            'pai': pai,
+            'tem_filhos': num_filhos > 0,
+            'num_filhos': num_filhos,
+        }
+        for seq, descricao, tipo_recurso, categoria, selecionavel, pai, num_filhos in linhas
+    ]
 
 
 class FundamentoLegalDetailSerializer(serializers.ModelSerializer):
@@ -47,19 +76,9 @@ class FundamentoLegalDetailSerializer(serializers.ModelSerializer):
         return [{'seq': f.seq, 'descricao': f.descricao} for f in obj.caminho]
     
     def get_pai_info(self, obj):
-        if obj.pai:
-            return {'seq': obj.pai.seq, 'descricao': obj.pai.descricao}
-        return None
-
-
-class FundamentoLegalTreeSerializer(serializers.ModelSerializer):
-    """Serializer para visualização em árvore"""
-    children = serializers.SerializerMethodField()
-    
-    class Meta:
-        model = FundamentoLegal
-        fields = ['seq', 'descricao', 'tipo_recurso', 'categoria', 'selecionavel', 'children']
-    
-    def get_children(self, obj):
-        children = obj.filhos.all()
-        return FundamentoLegalTreeSerializer(children, many=True).data
+        if obj.pai_id is None:
+            return None
+        arvore = obter_arvore()
+        if obj.pai_id in arvore:
+            return {'seq': obj.pai_id, 'descricao': arvore.descricao(obj.pai_id)}
+        return {'seq': obj.pai.seq, 'descricao': obj.pai.descricao}
@@ -0,0 +1,15 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .hierarquia import invalidar_arvore
+from .models import FundamentoLegal
+
+
+@receiver(post_save, sender=FundamentoLegal)
+@receiver(post_delete, sender=FundamentoLegal)
+def fundamento_alterado(sender, **kwargs):
+    """
+    Descarta o índice hierárquico do processo após alterações, antes mesmo
+    de a nova versão dos dados ser registrada
+    """
+    invalidar_arvore()
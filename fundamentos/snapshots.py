@@ -0,0 +1,157 @@
+"""
+Snapshots estáticos (JSON pré-comprimido) da versão atual dos dados.
+
+gerar_snapshots grava em STATIC_ROOT/fundamentos/snapshots/ a árvore de cada
+TipoRecurso, as estatísticas e a lista plana de fundamentos, com o mesmo
+conteúdo das respostas da API. Cada arquivo recebe a impressão digital do
+conteúdo no nome (como o ManifestStaticFilesStorage), versões .gz e .br, e
+entra no staticfiles.json para ser servido pelo WhiteNoise com cache imutável.
+"""
+import gzip
+import hashlib
+import json
+import os
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestFilesMixin, staticfiles_storage
+
+from .renderers import OrjsonRenderer
+from .versao import assinatura_dados
+
+try:
+    import brotli
+except ImportError:  # Brotli é opcional (whitenoise[brotli])
+    brotli = None
+
+DIRETORIO = 'fundamentos/snapshots'
+MANIFESTO = 'snapshots.json'
+
+
+def diretorio_snapshots():
+    return Path(settings.STATIC_ROOT) / DIRETORIO
+
+
+def _gravar(caminho, conteudo):
+    temporario = caminho.with_name(caminho.name + '.tmp')
+    temporario.write_bytes(conteudo)
+    os.replace(temporario, caminho)
+
+
+def conteudos_snapshots():
+    """Gera (nome lógico, bytes JSON) de cada snapshot"""
+    from .estatisticas import calcular_estatisticas
+    from .hierarquia import linhas_arvore, montar_arvore
+    from .models import FundamentoLegal, TipoRecurso
+    from .serializers import FundamentoLegalListSerializer
+
+    renderer = OrjsonRenderer()
+    for tipo in TipoRecurso:
+        linhas = linhas_arvore(tipo.value)
+        yield f'arvore-{tipo.value}.json', renderer.render(montar_arvore(linhas))
+
+    yield 'estatisticas.json', renderer.render(calcular_estatisticas())
+
+    fundamentos = FundamentoLegal.objects.order_by('seq')
+    yield 'fundamentos.json', renderer.render(
+        FundamentoLegalListSerializer(fundamentos, many=True).data
+    )
+
+
+def gerar_snapshots():
+    """
+    Grava os snapshots da versão atual e atualiza o staticfiles.json.
+    Os arquivos da geração anterior são mantidos até a próxima execução,
+    porque processos que ainda leem o manifesto antigo continuam a servi-los;
+    os mais velhos são removidos. Retorna o manifesto {nome lógico: arquivo}.
+    """
+    diretorio = diretorio_snapshots()
+    diretorio.mkdir(parents=True, exist_ok=True)
+    versao = assinatura_dados()
+    anterior = ler_manifesto() or {}
+
+    arquivos = {}
+    for nome, conteudo in conteudos_snapshots():
+        base, extensao = os.path.splitext(nome)
+        arquivo = f'{base}.{hashlib.md5(conteudo).hexdigest()[:12]}{extensao}'
+        _gravar(diretorio / arquivo, conteudo)
+        _gravar(diretorio / f'{arquivo}.gz', gzip.compress(conteudo, compresslevel=9, mtime=0))
+        if brotli is not None:
+            _gravar(diretorio / f'{arquivo}.br', brotli.compress(conteudo))
+        arquivos[nome] = arquivo
+
+    _gravar(
+        diretorio / MANIFESTO,
+        json.dumps({'versao': versao, 'arquivos': arquivos}, indent=2).encode('utf-8'),
+    )
+
+    atuais = set(arquivos.values()) | set(anterior.get('arquivos', {}).values()) | {MANIFESTO}
+    for caminho in diretorio.iterdir():
+        nome = caminho.name
+        for sufixo in ('.gz', '.br'):
+            nome = nome.removesuffix(sufixo)
+        if nome not in atuais:
+            caminho.unlink()
+
+    _atualizar_manifesto_staticfiles(arquivos)
+    return arquivos
+
+
+def _atualizar_manifesto_staticfiles(arquivos):
+    """Inclui os snapshots no staticfiles.json gerado pelo collectstatic"""
+    if not isinstance(staticfiles_storage, ManifestFilesMixin):
+        return
+    caminho = Path(settings.STATIC_ROOT) / staticfiles_storage.manifest_name
+    if not caminho.exists():
+        return
+    manifesto = json.loads(caminho.read_text(encoding='utf-8'))
+    paths = {
+        nome: arquivo for nome, arquivo in manifesto.get('paths', {}).items()
+        if not nome.startswith(f'{DIRETORIO}/')
+    }
+    for nome, arquivo in arquivos.items():
+        paths[f'{DIRETORIO}/{nome}'] = f'{DIRETORIO}/{arquivo}'
+    manifesto['paths'] = paths
+    _gravar(caminho, json.dumps(manifesto).encode('utf-8'))
+
+
+def ler_manifesto():
+    try:
+        return json.loads((diretorio_snapshots() / MANIFESTO).read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return None
+
+
+_manifesto = None
+
+
+def snapshot_atual(nome):
+    """
+    Caminho do snapshot `nome` se ele corresponder à versão atual dos dados,
+    senão None (a resposta é então montada pela view).
+    """
+    global _manifesto
+    versao = assinatura_dados()
+    if not versao:
+        return None
+    manifesto = _manifesto
+    if manifesto is None or manifesto.get('versao') != versao:
+        manifesto = ler_manifesto()
+        if not manifesto or manifesto.get('versao') != versao:
+            return None
+        _manifesto = manifesto
+    arquivo = manifesto['arquivos'].get(nome)
+    if not arquivo:
+        return None
+    caminho = diretorio_snapshots() / arquivo
+    return caminho if caminho.exists() else None
+
+
+def abrir_snapshot(caminho, accept_encoding):
+    """Abre a variante comprimida aceita pelo cliente: (arquivo, Content-Encoding)"""
+    codificacoes = [c.split(';')[0].strip() for c in accept_encoding.split(',')]
+    for codificacao, sufixo in (('br', '.br'), ('gzip', '.gz')):
+        variante = caminho.with_name(caminho.name + sufixo)
+        if codificacao in codificacoes and variante.exists():
+            return open(variante, 'rb'), codificacao
+    return open(caminho, 'rb'), None
@@ -0,0 +1,118 @@
+"""
+Autocompletar da caixa de busca a partir de arrays ordenados de termos.
+
+As descrições são tokenizadas uma vez por processo (sem acentos). Cada
+consulta faz apenas buscas binárias nos arrays, sem acessar o banco.
+"""
+import bisect
+import heapq
+import threading
+
+from .indice import STOPWORDS, palavras, tokenizar
+from .versao import assinatura_dados
+
+
+class IndicePrefixos:
+    """Termos das descrições e pares (termo, seq) em ordem lexicográfica"""
+
+    def __init__(self, documentos, assinatura=None):
+        self.assinatura = assinatura
+        self.descricoes = {}
+        self.termos_por_seq = {}
+        frequencias = {}
+        pares = []
+
+        for seq, descricao in documentos:
+            termos = frozenset(tokenizar(descricao))
+            self.descricoes[seq] = descricao
+            self.termos_por_seq[seq] = termos
+            for termo in termos:
+                frequencias[termo] = frequencias.get(termo, 0) + 1
+                pares.append((termo, seq))
+
+        self.termos = sorted(frequencias)
+        self.frequencias = [frequencias[termo] for termo in self.termos]
+        pares.sort()
+        self.pares = pares
+
+    def _faixa_termos(self, prefixo):
+        return (
+            bisect.bisect_left(self.termos, prefixo),
+            bisect.bisect_left(self.termos, prefixo + '\uffff'),
+        )
+
+    def _faixa_pares(self, prefixo):
+        return (
+            bisect.bisect_left(self.pares, (prefixo,)),
+            bisect.bisect_left(self.pares, (prefixo + '\uffff',)),
+        )
+
+    def sugerir(self, consulta, limite=10):
+        """
+        Completa a última palavra da consulta. As anteriores (exceto palavras
+        vazias) restringem os fundamentos sugeridos.
+        """
+        digitadas = palavras(consulta)
+        if not digitadas:
+            return {'termos': [], 'fundamentos': []}
+        prefixo = digitadas[-1]
+        anteriores = [p for p in digitadas[:-1] if p not in STOPWORDS]
+
+        fundamentos = []
+        vistos = set()
+        candidatos = set()
+        inicio, fim = self._faixa_pares(prefixo)
+        for termo, seq in self.pares[inicio:fim]:
+            if seq in vistos:
+                continue
+            termos_doc = self.termos_por_seq[seq]
+            if not all(p in termos_doc for p in anteriores):
+                continue
+            vistos.add(seq)
+            if anteriores:
+                candidatos.add(termo)
+            if len(fundamentos) < limite:
+                fundamentos.append({'seq': seq, 'descricao': self.descricoes[seq]})
+            elif not anteriores:
+                break
+
+        inicio, fim = self._faixa_termos(prefixo)
+        indices = range(inicio, fim)
+        if anteriores:
+            indices = [i for i in indices if self.termos[i] in candidatos]
+        melhores = heapq.nsmallest(
+            limite, indices, key=lambda i: (-self.frequencias[i], self.termos[i])
+        )
+        base = ' '.join(digitadas[:-1])
+        termos = [
+            {
+                'termo': f'{base} {self.termos[i]}' if base else self.termos[i],
+                'frequencia': self.frequencias[i],
+            }
+            for i in melhores
+        ]
+        return {'termos': termos, 'fundamentos': fundamentos}
+
+
+def construir_prefixos(assinatura=None):
+    from .models import FundamentoLegal
+
+    documentos = FundamentoLegal.objects.order_by('seq').values_list('seq', 'descricao')
+    return IndicePrefixos(documentos, assinatura=assinatura)
+
+
+_lock = threading.Lock()
+_prefixos = None
+
+
+def obter_prefixos():
+    """Retorna o índice de prefixos do processo, reconstruindo-o se os dados mudaram"""
+    global _prefixos
+    assinatura = assinatura_dados()
+    prefixos = _prefixos
+    if prefixos is None or prefixos.assinatura != assinatura:
+        with _lock:
+            if _prefixos is None or _prefixos.assinatura != assinatura:
+                _prefixos = construir_prefixos(assinatura)
+            prefixos = _prefixos
+    return prefixos
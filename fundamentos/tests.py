@@ -1,3 +1,1176 @@
-from django.test import TestCase
+import base64
+import csv
+import gzip
+import io
+import json
+import os
+import tempfile
+from unittest import mock, skipIf, skipUnless
 
-# Create your tests here.
+from django.core.cache import caches
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.http import FileResponse
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
+
+from .busca import reindexar
+from .consultas import PROFUNDIDADE_MAXIMA
+from .estatisticas import calcular_estatisticas, obter_estatisticas
+from .hierarquia import ArvoreFundamentos, recalcular_hierarquia
+from .indice import IndiceInvertido, gerar_arquivo_indice, obter_indice
+from .importacao import RegistroFundamento, ler_fundamentos, ler_textos
+from .models import Categoria, FundamentoLegal, TextoFundamento, TipoRecurso, VersaoDados
+from .renderers import OrjsonRenderer, msgpack
+from .serializers import CAMPOS_LISTA, FundamentoLegalListSerializer, linhas_lista
+from .snapshots import gerar_snapshots
+from .sugestoes import IndicePrefixos
+from .versao import _chave_versao, assinatura_dados, registrar_versao
+
+# Cache isolado por execução: o cache em arquivo sobreviveria entre execuções dos testes
+CACHE_TESTES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=CACHE_TESTES)
+class ConsultasPorRequisicaoTests(TestCase):
+    """O número de consultas das listagens não depende do tamanho da página"""
+
+    @classmethod
+    def setUpTestData(cls):
+        raiz = FundamentoLegal.objects.create(
+            seq=1, descricao='Súmula raiz', tipo_recurso=TipoRecurso.AFIRE
+        )
+        for seq in range(2, 42):
+            pai = FundamentoLegal.objects.create(
+                seq=seq, pai=raiz, descricao=f'Súmula {seq}',
+                tipo_recurso=TipoRecurso.AFIRE
+            )
+            FundamentoLegal.objects.create(
+                seq=seq + 100, pai=pai, descricao=f'Súmula filha {seq}',
+                tipo_recurso=TipoRecurso.AFIRE
+            )
+        recalcular_hierarquia()
+        reindexar()
+
+    def contar_consultas(self, url):
+        with CaptureQueriesContext(connection) as contexto:
+            resposta = self.client.get(url, HTTP_ACCEPT='application/json', secure=True)
+        self.assertEqual(resposta.status_code, 200)
+        # Em produção a versão dos dados é lida do cache compartilhado
+        consultas = [
+            q for q in contexto.captured_queries
+            if VersaoDados._meta.db_table not in q['sql']
+        ]
+        return len(consultas), resposta.json()
+
+    def test_listagem_constante(self):
+        pequena, _ = self.contar_consultas('/api/fundamentos/?page_size=5')
+        grande, dados = self.contar_consultas('/api/fundamentos/?page_size=200')
+        self.assertEqual(pequena, grande)
+        self.assertEqual(len(dados['results']), 81)
+
+    def test_busca_constante(self):
+        pequena, _ = self.contar_consultas('/api/fundamentos/busca/?q=Súmula&page_size=5')
+        grande, _ = self.contar_consultas('/api/fundamentos/busca/?q=Súmula&page_size=200')
+        self.assertEqual(pequena, grande)
+
+    def test_busca_sem_acentos(self):
+        _, dados = self.contar_consultas('/api/fundamentos/busca/?q=sumula filha')
+        self.assertEqual(dados['count'], 40)
+
+    def test_comando_reindexar(self):
+        saida = io.StringIO()
+        call_command('reindexar', stdout=saida)
+        self.assertIn('81 fundamentos indexados', saida.getvalue())
+        _, dados = self.contar_consultas('/api/fundamentos/busca/?q=filha')
+        self.assertEqual(dados['count'], 40)
+
+    def test_tem_filhos_e_num_filhos(self):
+        consultas, dados = self.contar_consultas('/api/filhos/1/')
+        self.assertEqual(consultas, 2)
+        self.assertEqual(len(dados), 40)
+        self.assertTrue(all(f['tem_filhos'] and f['num_filhos'] == 1 for f in dados))
+
+    def test_descendentes_em_uma_consulta(self):
+        consultas, dados = self.contar_consultas('/api/fundamentos/1/descendentes/')
+        self.assertEqual(consultas, 1)
+        self.assertEqual(len(dados), 80)
+        self.assertEqual(dados[0]['num_filhos'], 1)
+
+
+class ArvoreFundamentosTests(SimpleTestCase):
+    """Índice em memória da hierarquia, montado a partir de (seq, pai, descrição)"""
+
+    linhas = [
+        (1, None, 'Raiz'), (3, 1, 'Filho 3'), (2, 1, 'Filho 2'), (4, 2, 'Neto'),
+        (5, None, 'Outra raiz'), (8, 99, 'Pai inexistente'),
+        (7, 6, 'Ciclo 7'), (6, 7, 'Ciclo 6'),
+    ]
+
+    def setUp(self):
+        self.arvore = ArvoreFundamentos(self.linhas)
+
+    def test_ancestrais_e_caminho(self):
+        self.assertEqual(self.arvore.ancestrais(4), (1, 2))
+        self.assertEqual(self.arvore.caminho(4), (1, 2, 4))
+        self.assertEqual((self.arvore.nivel(4), self.arvore.raiz(4)), (2, 1))
+        self.assertEqual(self.arvore.ancestrais(1), ())
+        self.assertEqual(self.arvore.caminho_materializado(4), '/1/2/4/')
+        self.assertEqual(
+            [no.descricao for no in self.arvore.nos_caminho(4)], ['Raiz', 'Filho 2', 'Neto']
+        )
+
+    def test_subarvore_em_preordem_por_seq(self):
+        self.assertEqual(self.arvore.filhos(1), (2, 3))
+        self.assertEqual(self.arvore.subarvore(1), [1, 2, 4, 3])
+        self.assertEqual(self.arvore.descendentes(1), [2, 4, 3])
+        self.assertEqual(self.arvore.num_descendentes(1), 3)
+        self.assertEqual(self.arvore.subarvore(5), [5])
+
+    def test_pai_inexistente_vira_raiz(self):
+        self.assertIsNone(self.arvore.pai(8))
+        self.assertEqual(self.arvore.caminho(8), (8,))
+
+    def test_ciclo_vira_raiz_no_menor_seq(self):
+        self.assertEqual(len(self.arvore), len(self.linhas))
+        self.assertIsNone(self.arvore.pai(6))
+        self.assertEqual(self.arvore.subarvore(6), [6, 7])
+        self.assertEqual(self.arvore.ancestrais(7), (6,))
+        self.assertEqual((self.arvore.filhos(6), self.arvore.filhos(7)), ((7,), ()))
+
+    def test_intervalos_contem_exatamente_os_descendentes(self):
+        intervalos = {seq: self.arvore.intervalo(seq) for seq, _, _ in self.linhas}
+
+        limites = [v for intervalo in intervalos.values() for v in intervalo]
+        self.assertEqual(sorted(limites), list(range(1, 2 * len(self.linhas) + 1)))
+        for seq, (lft, rgt) in intervalos.items():
+            self.assertEqual(rgt - lft, 2 * self.arvore.num_descendentes(seq) + 1)
+            dentro = {s for s, (l, _) in intervalos.items() if lft < l < rgt}
+            self.assertEqual(dentro, set(self.arvore.descendentes(seq)))
+
+
+@override_settings(CACHES=CACHE_TESTES)
+class HierarquiaTests(TestCase):
+    """Árvore montada pela API a partir das colunas desnormalizadas"""
+
+    @classmethod
+    def setUpTestData(cls):
+        raiz = FundamentoLegal.objects.create(seq=1, descricao='Raiz', tipo_recurso=TipoRecurso.AFIRE)
+        filho = FundamentoLegal.objects.create(
+            seq=2, pai=raiz, descricao='Filho de outro tipo', tipo_recurso=TipoRecurso.AFIREQ
+        )
+        FundamentoLegal.objects.create(seq=3, pai=filho, descricao='Neto', tipo_recurso=TipoRecurso.AFIRE)
+        FundamentoLegal.objects.create(seq=4, pai=raiz, descricao='Filho', tipo_recurso=TipoRecurso.AFIRE)
+        FundamentoLegal.objects.create(seq=5, descricao='Outra raiz', tipo_recurso=TipoRecurso.AFIREQ)
+        recalcular_hierarquia()
+
+    def status(self, url):
+        return self.client.get(url, HTTP_ACCEPT='application/json', secure=True).status_code
+
+    def get(self, url):
+        resposta = self.client.get(url, HTTP_ACCEPT='application/json', secure=True)
+        self.assertEqual(resposta.status_code, 200)
+        return resposta.json()
+
+    def test_arvore_por_tipo_mantem_filhos_de_outro_tipo(self):
+        completa = self.get('/api/fundamentos/arvore/')
+        for tipo in (TipoRecurso.AFIRE, TipoRecurso.AFIREQ):
+            arvore = self.get(f'/api/fundamentos/arvore/?tipo={tipo}')
+            self.assertEqual(arvore, [no for no in completa if no['tipo_recurso'] == tipo])
+
+        raiz, = self.get('/api/fundamentos/arvore/?tipo=AFIRE')
+        self.assertEqual([f['seq'] for f in raiz['children']], [4, 2])
+        self.assertEqual(raiz['children'][1]['children'][0]['seq'], 3)
+
+    def test_arvore_por_raiz_e_depth(self):
+        raiz, = self.get('/api/fundamentos/arvore/?raiz=2')
+        self.assertEqual((raiz['seq'], [f['seq'] for f in raiz['children']]), (2, [3]))
+
+        raiz, = self.get('/api/fundamentos/arvore/?raiz=1&depth=1')
+        self.assertEqual([f['seq'] for f in raiz['children']], [2, 4])
+        self.assertTrue(all(f['children'] == [] for f in raiz['children']))
+
+        raizes = self.get('/api/fundamentos/arvore/?depth=0')
+        self.assertEqual([(r['seq'], r['children']) for r in raizes], [(1, []), (5, [])])
+
+        self.assertEqual(self.status('/api/fundamentos/arvore/?raiz=999'), 404)
+        self.assertEqual(self.status('/api/fundamentos/arvore/?raiz=x'), 400)
+        self.assertEqual(self.status('/api/fundamentos/arvore/?depth=-1'), 400)
+
+    def test_colunas_desnormalizadas(self):
+        raiz = FundamentoLegal.objects.get(seq=1)
+        self.assertEqual((raiz.num_filhos, raiz.num_descendentes), (2, 3))
+        self.assertEqual(
+            [f.seq for f in FundamentoLegal.objects.descendentes_de(raiz)], [2, 3, 4]
+        )
+        neto = FundamentoLegal.objects.get(seq=3)
+        self.assertEqual((neto.nivel, neto.caminho_materializado), (2, '/1/2/3/'))
+        self.assertEqual([f.seq for f in FundamentoLegal.objects.ancestrais_de(neto)], [1, 2])
+        self.assertTrue(neto.eh_descendente_de(raiz))
+
+    def test_reparar_hierarquia_verificar(self):
+        FundamentoLegal.objects.filter(seq__in=[3, 4]).update(nivel=7)
+
+        saida = io.StringIO()
+        call_command('reparar_hierarquia', '--verificar', stdout=saida)
+        self.assertIn('2 fundamentos com hierarquia inconsistente', saida.getvalue())
+        self.assertEqual(FundamentoLegal.objects.filter(nivel=7).count(), 2)
+
+        call_command('reparar_hierarquia', stdout=io.StringIO())
+        saida = io.StringIO()
+        call_command('reparar_hierarquia', '--verificar', stdout=saida)
+        self.assertIn('Hierarquia consistente', saida.getvalue())
+        self.assertEqual(FundamentoLegal.objects.get(seq=3).nivel, 2)
+
+    def test_descendentes_e_ancestrais(self):
+        dados = self.get('/api/fundamentos/1/descendentes/')
+        self.assertEqual([f['seq'] for f in dados], [2, 3, 4])
+        self.assertEqual([(f['nivel'], f['profundidade']) for f in dados], [(1, 1), (2, 2), (1, 1)])
+        self.assertEqual([f['tem_filhos'] for f in dados], [True, False, False])
+
+        dados = self.get('/api/fundamentos/3/ancestrais/')
+        self.assertEqual([f['seq'] for f in dados], [1, 2])
+        self.assertEqual([(f['nivel'], f['profundidade']) for f in dados], [(0, -2), (1, -1)])
+        self.assertEqual(self.get('/api/fundamentos/1/ancestrais/'), [])
+
+    def test_descendentes_com_depth(self):
+        dados = self.get('/api/fundamentos/1/descendentes/?depth=1')
+        self.assertEqual([f['seq'] for f in dados], [2, 4])
+        for depth in ('0', '-1', 'x'):
+            self.assertEqual(self.status(f'/api/fundamentos/1/descendentes/?depth={depth}'), 400)
+        self.assertEqual(self.status('/api/fundamentos/999/descendentes/'), 404)
+
+    def test_ciclo_limitado_pela_profundidade_maxima(self):
+        FundamentoLegal.objects.filter(seq=2).update(pai=3)
+        self.assertEqual(len(self.get('/api/fundamentos/2/descendentes/')), PROFUNDIDADE_MAXIMA)
+        self.assertEqual(len(self.get('/api/fundamentos/3/ancestrais/')), PROFUNDIDADE_MAXIMA)
+
+    def test_ciclo_com_colunas_consistentes(self):
+        FundamentoLegal.objects.filter(seq=1).update(pai=3)
+        recalcular_hierarquia()
+        colunas = {
+            f.seq: (f.pai_id, f.num_filhos, f.num_descendentes, f.rgt - f.lft)
+            for f in FundamentoLegal.objects.filter(seq__in=[1, 2, 3, 4])
+        }
+        # 1 vira raiz; 3 (seu pai no ciclo) deixa de contá-lo como filho
+        self.assertEqual(colunas, {
+            1: (3, 2, 3, 7), 2: (1, 1, 1, 3), 3: (2, 0, 0, 1), 4: (1, 0, 0, 1),
+        })
+
+    def test_seq_fora_da_faixa(self):
+        for seq in ('99999999999999999999', str(2 ** 31)):
+            for url in (
+                f'/api/fundamentos/{seq}/', f'/api/fundamentos/{seq}/descendentes/',
+                f'/api/fundamentos/{seq}/ancestrais/', f'/api/fundamentos/arvore/?raiz={seq}',
+                f'/api/filhos/{seq}/', f'/detalhe/{seq}/',
+            ):
+                self.assertEqual(self.status(url), 404, url)
+            self.assertEqual(self.status(f'/api/fundamentos/lote/?seqs=1,{seq}'), 400)
+            self.assertEqual(self.get(f'/api/fundamentos/?pai={seq}')['count'], 0)
+
+
+def documento_indice(seq, **campos):
+    documento = {
+        'seq': seq, 'tipo_recurso': TipoRecurso.AFIRE, 'categoria': Categoria.GERAL,
+        'descricao': '', 'glossario': '', 'legislacao': '', 'texto': '',
+    }
+    documento.update(campos)
+    return documento
+
+
+class IndiceInvertidoTests(SimpleTestCase):
+    """Busca BM25F do índice em memória (?engine=index)"""
+
+    def test_peso_por_campo(self):
+        # Campos de mesmo tamanho em todos os documentos: só o peso do campo decide
+        indice = IndiceInvertido([
+            documento_indice(1, descricao='prazo', glossario='prazo', texto='recurso'),
+            documento_indice(2, descricao='recurso', glossario='prazo', texto='prazo'),
+            documento_indice(3, descricao='prazo', glossario='recurso', texto='prazo'),
+        ])
+        self.assertEqual([seq for seq, _ in indice.buscar('recurso')], [2, 3, 1])
+
+    def test_sem_acentos_no_indice_serializado(self):
+        indice = IndiceInvertido(
+            [documento_indice(1, descricao='Súmula de INADMISSÃO'), documento_indice(2, texto='outro')],
+            assinatura='v1',
+        )
+        with tempfile.TemporaryDirectory() as diretorio:
+            caminho = os.path.join(diretorio, 'indice.pickle')
+            indice.salvar(caminho)
+            carregado = IndiceInvertido.carregar(caminho)
+        self.assertEqual(carregado.assinatura, 'v1')
+        for consulta in ('sumula inadmissao', 'SÚMULA', 'inadmi'):
+            self.assertEqual([seq for seq, _ in carregado.buscar(consulta)], [1])
+        self.assertEqual(carregado.buscar('de'), [])
+
+
+class SugestoesTests(SimpleTestCase):
+    """Autocompletar por prefixo sobre os termos das descrições"""
+
+    def setUp(self):
+        self.prefixos = IndicePrefixos([
+            (1, 'Prazo recursal'), (2, 'Prazo em dobro'),
+            (3, 'Preparo recursal'), (4, 'Prequestionamento'),
+        ])
+
+    def sugerir(self, consulta, limite=10):
+        sugestoes = self.prefixos.sugerir(consulta, limite)
+        return (
+            [(t['termo'], t['frequencia']) for t in sugestoes['termos']],
+            [f['seq'] for f in sugestoes['fundamentos']],
+        )
+
+    def test_ordem_por_frequencia_e_termo(self):
+        self.assertEqual(self.sugerir('pr'), (
+            [('prazo', 2), ('preparo', 1), ('prequestionamento', 1)], [1, 2, 3, 4],
+        ))
+        self.assertEqual(self.sugerir('PRÉ'), ([('preparo', 1), ('prequestionamento', 1)], [3, 4]))
+
+    def test_limite(self):
+        self.assertEqual(self.sugerir('pr', limite=2), ([('prazo', 2), ('preparo', 1)], [1, 2]))
+
+    def test_palavras_anteriores_restringem(self):
+        self.assertEqual(self.sugerir('prazo de rec'), ([('prazo de recursal', 2)], [1]))
+
+    def test_consulta_curta_sem_sugestoes(self):
+        for consulta in ('', '  ', '-'):
+            self.assertEqual(self.sugerir(consulta), ([], []))
+
+
+@override_settings(CACHES=CACHE_TESTES)
+class IndiceVersaoTests(TestCase):
+    """Os índices em memória do processo acompanham a versão dos dados"""
+
+    def test_reconstroi_ao_mudar_versao(self):
+        FundamentoLegal.objects.create(seq=1, descricao='Prazo recursal', tipo_recurso=TipoRecurso.AFIRE)
+        primeira = registrar_versao('teste')
+        with tempfile.TemporaryDirectory() as diretorio:
+            caminho = os.path.join(diretorio, 'indice.pickle')
+            with self.settings(FUNDAMENTOS_INDICE_ARQUIVO=caminho):
+                gerar_arquivo_indice()
+                indice = obter_indice()
+                self.assertEqual(indice.assinatura, primeira.hash)
+                self.assertEqual([seq for seq, _ in indice.buscar('prazo')], [1])
+
+                FundamentoLegal.objects.create(
+                    seq=2, descricao='Prazo em dobro', tipo_recurso=TipoRecurso.AFIRE
+                )
+                segunda = registrar_versao('teste')
+                indice = obter_indice()
+        # O arquivo gerado para a versão anterior é ignorado
+        self.assertEqual(indice.assinatura, segunda.hash)
+        self.assertEqual([seq for seq, _ in indice.buscar('prazo')], [1, 2])
+        self.assertEqual([seq for seq, _ in indice.buscar('prazo dobro')], [2])
+
+    def test_sugestoes_limita_k(self):
+        for seq in range(1, 61):
+            FundamentoLegal.objects.create(
+                seq=seq, descricao=f'Prazo {seq}', tipo_recurso=TipoRecurso.AFIRE
+            )
+        registrar_versao('teste')
+
+        def get(url):
+            return self.client.get(url, HTTP_ACCEPT='application/json', secure=True)
+
+        dados = get('/api/fundamentos/sugestoes/?q=pra&k=100').json()
+        self.assertEqual(len(dados['fundamentos']), 50)
+        self.assertEqual(dados['termos'], [{'termo': 'prazo', 'frequencia': 60}])
+        self.assertEqual(len(get('/api/fundamentos/sugestoes/?q=pra').json()['fundamentos']), 10)
+        for k in ('0', 'x'):
+            self.assertEqual(get(f'/api/fundamentos/sugestoes/?q=pra&k={k}').status_code, 400)
+
+
+@override_settings(CACHES=CACHE_TESTES)
+class VersaoDadosTests(TestCase):
+    """Dados derivados ficam em cache até a próxima versão registrada"""
+
+    @classmethod
+    def setUpTestData(cls):
+        FundamentoLegal.objects.create(seq=1, descricao='Raiz', tipo_recurso=TipoRecurso.AFIRE)
+        recalcular_hierarquia()
+
+    def test_sem_versao_nao_usa_cache(self):
+        self.assertEqual(assinatura_dados(), '')
+        self.assertEqual(obter_estatisticas()['total'], 1)
+        FundamentoLegal.objects.create(seq=2, descricao='Outra', tipo_recurso=TipoRecurso.AFIRE)
+        self.assertEqual(obter_estatisticas()['total'], 2)
+
+    def test_nova_versao_invalida_cache(self):
+        primeira = registrar_versao('teste')
+        self.assertEqual(assinatura_dados(), primeira.hash)
+        self.assertEqual(obter_estatisticas()['total'], 1)
+
+        FundamentoLegal.objects.create(seq=2, descricao='Outra', tipo_recurso=TipoRecurso.AFIRE)
+        self.assertEqual(obter_estatisticas()['total'], 1)
+
+        segunda = registrar_versao('teste')
+        self.assertNotEqual(segunda.hash, primeira.hash)
+        self.assertEqual(obter_estatisticas()['total'], 2)
+
+    def test_mesmo_conteudo_mantem_versao(self):
+        primeira = registrar_versao('teste')
+        segunda = registrar_versao('teste')
+        self.assertEqual(primeira.hash, segunda.hash)
+        self.assertEqual(primeira.atualizado_em, segunda.atualizado_em)
+
+    def test_versao_lida_uma_vez_por_requisicao(self):
+        registrar_versao('teste')
+        with CaptureQueriesContext(connection) as contexto:
+            resposta = self.client.get(
+                '/api/fundamentos/arvore/?tipo=AFIRE', HTTP_ACCEPT='application/json', secure=True
+            )
+        self.assertEqual(resposta.status_code, 200)
+        tabela = VersaoDados._meta.db_table
+        self.assertEqual(sum(tabela in q['sql'] for q in contexto.captured_queries), 1)
+
+    def test_leitura_nao_sobrescreve_versao_publicada(self):
+        antiga = registrar_versao('teste')
+        with tempfile.TemporaryDirectory() as diretorio:
+            arquivo = {'default': {
+                'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                'LOCATION': diretorio,
+            }}
+            with self.settings(CACHES=arquivo):
+                cache = caches['default']
+                chave = _chave_versao()
+                # Outro worker publica a nova versão entre a leitura do banco e o preenchimento
+                cache.set(chave, ('nova', antiga.atualizado_em), timeout=None)
+                with mock.patch.object(cache, 'get', return_value=None):
+                    self.assertEqual(assinatura_dados(), antiga.hash)
+                self.assertEqual(cache.get(chave)[0], 'nova')
+
+    def test_versao_do_admin_le_so_os_editados(self):
+        primeira = registrar_versao('teste')
+        FundamentoLegal.objects.create(seq=2, descricao='Outra', tipo_recurso=TipoRecurso.AFIRE)
+        with CaptureQueriesContext(connection) as contexto:
+            segunda = registrar_versao('admin', [2])
+        self.assertNotEqual(segunda.hash, primeira.hash)
+        tabelas = (FundamentoLegal._meta.db_table, TextoFundamento._meta.db_table)
+        consultas = [
+            q['sql'] for q in contexto.captured_queries if any(t in q['sql'] for t in tabelas)
+        ]
+        self.assertEqual(len(consultas), 2)
+        self.assertTrue(all(' IN ' in sql for sql in consultas))
+
+
+class EstatisticasTests(TestCase):
+    """Contadores das estatísticas, todos vindos de uma consulta agregada"""
+
+    @classmethod
+    def setUpTestData(cls):
+        raiz = FundamentoLegal.objects.create(
+            seq=1, descricao='Raiz', glossario='Termo', categoria=Categoria.CIVEL,
+            tipo_recurso=TipoRecurso.AFIRE,
+        )
+        filho = FundamentoLegal.objects.create(
+            seq=2, pai=raiz, descricao='Filho', glossario='', selecionavel=False,
+            categoria=Categoria.CIVEL, tipo_recurso=TipoRecurso.AFIRE,
+        )
+        FundamentoLegal.objects.create(
+            seq=3, pai=filho, descricao='Neto', categoria=Categoria.CRIMINAL,
+            tipo_recurso=TipoRecurso.AFIRE,
+        )
+        FundamentoLegal.objects.create(
+            seq=4, descricao='Requisito', glossario='Termo', selecionavel=False,
+            tipo_recurso=TipoRecurso.AFIREQ,
+        )
+        recalcular_hierarquia()
+
+    def test_contadores(self):
+        with self.assertNumQueries(1):
+            estatisticas = calcular_estatisticas()
+
+        self.assertEqual(
+            {chave: estatisticas[chave] for chave in ('total', 'selecionaveis', 'com_glossario', 'raizes')},
+            {'total': 4, 'selecionaveis': 2, 'com_glossario': 2, 'raizes': 2},
+        )
+        self.assertEqual(estatisticas['por_tipo'], {
+            TipoRecurso.AFIRE.label: 3, TipoRecurso.AFIPO_RESP.label: 0,
+            TipoRecurso.AFIPO_RMS.label: 0, TipoRecurso.AFIREQ.label: 1,
+        })
+        self.assertEqual(estatisticas['por_categoria'], {'Cível': 2, 'Criminal': 1, 'Geral': 1})
+        self.assertEqual(estatisticas['por_nivel'], {0: 2, 1: 1, 2: 1})
+
+    def test_detalhes_por_tipo(self):
+        detalhes = calcular_estatisticas()['detalhes_por_tipo']
+        self.assertEqual(detalhes[TipoRecurso.AFIRE], {
+            'total': 3, 'selecionaveis': 2, 'com_glossario': 1, 'raizes': 1,
+            'por_nivel': {0: 1, 1: 1, 2: 1},
+        })
+        self.assertEqual(detalhes[TipoRecurso.AFIREQ], {
+            'total': 1, 'selecionaveis': 0, 'com_glossario': 1, 'raizes': 1,
+            'por_nivel': {0: 1},
+        })
+        self.assertEqual(detalhes[TipoRecurso.AFIPO_RMS], {
+            'total': 0, 'selecionaveis': 0, 'com_glossario': 0, 'raizes': 0,
+            'por_nivel': {},
+        })
+
+
+@override_settings(CACHES=CACHE_TESTES)
+class GetCondicionalTests(TestCase):
+    """Leituras da API respondem 304 enquanto a versão dos dados não muda"""
+
+    @classmethod
+    def setUpTestData(cls):
+        raiz = FundamentoLegal.objects.create(seq=1, descricao='Raiz', tipo_recurso=TipoRecurso.AFIRE)
+        FundamentoLegal.objects.create(seq=2, pai=raiz, descricao='Filho', tipo_recurso=TipoRecurso.AFIRE)
+        recalcular_hierarquia()
+        registrar_versao('teste')
+
+    def get(self, url, **cabecalhos):
+        return self.client.get(url, HTTP_ACCEPT='application/json', secure=True, **cabecalhos)
+
+    def test_etag_e_304(self):
+        for url in ('/api/fundamentos/?tipo=AFIRE', '/api/fundamentos/1/', '/api/filhos/1/'):
+            resposta = self.get(url)
+            self.assertEqual(resposta.status_code, 200)
+            self.assertIn('Last-Modified', resposta)
+            etag = resposta['ETag']
+            self.assertFalse(etag.startswith('W/'))
+
+            with CaptureQueriesContext(connection) as contexto:
+                resposta = self.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(resposta.status_code, 304)
+            tabela = FundamentoLegal._meta.db_table
+            self.assertFalse(any(tabela in q['sql'] for q in contexto.captured_queries))
+
+    def test_etag_depende_dos_parametros(self):
+        primeira = self.get('/api/fundamentos/?tipo=AFIRE&page=1')['ETag']
+        self.assertEqual(primeira, self.get('/api/fundamentos/?page=1&tipo=AFIRE')['ETag'])
+        self.assertNotEqual(primeira, self.get('/api/fundamentos/?tipo=AFIRE&page=2')['ETag'])
+
+    def test_nova_versao_muda_etag(self):
+        etag = self.get('/api/fundamentos/')['ETag']
+        FundamentoLegal.objects.filter(seq=2).update(descricao='Filho alterado')
+        registrar_versao('teste')
+        resposta = self.get('/api/fundamentos/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resposta.status_code, 200)
+        self.assertNotEqual(resposta['ETag'], etag)
+
+
+@override_settings(CACHES=CACHE_TESTES)
+class SnapshotsTests(TestCase):
+    """arvore?tipo=X transmite o snapshot estático, idêntico à resposta montada"""
+
+    @classmethod
+    def setUpTestData(cls):
+        raiz = FundamentoLegal.objects.create(seq=1, descricao='Raiz', tipo_recurso=TipoRecurso.AFIRE)
+        FundamentoLegal.objects.create(seq=2, pai=raiz, descricao='Filho', tipo_recurso=TipoRecurso.AFIRE)
+        recalcular_hierarquia()
+        registrar_versao('teste')
+
+    def get(self, url, **cabecalhos):
+        return self.client.get(url, HTTP_ACCEPT='application/json', secure=True, **cabecalhos)
+
+    def test_snapshot_igual_resposta(self):
+        url = '/api/fundamentos/arvore/?tipo=AFIRE'
+        with tempfile.TemporaryDirectory() as diretorio, self.settings(STATIC_ROOT=diretorio):
+            montada = self.get(url)
+            self.assertNotIsInstance(montada, FileResponse)
+
+            gerar_snapshots()
+            resposta = self.get(url, HTTP_ACCEPT_ENCODING='gzip')
+            self.assertIsInstance(resposta, FileResponse)
+            self.assertEqual(resposta['Content-Encoding'], 'gzip')
+            conteudo = gzip.decompress(b''.join(resposta.streaming_content))
+            resposta.close()
+        self.assertEqual(conteudo, montada.content)
+
+    def test_etag_por_codificacao(self):
+        url = '/api/fundamentos/arvore/?tipo=AFIRE'
+        with tempfile.TemporaryDirectory() as diretorio, self.settings(STATIC_ROOT=diretorio):
+            gerar_snapshots()
+            etags = {}
+            for codificacao in ('gzip', 'identity'):
+                resposta = self.get(url, HTTP_ACCEPT_ENCODING=codificacao)
+                b''.join(resposta.streaming_content)
+                self.assertIn('Accept-Encoding', resposta['Vary'])
+                etags[codificacao] = resposta['ETag']
+            self.assertEqual(etags['gzip'], etags['identity'][:-1] + '-gzip"')
+
+            for codificacao, etag in etags.items():
+                resposta = self.get(url, HTTP_ACCEPT_ENCODING=codificacao, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual((resposta.status_code, resposta['ETag']), (304, etag))
+
+    def test_geracao_anterior_mantida(self):
+        with tempfile.TemporaryDirectory() as diretorio, self.settings(STATIC_ROOT=diretorio):
+            primeira = gerar_snapshots()
+            FundamentoLegal.objects.filter(seq=2).update(descricao='Filho alterado')
+            registrar_versao('teste')
+            segunda = gerar_snapshots()
+            FundamentoLegal.objects.filter(seq=2).update(descricao='Filho de novo')
+            registrar_versao('teste')
+            gerar_snapshots()
+            arquivos = set(os.listdir(os.path.join(diretorio, 'fundamentos', 'snapshots')))
+        nome = 'arvore-AFIRE.json'
+        self.assertIn(segunda[nome], arquivos)
+        self.assertNotIn(primeira[nome], arquivos)
+
+
+class OrjsonRendererTests(SimpleTestCase):
+    """OrjsonRenderer produz os mesmos bytes que o JSONRenderer do DRF"""
+
+    def test_mesma_saida(self):
+        dados = {
+            'total': 3,
+            'por_nivel': {0: 1, 1: 2},
+            'descricao': 'Súmula 7\u2028"aspas"',
+            'relevancia': 1.25,
+            'pai': None,
+            'filhos': [{'seq': 2, 'selecionavel': True}],
+        }
+        self.assertEqual(OrjsonRenderer().render(dados), JSONRenderer().render(dados))
+
+    def test_indentacao_usa_json(self):
+        dados = {'seq': 1}
+        self.assertEqual(
+            OrjsonRenderer().render(dados, 'application/json; indent=4'),
+            JSONRenderer().render(dados, 'application/json; indent=4'),
+        )
+
+
+@skipUnless(msgpack, 'msgpack não instalado')
+@override_settings(CACHES=CACHE_TESTES)
+class MessagePackTests(TestCase):
+    """Accept: application/msgpack devolve os mesmos dados da resposta JSON"""
+
+    @classmethod
+    def setUpTestData(cls):
+        raiz = FundamentoLegal.objects.create(
+            seq=1, descricao='Súmula raiz', glossario='Glossário', tipo_recurso=TipoRecurso.AFIRE
+        )
+        FundamentoLegal.objects.create(seq=2, pai=raiz, descricao='Filho', tipo_recurso=TipoRecurso.AFIRE)
+        TextoFundamento.objects.create(fundamento=raiz, legislacao='Lei 1', texto_html='<p>Texto</p>')
+        recalcular_hierarquia()
+        registrar_versao('teste')
+
+    def get(self, url, accept):
+        resposta = self.client.get(url, HTTP_ACCEPT=accept, secure=True)
+        self.assertEqual(resposta.status_code, 200)
+        return resposta
+
+    def test_mesmos_dados_do_json(self):
+        for url in ('/api/fundamentos/', '/api/fundamentos/1/', '/api/fundamentos/arvore/?raiz=1'):
+            json_ = self.get(url, 'application/json')
+            resposta = self.get(url, 'application/msgpack')
+            self.assertEqual(resposta['Content-Type'], 'application/msgpack')
+            self.assertEqual(msgpack.unpackb(resposta.content), json_.json())
+            self.assertNotEqual(resposta['ETag'], json_['ETag'])
+
+
+@override_settings(CACHES=CACHE_TESTES)
+class ListaRapidaTests(TestCase):
+    """As listagens via values_list geram o mesmo JSON que FundamentoLegalListSerializer"""
+
+    @classmethod
+    def setUpTestData(cls):
+        raiz = FundamentoLegal.objects.create(
+            seq=10, descricao='Súmula “raiz” <b>', tipo_recurso=TipoRecurso.AFIPO_RMS,
+            categoria=Categoria.CRIMINAL, selecionavel=False,
+        )
+        for seq in range(11, 16):
+            FundamentoLegal.objects.create(
+                seq=seq, pai=raiz, descricao=f'Súmula filha {seq}',
+                tipo_recurso=TipoRecurso.AFIRE, selecionavel=seq % 2 == 0,
+            )
+        recalcular_hierarquia()
+        reindexar()
+
+    def renderizar(self, dados):
+        return JSONRenderer().render(dados)
+
+    def test_linhas_lista(self):
+        queryset = FundamentoLegal.objects.all()
+        self.assertEqual(
+            self.renderizar(linhas_lista(queryset.values_list(*CAMPOS_LISTA))),
+            self.renderizar(FundamentoLegalListSerializer(queryset, many=True).data),
+        )
+
+    def test_endpoints(self):
+        raiz = FundamentoLegal.objects.get(seq=10)
+        casos = {
+            '/api/fundamentos/?page_size=200': FundamentoLegal.objects.order_by('seq'),
+            '/api/filhos/10/': raiz.filhos.all(),
+            '/api/fundamentos/busca/?q=filha&engine=index':
+                FundamentoLegal.objects.filter(seq__gte=11).order_by('seq'),
+        }
+        for url, queryset in casos.items():
+            resposta = self.client.get(url, HTTP_ACCEPT='application/json', secure=True)
+            dados = resposta.json()
+            linhas = dados['results'] if isinstance(dados, dict) else dados
+            esperado = FundamentoLegalListSerializer(queryset, many=True).data
+            self.assertEqual(self.renderizar(linhas), self.renderizar(esperado), url)
+
+
+@override_settings(CACHES=CACHE_TESTES)
+class PaginacaoTests(TestCase):
+    """Paginação keyset e contagens em cache"""
+
+    @classmethod
+    def setUpTestData(cls):
+        for seq in range(1, 31):
+            tipo = TipoRecurso.AFIRE if seq % 3 else TipoRecurso.AFIREQ
+            FundamentoLegal.objects.create(seq=seq, descricao=f'Súmula {seq}', tipo_recurso=tipo)
+        recalcular_hierarquia()
+        registrar_versao('teste')
+
+    def get(self, url):
+        resposta = self.client.get(url, HTTP_ACCEPT='application/json', secure=True)
+        self.assertEqual(resposta.status_code, 200)
+        return resposta.json()
+
+    def percorrer(self, url):
+        vistos = []
+        pagina = self.get(url)
+        while True:
+            vistos.extend(f['seq'] for f in pagina['results'])
+            if not pagina['next']:
+                return vistos, pagina
+            pagina = self.get(pagina['next'])
+
+    def test_cursor_por_seq(self):
+        vistos, ultima = self.percorrer('/api/fundamentos/?paginacao=cursor&page_size=7')
+        self.assertEqual(vistos, list(range(1, 31)))
+        self.assertEqual(ultima['count'], 30)
+
+        anterior = self.get(ultima['previous'])
+        self.assertEqual([f['seq'] for f in anterior['results']], list(range(22, 29)))
+        self.assertIsNotNone(anterior['previous'])
+
+    def test_cursor_por_tipo_com_filtro(self):
+        vistos, _ = self.percorrer(
+            '/api/fundamentos/?paginacao=cursor&ordem=tipo&page_size=4&selecionavel=true'
+        )
+        esperado = list(
+            FundamentoLegal.objects.order_by('tipo_recurso', 'seq').values_list('seq', flat=True)
+        )
+        self.assertEqual(vistos, esperado)
+
+    def test_cursor_invalido(self):
+        resposta = self.client.get(
+            '/api/fundamentos/?paginacao=cursor&cursor=xyz', HTTP_ACCEPT='application/json',
+            secure=True,
+        )
+        self.assertEqual(resposta.status_code, 404)
+
+    def test_cursor_adulterado(self):
+        adulterados = [
+            {'o': 'seq', 'c': ['abc'], 'r': 0},
+            {'o': 'tipo', 'c': [1, {}], 'r': 0},
+            {'o': 'seq', 'c': [99999999999999999999], 'r': 0},
+            {'o': 'seq', 'c': [True], 'r': 0},
+            {'o': 'seq', 'c': [1], 'r': 'x'},
+            {'o': ['seq'], 'c': [1], 'r': 0},
+            [1, 2],
+        ]
+        for cursor in adulterados:
+            valor = base64.urlsafe_b64encode(json.dumps(cursor).encode()).decode()
+            resposta = self.client.get(
+                f'/api/fundamentos/?paginacao=cursor&cursor={valor}',
+                HTTP_ACCEPT='application/json', secure=True,
+            )
+            self.assertEqual(resposta.status_code, 404, cursor)
+
+    def test_contagem_em_cache(self):
+        self.get('/api/fundamentos/?tipo=AFIRE&page=1&page_size=5')
+        with CaptureQueriesContext(connection) as contexto:
+            dados = self.get('/api/fundamentos/?page_size=5&page=2&tipo=AFIRE')
+        self.assertEqual(dados['count'], 20)
+        self.assertFalse(any('COUNT(' in q['sql'] for q in contexto.captured_queries))
+
+
+@override_settings(CACHES=CACHE_TESTES)
+class LeituraEmMassaTests(TestCase):
+    """Lote com número fixo de consultas e exportação em streaming"""
+
+    @classmethod
+    def setUpTestData(cls):
+        raiz = FundamentoLegal.objects.create(seq=1, descricao='Raiz', tipo_recurso=TipoRecurso.AFIRE)
+        for seq in range(2, 22):
+            filho = FundamentoLegal.objects.create(
+                seq=seq, pai=raiz, descricao=f'Filho {seq}', tipo_recurso=TipoRecurso.AFIRE
+            )
+            FundamentoLegal.objects.create(
+                seq=seq + 100, pai=filho, descricao=f'Neto {seq}', tipo_recurso=TipoRecurso.AFIRE
+            )
+            filho.textos.create(legislacao='Lei', texto_html=f'<p>Texto {seq}</p>')
+        recalcular_hierarquia()
+
+    def lote(self, seqs, **extra):
+        with CaptureQueriesContext(connection) as contexto:
+            resposta = self.client.post(
+                '/api/fundamentos/lote/', {'seqs': seqs, **extra}, content_type='application/json',
+                HTTP_ACCEPT='application/json', secure=True,
+            )
+        self.assertEqual(resposta.status_code, 200)
+        consultas = [
+            q for q in contexto.captured_queries if VersaoDados._meta.db_table not in q['sql']
+        ]
+        return len(consultas), resposta.json()
+
+    def test_completo_igual_ao_detalhe(self):
+        self.lote([1])  # Constrói o índice da hierarquia
+        poucas, _ = self.lote([2, 3])
+        muitas, dados = self.lote([*range(2, 22), 999])
+        self.assertEqual(poucas, muitas)
+        self.assertLessEqual(muitas, 3)
+        self.assertEqual(dados['nao_encontrados'], [999])
+
+        detalhe = self.client.get(
+            '/api/fundamentos/5/', HTTP_ACCEPT='application/json', secure=True
+        ).json()
+        self.assertEqual(dados['fundamentos'][3], detalhe)
+
+    def test_compacto_por_get(self):
+        resposta = self.client.get(
+            '/api/fundamentos/lote/?seqs=105,1&formato=compacto',
+            HTTP_ACCEPT='application/json', secure=True,
+        )
+        dados = resposta.json()
+        self.assertEqual([f['seq'] for f in dados['fundamentos']], [105, 1])
+        self.assertEqual(dados['fundamentos'][1]['num_filhos'], 20)
+
+    def test_exportar(self):
+        resposta = self.client.get('/api/fundamentos/exportar/?tipo=AFIRE', secure=True)
+        self.assertEqual(resposta['Content-Type'], 'application/x-ndjson')
+        linhas = [json.loads(linha) for linha in b''.join(resposta.streaming_content).splitlines()]
+        self.assertEqual([r['seq'] for r in linhas], sorted(r['seq'] for r in linhas))
+        self.assertEqual(len(linhas), 41)
+        self.assertEqual(linhas[1]['textos'], [{'legislacao': 'Lei', 'texto_html': '<p>Texto 2</p>'}])
+
+        resposta = self.client.get(
+            '/api/fundamentos/exportar/?formato=csv', HTTP_ACCEPT='text/csv', secure=True
+        )
+        conteudo = b''.join(resposta.streaming_content).decode('utf-8')
+        registros = list(csv.DictReader(io.StringIO(conteudo)))
+        self.assertEqual(len(registros), 41)
+        self.assertEqual(json.loads(registros[1]['textos'])[0]['legislacao'], 'Lei')
+
+    def test_limite(self):
+        with self.settings(FUNDAMENTOS_LOTE_MAXIMO=5):
+            resposta = self.client.post(
+                '/api/fundamentos/lote/', {'seqs': list(range(1, 7))},
+                content_type='application/json', secure=True,
+            )
+        self.assertEqual(resposta.status_code, 400)
+
+
+CABECALHO_CSV = (
+    'SEQ_FUNDAMENTO_LEGAL#SEQ_FUNDAMENTO_LEGAL_PAI#DESCRICAO#NEUTRO#INFORMACAO'
+    '#JUSTIFICATIVA#SELECIONAVEL#GLOSSARIO\n'
+)
+
+
+@override_settings(CACHES=CACHE_TESTES, FUNDAMENTOS_INDICE_ARQUIVO=None)
+class ImportacaoTests(TestCase):
+    """importar_fundamentos grava em lote e liga pais entre arquivos"""
+
+    def setUp(self):
+        self.diretorio = tempfile.TemporaryDirectory()
+        self.addCleanup(self.diretorio.cleanup)
+        self.escrever('AFIRE_202505141514.csv', CABECALHO_CSV + (
+            '1##Raiz cível#N#N#N#N#Glossário\n'
+            '2#1#Filho#N#N#N#S#\n'
+            '3#40#Filho de outro arquivo#N#N#N#S#\n'
+            '4#999#Pai inexistente#N#N#N#S#\n'
+        ))
+        self.escrever('AFIREQ_202505141516.csv', CABECALHO_CSV + '40##Raiz AFIREQ#N#N#N#S#\n')
+        self.escrever('texto_fundamentos.txt', (
+            'SEQ\t\tLEGISLACAO\t\tTEXTO EM HTML\n'
+            '2\tLei 1\t<p>Texto</p>\n'
+            '999\tLei 2\t<p>Órfão</p>\n'
+        ))
+
+    def escrever(self, nome, conteudo):
+        with open(os.path.join(self.diretorio.name, nome), 'w', encoding='utf-8') as f:
+            f.write(conteudo)
+
+    def importar(self, *args):
+        call_command('importar_fundamentos', f'--dir={self.diretorio.name}', *args,
+                     stdout=io.StringIO())
+
+    def test_importacao(self):
+        self.importar()
+        pais = dict(FundamentoLegal.objects.values_list('seq', 'pai_id'))
+        self.assertEqual(pais, {1: None, 2: 1, 3: 40, 4: None, 40: None})
+        self.assertEqual(FundamentoLegal.objects.get(seq=1).categoria, Categoria.CIVEL)
+        self.assertEqual(FundamentoLegal.objects.get(seq=3).nivel, 1)
+        self.assertEqual(list(TextoFundamento.objects.values_list('fundamento_id', flat=True)), [2])
+
+    def test_leitura_paralela(self):
+        self.importar('--jobs=2')
+        pais = dict(FundamentoLegal.objects.values_list('seq', 'pai_id'))
+        self.assertEqual(pais, {1: None, 2: 1, 3: 40, 4: None, 40: None})
+        self.assertEqual(TextoFundamento.objects.count(), 1)
+
+    @skipIf(connection.vendor == 'postgresql', 'COPY disponível no PostgreSQL')
+    def test_carga_copy_exige_postgres(self):
+        with self.assertRaisesMessage(CommandError, 'PostgreSQL'):
+            self.importar('--carga=copy')
+        self.importar('--carga=orm')
+        self.assertEqual(FundamentoLegal.objects.count(), 5)
+
+    def linhas_gravadas(self):
+        campos = [
+            f.attname for f in FundamentoLegal._meta.concrete_fields
+            if f.attname not in ('criado_em', 'atualizado_em')
+        ]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT seq, busca_vetor::text FROM {FundamentoLegal._meta.db_table} ORDER BY seq"
+            )
+            vetores = cursor.fetchall()
+        return (
+            list(FundamentoLegal.objects.order_by('seq').values_list(*campos)),
+            list(TextoFundamento.objects.order_by('fundamento_id', 'id').values_list(
+                'fundamento_id', 'legislacao', 'texto_html'
+            )),
+            vetores,
+        )
+
+    @skipUnless(connection.vendor == 'postgresql', 'COPY só no PostgreSQL')
+    def test_carga_copy_igual_orm(self):
+        self.importar('--carga=orm')
+        orm = self.linhas_gravadas()
+        self.importar('--clear', '--carga=copy', '--suspender-indices')
+        self.assertEqual(self.linhas_gravadas(), orm)
+
+        self.escrever('AFIRE_202505141514.csv', CABECALHO_CSV + (
+            '1##Raiz cível#N#N#N#N#Glossário\n'
+            '2#1#Filho alterado#N#N#N#S#\n'
+            '3#1#Filho de outro arquivo#N#N#N#S#\n'
+            '5#1#Novo#N#N#N#S#\n'
+        ))
+        self.escrever('texto_fundamentos.txt', (
+            'SEQ\t\tLEGISLACAO\t\tTEXTO EM HTML\n'
+            '2\tLei 1\t<p>Texto\tcom tabulação e \\ barra</p>\n'
+            '5\tLei 5\t<p>Novo</p>\n'
+        ))
+        self.importar('--incremental', '--carga=copy')
+        incremental = self.linhas_gravadas()
+        self.importar('--clear', '--carga=orm')
+        self.assertEqual(incremental, self.linhas_gravadas())
+
+    def test_incremental(self):
+        self.importar()
+        criado_em = FundamentoLegal.objects.get(seq=2).criado_em
+        self.escrever('AFIRE_202505141514.csv', CABECALHO_CSV + (
+            '1##Raiz cível#N#N#N#N#Glossário\n'
+            '2#1#Filho alterado#N#N#N#S#\n'
+            '3#1#Filho de outro arquivo#N#N#N#S#\n'
+            '5#1#Novo#N#N#N#S#\n'
+        ))
+        saida = io.StringIO()
+        call_command('importar_fundamentos', f'--dir={self.diretorio.name}', '--incremental',
+                     stdout=saida)
+        self.assertIn(
+            '1 inseridos, 2 atualizados (1 com novo pai), 1 excluídos, 0 com textos alterados',
+            saida.getvalue(),
+        )
+
+        pais = dict(FundamentoLegal.objects.values_list('seq', 'pai_id'))
+        self.assertEqual(pais, {1: None, 2: 1, 3: 1, 5: 1, 40: None})
+        fundamento = FundamentoLegal.objects.get(seq=2)
+        self.assertEqual(fundamento.descricao, 'Filho alterado')
+        self.assertEqual(fundamento.criado_em, criado_em)
+        self.assertEqual(FundamentoLegal.objects.get(seq=1).num_filhos, 3)
+
+        saida = io.StringIO()
+        call_command('importar_fundamentos', f'--dir={self.diretorio.name}', '--incremental',
+                     stdout=saida)
+        self.assertIn('Nenhuma alteração', saida.getvalue())
+
+    def test_incremental_com_arquivo_ausente(self):
+        self.importar()
+        os.remove(os.path.join(self.diretorio.name, 'AFIREQ_202505141516.csv'))
+        os.remove(os.path.join(self.diretorio.name, 'texto_fundamentos.txt'))
+        saida = io.StringIO()
+        call_command('importar_fundamentos', f'--dir={self.diretorio.name}', '--incremental',
+                     stdout=saida)
+        self.assertIn('Nenhuma alteração', saida.getvalue())
+        pais = dict(FundamentoLegal.objects.values_list('seq', 'pai_id'))
+        self.assertEqual(pais, {1: None, 2: 1, 3: 40, 4: None, 40: None})
+        self.assertEqual(TextoFundamento.objects.count(), 1)
+
+    def test_incremental_mantido_filho_de_excluido(self):
+        self.escrever('AFIREQ_202505141516.csv', CABECALHO_CSV + (
+            '40##Raiz AFIREQ#N#N#N#S#\n'
+            '41#2#Filho AFIREQ de um AFIRE#N#N#N#S#\n'
+        ))
+        self.importar()
+        self.assertEqual(FundamentoLegal.objects.get(seq=2).num_filhos, 1)
+
+        os.remove(os.path.join(self.diretorio.name, 'AFIREQ_202505141516.csv'))
+        self.escrever('AFIRE_202505141514.csv', CABECALHO_CSV + (
+            '1##Raiz cível#N#N#N#N#Glossário\n'
+            '3#40#Filho de outro arquivo#N#N#N#S#\n'
+            '4#999#Pai inexistente#N#N#N#S#\n'
+        ))
+        saida = io.StringIO()
+        call_command('importar_fundamentos', f'--dir={self.diretorio.name}', '--incremental',
+                     stdout=saida)
+        self.assertIn('0 inseridos, 1 atualizados (1 com novo pai), 1 excluídos', saida.getvalue())
+        pais = dict(FundamentoLegal.objects.values_list('seq', 'pai_id'))
+        self.assertEqual(pais, {1: None, 3: 40, 4: None, 40: None, 41: None})
+        self.assertEqual(FundamentoLegal.objects.get(seq=41).nivel, 0)
+        self.assertEqual(FundamentoLegal.objects.get(seq=1).num_filhos, 0)
+
+    def test_leitor_csv(self):
+        caminho = os.path.join(self.diretorio.name, 'AFIRE_202505141514.csv')
+        registros = list(ler_fundamentos(caminho, TipoRecurso.AFIRE))
+        self.assertEqual([r.seq for r in registros], [1, 2, 3, 4])
+        self.assertEqual(registros[0], RegistroFundamento(
+            seq=1, pai_seq=None, descricao='Raiz cível', glossario='Glossário',
+            tipo_recurso=TipoRecurso.AFIRE, categoria=Categoria.CIVEL, neutro=False,
+            informacao=False, justificativa=False, selecionavel=False,
+        ))
+        self.assertEqual(registros[3].pai_seq, 999)
+
+    def test_textos_multilinha_e_rejeitados(self):
+        self.escrever('texto_fundamentos.txt', (
+            'SEQ\t\tLEGISLACAO\t\tTEXTO EM HTML\n'
+            '2\tLei 1\t<p>Primeira linha\n'
+            '<b>continuação</b></p>\n'
+            '999\tLei 2\t<p>Órfão</p>\n'
+            '1 \tsem html\n'
+        ))
+        self.importar()
+        self.assertEqual(
+            list(TextoFundamento.objects.values_list('fundamento_id', 'texto_html')),
+            [(2, '<p>Primeira linha\n<b>continuação</b></p>')],
+        )
+        caminho = os.path.join(self.diretorio.name, 'texto_fundamentos.rejeitados.tsv')
+        with open(caminho, encoding='utf-8') as f:
+            rejeitados = list(csv.reader(f, delimiter='\t'))
+        self.assertEqual([linha[:2] for linha in rejeitados[1:]], [
+            ['4', 'fundamento 999 não existe'],
+            ['5', 'esperados 3 campos separados por tabulação, há 2'],
+        ])
+
+    def test_textos_utf8_invalido(self):
+        with open(os.path.join(self.diretorio.name, 'texto_fundamentos.txt'), 'wb') as f:
+            f.write(b'SEQ\tLEGISLACAO\tTEXTO\n2\tLei\t<p>Ol\xe1</p>\n1\tLei\t<p>Ok</p>\n')
+        rejeitados = []
+        textos = list(ler_textos(os.path.join(self.diretorio.name, 'texto_fundamentos.txt'),
+                                 rejeitados))
+        self.assertEqual([(t.seq, t.linha) for t in textos], [(1, 3)])
+        self.assertEqual([(r.linha, r.motivo) for r in rejeitados],
+                         [(2, 'UTF-8 inválido na linha 2, byte 12')])
+
+    def test_reparar_encoding(self):
+        with open(os.path.join(self.diretorio.name, 'AFIRE_202505141514.csv'), 'wb') as f:
+            f.write((CABECALHO_CSV + '1##Decreto de ┐caráter geral└ — REGIÃ£O#N#N#N#S#\n').encode('utf-8'))
+        with open(os.path.join(self.diretorio.name, 'texto_fundamentos.txt'), 'wb') as f:
+            f.write(b'SEQ\tLEGISLACAO\tTEXTO\n1\tLei\t<p>Ol\xe1 a\xc3\x83\xc2\xa7\xc3\x83\xc2\xa3o</p>\n')
+        saida = io.StringIO()
+        call_command('importar_fundamentos', f'--dir={self.diretorio.name}', '--reparar-encoding',
+                     stdout=saida)
+        self.assertEqual(FundamentoLegal.objects.get(seq=1).descricao,
+                         'Decreto de "caráter geral" — REGIÃO')
+        self.assertEqual(TextoFundamento.objects.get().texto_html, '<p>Olá ação</p>')
+        self.assertIn('5 correções de encoding (2 caracteres de desenho de caixa, 1 bytes Latin-1, '
+                      '2 sequências de mojibake)', saida.getvalue())
+
+    def test_reimportacao_substitui(self):
+        self.importar()
+        self.escrever('texto_fundamentos.txt', (
+            'SEQ\t\tLEGISLACAO\t\tTEXTO EM HTML\n'
+            '2\tLei 1\t<p>Texto novo</p>\n'
+        ))
+        self.importar()
+        self.assertEqual(FundamentoLegal.objects.count(), 5)
+        self.assertEqual(
+            list(TextoFundamento.objects.values_list('texto_html', flat=True)), ['<p>Texto novo</p>']
+        )
+
+
+class ValidacaoDadosTests(SimpleTestCase):
+    """validar_dados: JSON, código de saída e arquivos sem alteração vindos do cache"""
+
+    def setUp(self):
+        self.diretorio = tempfile.TemporaryDirectory()
+        self.addCleanup(self.diretorio.cleanup)
+        configuracao = override_settings(
+            FUNDAMENTOS_VALIDACAO_CACHE=os.path.join(self.diretorio.name, 'cache', 'validacao.json')
+        )
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+        self.dados = os.path.join(self.diretorio.name, 'dados')
+        os.mkdir(self.dados)
+        self.escrever('AFIRE_202505141514.csv', CABECALHO_CSV + '1##Raiz "cível"#N#N#N#N#\n')
+        for seq, arquivo in enumerate(['AFIPO_(REsp_e AREsp)_202505141515.csv',
+                                       'AFIPO_(RMS)_202505141515.csv',
+                                       'AFIREQ_202505141516.csv'], start=2):
+            self.escrever(arquivo, CABECALHO_CSV + f'{seq}##Raiz {seq}#N#N#N#S#\n')
+        self.escrever('texto_fundamentos.txt', 'SEQ\tLEGISLACAO\tTEXTO\n1\tLei\t<p>Texto</p>\n')
+
+    def escrever(self, nome, conteudo):
+        with open(os.path.join(self.dados, nome), 'w', encoding='utf-8') as f:
+            f.write(conteudo)
+
+    def validar(self, *args):
+        saida = io.StringIO()
+        try:
+            call_command('validar_dados', f'--dir={self.dados}', *args, stdout=saida)
+        except CommandError:
+            return json.loads(saida.getvalue()), False
+        return json.loads(saida.getvalue()), True
+
+    def test_aprovado_e_cache(self):
+        relatorio, aprovado = self.validar()
+        self.assertTrue(aprovado)
+        self.assertEqual(relatorio['status'], 'PASS')
+        arquivo = relatorio['arquivos']['AFIRE_202505141514.csv']
+        self.assertEqual((arquivo['estrutura']['registros'], arquivo['em_cache']), (1, False))
+
+        relatorio, _ = self.validar()
+        self.assertTrue(relatorio['arquivos']['AFIRE_202505141514.csv']['em_cache'])
+        self.assertTrue(relatorio['arquivos']['texto_fundamentos.txt']['em_cache'])
+
+    def test_caracteres_proibidos_reprovam(self):
+        self.validar()
+        self.escrever('AFIRE_202505141514.csv', CABECALHO_CSV + '1##Raiz ┐cível└#N#N#N#N#\n')
+        relatorio, aprovado = self.validar()
+        self.assertFalse(aprovado)
+        arquivo = relatorio['arquivos']['AFIRE_202505141514.csv']
+        self.assertEqual(arquivo['status'], 'FAIL')
+        self.assertFalse(arquivo['em_cache'])
+        self.assertEqual(arquivo['caracteres_proibidos'], {'┐': 1, '└': 1})
+
+    def test_arquivo_ausente_reprova(self):
+        os.remove(os.path.join(self.dados, 'AFIREQ_202505141516.csv'))
+        relatorio, aprovado = self.validar()
+        self.assertFalse(aprovado)
+        self.assertEqual(relatorio['status'], 'FAIL')
+        self.assertEqual(relatorio['arquivos']['AFIREQ_202505141516.csv'], {'status': 'AUSENTE'})
+
+    def test_registros_iguais_aos_da_importacao(self):
+        # Campo com quebra de linha sem aspas: a continuação é descartada pelo leitor
+        self.escrever('AFIRE_202505141514.csv', CABECALHO_CSV + (
+            '1##Raiz#N#N#N#N#Primeira linha\n'
+            'continuação do glossário\n'
+            '5#1#Filho#N#N#N#S#\n'
+        ))
+        relatorio, aprovado = self.validar()
+        self.assertTrue(aprovado)
+        arquivo = relatorio['arquivos']['AFIRE_202505141514.csv']
+        self.assertEqual(arquivo['status'], 'WARN')
+        self.assertEqual(arquivo['estrutura'], {'registros': 2, 'linhas_descartadas': [3]})
+        caminho = os.path.join(self.dados, 'AFIRE_202505141514.csv')
+        self.assertEqual(len(list(ler_fundamentos(caminho, TipoRecurso.AFIRE))), 2)
+
+        self.escrever('AFIRE_202505141514.csv', 'SEQ#DESCRICAO\n1#Raiz\n')
+        relatorio, _ = self.validar()
+        self.assertEqual(relatorio['arquivos']['AFIRE_202505141514.csv']['erros'],
+                         ['colunas obrigatórias ausentes: SEQ_FUNDAMENTO_LEGAL'])
+
+    def test_avisos_de_estrutura(self):
+        self.escrever('texto_fundamentos.txt', 'SEQ\tLEGISLACAO\tTEXTO\n1\tsem html\n')
+        relatorio, aprovado = self.validar()
+        self.assertTrue(aprovado)
+        self.assertEqual(relatorio['arquivos']['texto_fundamentos.txt']['status'], 'WARN')
+        _, aprovado = self.validar('--estrito')
+        self.assertFalse(aprovado)
@@ -0,0 +1,225 @@
+"""
+Validação dos arquivos de dados do STJ antes da importação
+(manage.py validar_dados), a partir de validar_correcoes.py.
+
+Cada arquivo é lido uma única vez, em blocos: o SHA-256 é calculado sobre
+os bytes, uma expressão regular procura em cada bloco os caracteres
+proibidos e os bytes que não são UTF-8, e as linhas passam pelos mesmos
+leitores da importação (ler_fundamentos e ler_textos), então a estrutura
+validada é a que será carregada. Um arquivo esperado que falta reprova a
+validação. O resultado fica em FUNDAMENTOS_VALIDACAO_CACHE, junto com
+tamanho, mtime e hash do arquivo: um arquivo sem alterações não é lido de
+novo.
+"""
+import codecs
+import hashlib
+import json
+import os
+import re
+from collections import Counter
+from functools import partial
+
+from django.conf import settings
+
+from .importacao import (
+    ARQUIVO_TEXTOS, ARQUIVOS, avisos_fundamentos, ler_fundamentos, ler_textos,
+)
+from .reparo import CARACTERES_CAIXA, TAMANHO_BLOCO
+
+# Incrementar quando as regras mudarem, para descartar resultados em cache
+VERSAO_REGRAS = 2
+
+# Caracteres que não devem estar presentes após a correção, e bytes
+# inválidos (surrogates do surrogateescape)
+PADRAO_PROIBIDOS = re.compile('[%s\udc80-\udcff]' % ''.join(map(re.escape, CARACTERES_CAIXA)))
+
+# Quantas linhas de cada problema são listadas no resultado
+MAXIMO_EXEMPLOS = 20
+
+
+class Varredura:
+    """
+    Lê o arquivo em blocos e gera as linhas, acumulando hash, tamanho e
+    caracteres proibidos. Pode ser passada a ler_textos() como reparador.
+    """
+
+    def __init__(self):
+        self.sha = hashlib.sha256()
+        self.tamanho = 0
+        self.linhas_lidas = 0
+        self.proibidos = Counter()
+
+    def linhas(self, caminho):
+        decodificador = codecs.getincrementaldecoder('utf-8')('surrogateescape')
+        resto = ''
+        with open(caminho, 'rb') as arquivo:
+            while True:
+                bruto = arquivo.read(TAMANHO_BLOCO)
+                self.sha.update(bruto)
+                self.tamanho += len(bruto)
+                bloco = decodificador.decode(bruto, final=not bruto)
+                if PADRAO_PROIBIDOS.search(bloco):
+                    self.proibidos.update(PADRAO_PROIBIDOS.findall(bloco))
+                linhas = (resto + bloco).split('\n')
+                resto = linhas.pop()
+                self.linhas_lidas += len(linhas)
+                for linha in linhas:
+                    yield linha + '\n'
+                if not bruto:
+                    break
+        if resto:
+            self.linhas_lidas += 1
+            yield resto
+
+    def resultado(self):
+        proibidos = {
+            caractere: total for caractere, total in self.proibidos.items()
+            if caractere in CARACTERES_CAIXA
+        }
+        return {
+            'sha256': self.sha.hexdigest(),
+            'bytes': self.tamanho,
+            'linhas': self.linhas_lidas,
+            'caracteres_proibidos': proibidos,
+            'bytes_invalidos': sum(self.proibidos.values()) - sum(proibidos.values()),
+        }
+
+
+def validar_csv(caminho, tipo_recurso):
+    varredura = Varredura()
+    rejeitados = []
+    registros = list(
+        ler_fundamentos(caminho, tipo_recurso, reparador=varredura, rejeitados=rejeitados)
+    )
+    # Cabeçalho inválido (linha 1) ou arquivo sem registros: a importação
+    # incremental excluiria todos os fundamentos do tipo
+    erros = [r.motivo for r in rejeitados if r.linha == 1]
+    if not registros and not erros:
+        erros.append('nenhum registro')
+    descartadas = [r for r in rejeitados if r.linha > 1]
+    estrutura = {'registros': len(registros)}
+    if descartadas:
+        estrutura['linhas_descartadas'] = [r.linha for r in descartadas[:MAXIMO_EXEMPLOS]]
+    return varredura, estrutura, erros, avisos_fundamentos(registros, descartadas)
+
+
+def validar_textos(caminho):
+    varredura = Varredura()
+    rejeitados = []
+    registros = sum(1 for _ in ler_textos(caminho, rejeitados, reparador=varredura))
+    estrutura = {'registros': registros}
+    avisos = []
+    if rejeitados:
+        avisos.append(f'{len(rejeitados)} registros rejeitados')
+        estrutura['rejeitados'] = [
+            {'linha': r.linha, 'motivo': r.motivo} for r in rejeitados[:MAXIMO_EXEMPLOS]
+        ]
+    return varredura, estrutura, [], avisos
+
+
+def validar_arquivo(caminho, validador):
+    """Valida o arquivo em uma passada; status FAIL, WARN ou PASS"""
+    varredura, estrutura, erros, avisos = validador(caminho)
+    resultado = varredura.resultado()
+    if resultado['caracteres_proibidos']:
+        erros.append('caracteres proibidos: ' + ', '.join(
+            f"'{caractere}' ({total})" for caractere, total in resultado['caracteres_proibidos'].items()
+        ))
+    if resultado['bytes_invalidos']:
+        erros.append(f"{resultado['bytes_invalidos']} bytes que não são UTF-8 válido")
+    resultado.update(
+        estrutura=estrutura,
+        erros=erros,
+        avisos=avisos,
+        status='FAIL' if erros else 'WARN' if avisos else 'PASS',
+    )
+    return resultado
+
+
+def sha256_arquivo(caminho):
+    sha = hashlib.sha256()
+    with open(caminho, 'rb') as arquivo:
+        for bloco in iter(lambda: arquivo.read(TAMANHO_BLOCO), b''):
+            sha.update(bloco)
+    return sha.hexdigest()
+
+
+def arquivo_cache():
+    return getattr(settings, 'FUNDAMENTOS_VALIDACAO_CACHE', None)
+
+
+def ler_cache(caminho):
+    if not caminho:
+        return {}
+    try:
+        with open(caminho, encoding='utf-8') as arquivo:
+            cache = json.load(arquivo)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(cache, dict) or cache.get('versao') != VERSAO_REGRAS:
+        return {}
+    return cache.get('arquivos', {})
+
+
+def gravar_cache(caminho, arquivos):
+    if not caminho:
+        return
+    os.makedirs(os.path.dirname(caminho) or '.', exist_ok=True)
+    temporario = f'{caminho}.tmp'
+    with open(temporario, 'w', encoding='utf-8') as arquivo:
+        json.dump({'versao': VERSAO_REGRAS, 'arquivos': arquivos}, arquivo, ensure_ascii=False)
+    os.replace(temporario, caminho)
+
+
+def validar_diretorio(diretorio, usar_cache=True):
+    """
+    Valida os arquivos de ARQUIVOS e ARQUIVO_TEXTOS em diretorio. Retorna
+    o relatório: status geral (FAIL se algum arquivo falhar ou faltar) e,
+    por arquivo, o resultado e se ele veio do cache (mesmo tamanho e mtime,
+    ou mesmo SHA-256).
+    """
+    validadores = {
+        arquivo: partial(validar_csv, tipo_recurso=tipo) for tipo, arquivo in ARQUIVOS.items()
+    }
+    validadores[ARQUIVO_TEXTOS] = validar_textos
+
+    caminho_cache = arquivo_cache()
+    cache = ler_cache(caminho_cache) if usar_cache else {}
+    novo_cache = {}
+    arquivos = {}
+    for nome, validador in validadores.items():
+        caminho = os.path.join(diretorio, nome)
+        try:
+            estado = os.stat(caminho)
+        except OSError:
+            arquivos[nome] = {'status': 'AUSENTE'}
+            continue
+        chave = os.path.abspath(caminho)
+        anterior = cache.get(chave)
+        em_cache = False
+        if anterior and anterior['bytes'] == estado.st_size:
+            if anterior['mtime_ns'] == estado.st_mtime_ns:
+                em_cache = True
+            elif anterior['sha256'] == sha256_arquivo(caminho):
+                em_cache = True
+        if em_cache:
+            resultado = dict(anterior)
+        else:
+            resultado = validar_arquivo(caminho, validador)
+        resultado['mtime_ns'] = estado.st_mtime_ns
+        novo_cache[chave] = resultado
+        arquivos[nome] = {**resultado, 'em_cache': em_cache}
+
+    try:
+        gravar_cache(caminho_cache, {**cache, **novo_cache})
+    except OSError:
+        pass  # sem cache gravável, a próxima execução valida tudo de novo
+
+    # Um arquivo ausente também reprova: a importação seguiria sem ele
+    if any(r['status'] in ('FAIL', 'AUSENTE') for r in arquivos.values()):
+        status = 'FAIL'
+    elif any(r['status'] == 'WARN' for r in arquivos.values()):
+        status = 'WARN'
+    else:
+        status = 'PASS'
+    return {'diretorio': os.path.abspath(diretorio), 'status': status, 'arquivos': arquivos}
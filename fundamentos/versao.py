@@ -0,0 +1,187 @@
+"""
+Versão do conjunto de dados de fundamentos.
+
+A versão (hash do conteúdo + data) fica gravada em VersaoDados pelo
+importador e pelo admin, e é publicada no cache compartilhado. Estruturas
+derivadas (árvore, índices, estatísticas, respostas) usam a versão em suas
+chaves, de modo que todos os workers as descartam no mesmo momento.
+
+Dentro de uma requisição (VersaoPorRequisicaoMiddleware) a versão é lida
+uma única vez, por mais estruturas derivadas que a consultem.
+"""
+import hashlib
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import connection, transaction
+from django.utils import timezone
+
+CAMPOS_HASH_FUNDAMENTO = (
+    'seq', 'pai_id', 'descricao', 'glossario', 'tipo_recurso', 'categoria',
+    'neutro', 'informacao', 'justificativa', 'selecionavel',
+)
+CAMPOS_HASH_TEXTO = ('fundamento_id', 'legislacao', 'texto_html')
+
+# Versão já lida na requisição em andamento (None fora de uma requisição)
+_versao_requisicao = ContextVar('fundamentos_versao_requisicao', default=None)
+
+
+class Versao:
+    """Hash e data da versão atual dos dados ('' e None antes da primeira importação)"""
+
+    __slots__ = ('hash', 'atualizado_em')
+
+    def __init__(self, hash='', atualizado_em=None):
+        self.hash = hash
+        self.atualizado_em = atualizado_em
+
+
+def _cache():
+    return caches[getattr(settings, 'FUNDAMENTOS_CACHE', 'default')]
+
+
+def _cache_compartilhado():
+    """O cache local de memória não é visto pelos outros workers"""
+    return not isinstance(_cache(), LocMemCache)
+
+
+def _chave_versao():
+    # O nome do banco separa, no mesmo cache, bancos distintos (ex.: o de testes)
+    banco = hashlib.sha1(str(connection.settings_dict['NAME']).encode()).hexdigest()[:12]
+    return f'fundamentos:versao:{banco}'
+
+
+def calcular_hash(seqs=None, anterior=''):
+    """
+    Hash SHA-256 do conteúdo de fundamentos e textos, em ordem estável.
+    Com seqs, só as linhas desses fundamentos entram no hash, encadeado ao
+    hash anterior (versão das edições do admin).
+    """
+    from .models import FundamentoLegal, TextoFundamento
+
+    resumo = hashlib.sha256()
+    fundamentos = FundamentoLegal.objects.all()
+    textos = TextoFundamento.objects.all()
+    if seqs is not None:
+        seqs = sorted(set(seqs))
+        resumo.update(f'{anterior}\n{seqs!r}\n'.encode('utf-8'))
+        fundamentos = fundamentos.filter(seq__in=seqs)
+        textos = textos.filter(fundamento_id__in=seqs)
+    consultas = (
+        fundamentos.order_by('seq').values_list(*CAMPOS_HASH_FUNDAMENTO),
+        textos.order_by('fundamento_id', 'id').values_list(*CAMPOS_HASH_TEXTO),
+    )
+    for consulta in consultas:
+        for linha in consulta.iterator(chunk_size=2000):
+            resumo.update(repr(linha).encode('utf-8'))
+            resumo.update(b'\n')
+        resumo.update(b'--\n')
+    return resumo.hexdigest()
+
+
+def versao_atual():
+    """Versão atual dos dados, lida do cache compartilhado ou do banco"""
+    memo = _versao_requisicao.get()
+    if memo is not None and 'versao' in memo:
+        return memo['versao']
+    versao = _ler_versao()
+    if memo is not None:
+        memo['versao'] = versao
+    return versao
+
+
+def _ler_versao():
+    from .models import VersaoDados
+
+    cache = _cache()
+    compartilhado = _cache_compartilhado()
+    if compartilhado:
+        valor = cache.get(_chave_versao())
+        if valor is not None:
+            return Versao(*valor)
+
+    registro = VersaoDados.objects.filter(pk=1).first()
+    versao = Versao(registro.hash, registro.atualizado_em) if registro else Versao()
+    if compartilhado and registro:
+        # add, e não set: se registrar_versao publicou uma versão depois da
+        # leitura acima, ela não é sobrescrita pela antiga. O prazo limita o
+        # que restar de desatualizado (ex.: a chave expirou no meio)
+        cache.add(
+            _chave_versao(), (versao.hash, versao.atualizado_em),
+            timeout=getattr(settings, 'FUNDAMENTOS_VERSAO_TIMEOUT', 300),
+        )
+    return versao
+
+
+def assinatura_dados():
+    """Identificador da versão atual, usado nas chaves de estruturas derivadas"""
+    return versao_atual().hash
+
+
+def registrar_versao(origem, seqs=None):
+    """
+    Recalcula o hash dos dados e grava a nova versão. Se o conteúdo não
+    mudou, a versão existente é mantida e os caches continuam válidos.
+
+    Com seqs (edições pontuais, no admin), o hash não relê a base inteira:
+    encadeia o hash anterior ao conteúdo atual desses fundamentos e sempre
+    gera uma nova versão. A próxima importação volta ao hash do conteúdo.
+    """
+    from .models import VersaoDados
+
+    memo = _versao_requisicao.get()
+    if memo is not None:
+        memo.pop('versao', None)
+    with transaction.atomic():
+        registro = VersaoDados.objects.select_for_update().filter(pk=1).first()
+        if seqs is not None and registro is not None:
+            novo_hash = calcular_hash(seqs, anterior=registro.hash)
+        else:
+            novo_hash = calcular_hash()
+        if registro is None or registro.hash != novo_hash:
+            registro, _ = VersaoDados.objects.update_or_create(
+                pk=1,
+                defaults={
+                    'hash': novo_hash,
+                    'atualizado_em': timezone.now(),
+                    'origem': origem,
+                },
+            )
+        versao = (registro.hash, registro.atualizado_em)
+        transaction.on_commit(lambda: _cache().set(_chave_versao(), versao, timeout=None))
+    return Versao(*versao)
+
+
+class VersaoPorRequisicaoMiddleware:
+    """Memoriza versao_atual() durante cada requisição"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = _versao_requisicao.set({})
+        try:
+            return self.get_response(request)
+        finally:
+            _versao_requisicao.reset(token)
+
+
+def chave_versionada(nome, *partes, versao=None):
+    """Chave de cache para dados derivados da versão atual"""
+    # As partes podem vir da query string; o hash mantém a chave válida em qualquer backend
+    sufixo = hashlib.sha1(repr(partes).encode('utf-8')).hexdigest()
+    return f'fundamentos:{versao or assinatura_dados()}:{nome}:{sufixo}'
+
+
+def cache_versionado(nome, funcao, *partes):
+    """
+    Resultado de funcao() guardado no cache até a próxima versão dos dados.
+    Sem versão registrada não há como invalidar, então nada é guardado.
+    """
+    versao = assinatura_dados()
+    if not versao:
+        return funcao()
+    chave = chave_versionada(nome, *partes, versao=versao)
+    return _cache().get_or_set(chave, funcao, timeout=None)
@@ -1,40 +1,65 @@
+from django.conf import settings
 from django.shortcuts import render, get_object_or_404
-from django.db.models import Q, Count
-from django.http import JsonResponse
-from rest_framework import viewsets, filters, status
+from django.http import FileResponse, Http404, JsonResponse, StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.decorators import method_decorator
+from rest_framework import viewsets, status
 from rest_framework.decorators import action, api_view
 from rest_framework.response import Response
-from rest_framework.pagination import PageNumberPagination
 
-from .models import FundamentoLegal, TextoFundamento, TipoRecurso, Categoria
+from .busca import BuscaTextualFilter, OrdenacaoFilter, obter_backend
+from .condicional import condicional, etag_codificada, resposta_304_codificada
+from .consultas import listar_ancestrais, listar_descendentes
+from .estatisticas import obter_estatisticas
+from .exportacao import FORMATOS as FORMATOS_EXPORTACAO
+from .hierarquia import linhas_arvore, montar_arvore
+from .indice import obter_indice
+from .sugestoes import obter_prefixos
+from .models import SEQ_MAXIMO, SEQ_MINIMO, FundamentoLegal, TextoFundamento, TipoRecurso, Categoria, seq_valido
+from .paginacao import CursorPagination, StandardPagination
+from .renderers import NegociacaoFixa
+from .snapshots import abrir_snapshot, snapshot_atual
+from .versao import cache_versionado
 from .serializers import (
+    CAMPOS_LISTA,
     FundamentoLegalListSerializer,
     FundamentoLegalDetailSerializer,
-    FundamentoLegalTreeSerializer,
-    TextoFundamentoSerializer
+    TextoFundamentoSerializer,
+    linhas_lista,
 )
 
 
-class StandardPagination(PageNumberPagination):
-    page_size = 50
-    page_size_query_param = 'page_size'
-    max_page_size = 200
+def seq_ou_404(valor):
+    """Seq informado na URL; um valor fora da faixa de seq não existe no banco"""
+    try:
+        seq = int(valor)
+    except (TypeError, ValueError):
+        raise Http404
+    if not seq_valido(seq):
+        raise Http404
+    return seq
 
 
+@method_decorator(condicional, name='dispatch')
 class FundamentoLegalViewSet(viewsets.ReadOnlyModelViewSet):
     """
     API para consulta de fundamentos legais do STJ.
     
     Endpoints:
-    - GET /api/fundamentos/ - Lista todos os fundamentos
+    - GET /api/fundamentos/ - Lista todos os fundamentos (?paginacao=cursor para keyset)
     - GET /api/fundamentos/{seq}/ - Detalhe de um fundamento
     - GET /api/fundamentos/arvore/ - Visualização em árvore
     - GET /api/fundamentos/busca/ - Busca textual
+    - GET /api/fundamentos/sugestoes/?q=pre - Autocompletar
     - GET /api/fundamentos/estatisticas/ - Estatísticas gerais
+    - GET|POST /api/fundamentos/lote/ - Vários fundamentos por seq
+    - GET /api/fundamentos/exportar/?formato=ndjson|csv - Exportação completa
+    - GET /api/fundamentos/{seq}/descendentes/ - Descendentes em pré-ordem
+    - GET /api/fundamentos/{seq}/ancestrais/ - Caminho desde a raiz
     """
     queryset = FundamentoLegal.objects.all()
     pagination_class = StandardPagination
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [BuscaTextualFilter, OrdenacaoFilter]
     search_fields = ['descricao', 'glossario']
     ordering_fields = ['seq', 'tipo_recurso', 'categoria']
     ordering = ['seq']
@@ -70,89 +95,275 @@ class FundamentoLegalViewSet(viewsets.ReadOnlyModelViewSet):
         # Filtro por pai específico
         pai = self.request.query_params.get('pai')
         if pai:
-            queryset = queryset.filter(pai__seq=pai)
+            try:
+                pai = int(pai)
+            except ValueError:
+                pai = None
+            if seq_valido(pai):
+                queryset = queryset.filter(pai__seq=pai)
+            else:
+                queryset = queryset.none()
         
         return queryset
 
+    @property
+    def paginator(self):
+        # ?paginacao=cursor troca a paginação por número de página pela keyset
+        if not hasattr(self, '_paginator'):
+            if self.action == 'list' and self.request.query_params.get('paginacao') == 'cursor':
+                self._paginator = CursorPagination()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
+    def get_object(self):
+        seq_ou_404(self.kwargs[self.lookup_field])
+        return super().get_object()
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        return self._listar(queryset)
+
+    def _listar(self, queryset):
+        """Página de linhas no formato de FundamentoLegalListSerializer, via values_list"""
+        queryset = queryset.values_list(*CAMPOS_LISTA)
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(linhas_lista(page))
+        return Response(linhas_lista(queryset))
+
     @action(detail=False, methods=['get'])
     def arvore(self, request):
-        """Retorna fundamentos em estrutura de árvore"""
+        """
+        Retorna fundamentos em estrutura de árvore, montada a partir de uma
+        única consulta. ?raiz=<seq> restringe à subárvore de um fundamento e
+        ?depth=N limita os níveis abaixo das raízes.
+        """
         tipo = request.query_params.get('tipo')
-        
-        queryset = FundamentoLegal.objects.filter(pai__isnull=True)
-        if tipo:
-            queryset = queryset.filter(tipo_recurso=tipo)
-        
-        serializer = FundamentoLegalTreeSerializer(queryset, many=True)
-        return Response(serializer.data)
+        raiz = request.query_params.get('raiz')
+        depth = request.query_params.get('depth')
+
+        profundidade = None
+        if depth:
+            try:
+                profundidade = int(depth)
+            except ValueError:
+                profundidade = -1
+            if profundidade < 0:
+                return Response({'erro': 'depth deve ser um inteiro não negativo'},
+                              status=status.HTTP_400_BAD_REQUEST)
+
+        if raiz:
+            try:
+                raiz = int(raiz)
+            except ValueError:
+                return Response({'erro': 'raiz deve ser um seq numérico'},
+                              status=status.HTTP_400_BAD_REQUEST)
+            if not seq_valido(raiz):
+                raise Http404
+            arvore = cache_versionado(
+                'arvore', lambda: self._arvore_raiz(raiz, profundidade), 'raiz', raiz, profundidade
+            )
+            if not arvore:
+                raise Http404
+            return Response(arvore)
+
+        if tipo and profundidade is None and request.accepted_renderer.format == 'json':
+            resposta = self._snapshot(request, f'arvore-{tipo}.json')
+            if resposta is not None:
+                return resposta
+
+        arvore = cache_versionado(
+            'arvore', lambda: self._arvore_tipo(tipo, profundidade), 'tipo', tipo, profundidade
+        )
+        return Response(arvore)
+
+    def _snapshot(self, request, nome):
+        """
+        Transmite o snapshot estático da versão atual, se existir. A variante
+        comprimida tem ETag própria (a da versão sem compressão já foi
+        comparada por @condicional).
+        """
+        caminho = snapshot_atual(nome)
+        if caminho is None:
+            return None
+        arquivo, codificacao = abrir_snapshot(caminho, request.headers.get('Accept-Encoding', ''))
+        etag = etag_codificada(request, codificacao)
+        resposta = resposta_304_codificada(request, etag) if codificacao else None
+        if resposta is not None:
+            arquivo.close()
+        else:
+            resposta = FileResponse(arquivo, content_type='application/json')
+            if codificacao:
+                resposta['Content-Encoding'] = codificacao
+        if etag:
+            resposta['ETag'] = etag
+        patch_vary_headers(resposta, ['Accept-Encoding'])
+        return resposta
+
+    def _arvore_raiz(self, raiz, profundidade):
+        linhas = listar_descendentes(raiz, profundidade)
+        if not linhas:
+            return []
+        return montar_arvore(linhas, raizes=[raiz])
+
+    def _arvore_tipo(self, tipo, profundidade):
+        return montar_arvore(linhas_arvore(tipo, profundidade))
 
     @action(detail=False, methods=['get'])
     def busca(self, request):
-        """Busca textual em descrição e glossário"""
+        """Busca textual em descrição, glossário e textos, ordenada por relevância"""
         termo = request.query_params.get('q', '')
         if not termo or len(termo) < 2:
             return Response({'erro': 'Termo de busca deve ter pelo menos 2 caracteres'}, 
                           status=status.HTTP_400_BAD_REQUEST)
         
-        # Busca em múltiplos campos
-        queryset = FundamentoLegal.objects.filter(
-            Q(descricao__icontains=termo) | 
-            Q(glossario__icontains=termo)
-        )
-        
-        # Aplicar filtros adicionais
         tipo = request.query_params.get('tipo')
+        categoria = request.query_params.get('categoria')
+
+        engine = request.query_params.get('engine', 'banco')
+        if engine == 'index':
+            return self._busca_indice(termo, tipo, categoria)
+        if engine != 'banco':
+            return Response({'erro': "engine deve ser 'banco' ou 'index'"},
+                          status=status.HTTP_400_BAD_REQUEST)
+
+        queryset = FundamentoLegal.objects.all()
+
+        # Aplicar filtros adicionais
         if tipo:
             queryset = queryset.filter(tipo_recurso=tipo)
         
-        categoria = request.query_params.get('categoria')
         if categoria:
             queryset = queryset.filter(categoria=categoria)
-        
-        # Paginação
-        page = self.paginate_queryset(queryset)
+
+        # Busca em múltiplos campos, pelo backend configurado
+        queryset = obter_backend().buscar(queryset, termo)
+        return self._listar(queryset)
+
+    def _busca_indice(self, termo, tipo, categoria):
+        """Busca no índice invertido em memória (?engine=index)"""
+        seqs = [seq for seq, _ in obter_indice().buscar(termo, tipo, categoria)]
+
+        page = self.paginate_queryset(seqs)
         if page is not None:
-            serializer = FundamentoLegalListSerializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
-        
-        serializer = FundamentoLegalListSerializer(queryset, many=True)
-        return Response(serializer.data)
+            seqs = page
+        por_seq = {
+            linha[0]: linha
+            for linha in FundamentoLegal.objects.filter(seq__in=seqs).values_list(*CAMPOS_LISTA)
+        }
+        linhas = linhas_lista(por_seq[seq] for seq in seqs if seq in por_seq)
+        if page is not None:
+            return self.get_paginated_response(linhas)
+        return Response(linhas)
+
+    @action(detail=False, methods=['get'])
+    def sugestoes(self, request):
+        """Completa o termo digitado (?q=) com termos e fundamentos, sem acessar o banco"""
+        try:
+            limite = min(int(request.query_params.get('k', 10)), 50)
+        except ValueError:
+            limite = 0
+        if limite < 1:
+            return Response({'erro': 'k deve ser um inteiro positivo'},
+                          status=status.HTTP_400_BAD_REQUEST)
+
+        termo = request.query_params.get('q', '')
+        return Response(obter_prefixos().sugerir(termo, limite))
+
+    @action(detail=False, methods=['get', 'post'])
+    def lote(self, request):
+        """
+        Vários fundamentos de uma vez: GET ?seqs=1,2,3 ou POST {"seqs": [...]}.
+        ?formato=compacto usa a representação da listagem; o padrão (completo)
+        é a do detalhe. Consultas: fundamentos, textos e filhos; pai e caminho
+        vêm do índice da hierarquia.
+        """
+        dados = request.data if request.method == 'POST' else request.query_params
+        seqs = dados.get('seqs') or []
+        formato = dados.get('formato', 'completo')
+        if isinstance(seqs, str):
+            seqs = [seq for seq in seqs.split(',') if seq.strip()]
+
+        if formato not in ('completo', 'compacto'):
+            return Response({'erro': "formato deve ser 'completo' ou 'compacto'"},
+                          status=status.HTTP_400_BAD_REQUEST)
+        try:
+            seqs = list(dict.fromkeys(int(seq) for seq in seqs))
+        except (TypeError, ValueError):
+            return Response({'erro': 'seqs deve ser uma lista de seqs numéricos'},
+                          status=status.HTTP_400_BAD_REQUEST)
+        if not all(seq_valido(seq) for seq in seqs):
+            return Response({'erro': f'seqs devem estar entre {SEQ_MINIMO} e {SEQ_MAXIMO}'},
+                          status=status.HTTP_400_BAD_REQUEST)
+        maximo = settings.FUNDAMENTOS_LOTE_MAXIMO
+        if not seqs or len(seqs) > maximo:
+            return Response({'erro': f'Informe de 1 a {maximo} seqs'},
+                          status=status.HTTP_400_BAD_REQUEST)
+
+        queryset = FundamentoLegal.objects.filter(seq__in=seqs)
+        if formato == 'compacto':
+            por_seq = {linha[0]: linha for linha in queryset.values_list(*CAMPOS_LISTA)}
+            fundamentos = linhas_lista(por_seq[seq] for seq in seqs if seq in por_seq)
+        else:
+            por_seq = queryset.prefetch_related('textos', 'filhos').in_bulk()
+            fundamentos = FundamentoLegalDetailSerializer(
+                [por_seq[seq] for seq in seqs if seq in por_seq], many=True
+            ).data
+
+        return Response({
+            'fundamentos': fundamentos,
+            'nao_encontrados': [seq for seq in seqs if seq not in por_seq],
+        })
+
+    @action(detail=False, methods=['get'], content_negotiation_class=NegociacaoFixa)
+    def exportar(self, request):
+        """
+        Transmite todos os fundamentos (com os filtros da listagem) e seus
+        textos em ?formato=ndjson (padrão) ou csv, sem paginação.
+        """
+        formato = request.query_params.get('formato', 'ndjson')
+        if formato not in FORMATOS_EXPORTACAO:
+            return Response({'erro': "formato deve ser 'ndjson' ou 'csv'"},
+                          status=status.HTTP_400_BAD_REQUEST)
+
+        gerar, content_type = FORMATOS_EXPORTACAO[formato]
+        resposta = StreamingHttpResponse(gerar(self.get_queryset()), content_type=content_type)
+        resposta['Content-Disposition'] = f'attachment; filename="fundamentos.{formato}"'
+        return resposta
 
     @action(detail=False, methods=['get'])
     def estatisticas(self, request):
         """Retorna estatísticas gerais dos fundamentos"""
-        stats = {
-            'total': FundamentoLegal.objects.count(),
-            'por_tipo': {},
-            'por_categoria': {},
-            'selecionaveis': FundamentoLegal.objects.filter(selecionavel=True).count(),
-            'com_glossario': FundamentoLegal.objects.exclude(
-                Q(glossario__isnull=True) | Q(glossario='')
-            ).count(),
-            'raizes': FundamentoLegal.objects.filter(pai__isnull=True).count(),
-        }
-        
-        # Contagem por tipo de recurso
-        for tipo in TipoRecurso:
-            stats['por_tipo'][tipo.label] = FundamentoLegal.objects.filter(
-                tipo_recurso=tipo.value
-            ).count()
-        
-        # Contagem por categoria
-        for cat in Categoria:
-            stats['por_categoria'][cat.label] = FundamentoLegal.objects.filter(
-                categoria=cat.value
-            ).count()
-        
-        return Response(stats)
+        return Response(obter_estatisticas())
 
     @action(detail=True, methods=['get'])
     def descendentes(self, request, pk=None):
-        """Retorna todos os descendentes de um fundamento"""
-        fundamento = self.get_object()
-        descendentes = fundamento.get_descendentes()
-        serializer = FundamentoLegalListSerializer(descendentes, many=True)
-        return Response(serializer.data)
+        """Retorna os descendentes de um fundamento, em pré-ordem (?depth=N limita os níveis)"""
+        depth = request.query_params.get('depth')
+        profundidade = None
+        if depth:
+            try:
+                profundidade = int(depth)
+            except ValueError:
+                profundidade = 0
+            if profundidade < 1:
+                return Response({'erro': 'depth deve ser um inteiro positivo'},
+                              status=status.HTTP_400_BAD_REQUEST)
+
+        linhas = listar_descendentes(seq_ou_404(pk), profundidade)
+        if not linhas:
+            raise Http404
+        # A primeira linha é o próprio fundamento
+        return Response(linhas[1:])
+
+    @action(detail=True, methods=['get'])
+    def ancestrais(self, request, pk=None):
+        """Retorna os ancestrais de um fundamento, da raiz até o pai"""
+        linhas = listar_ancestrais(seq_ou_404(pk))
+        if not linhas:
+            raise Http404
+        return Response(linhas[:-1])
 
 
 # Views para interface web
@@ -162,10 +373,10 @@ def index(request):
     categorias = [{'value': c.value, 'label': c.label} for c in Categoria]
     
     # Estatísticas resumidas
+    estatisticas = obter_estatisticas()
     stats = {
-        'total': FundamentoLegal.objects.count(),
-        'tipos': {t.label: FundamentoLegal.objects.filter(tipo_recurso=t.value).count() 
-                 for t in TipoRecurso}
+        'total': estatisticas['total'],
+        'tipos': estatisticas['por_tipo'],
     }
     
     context = {
@@ -178,11 +389,11 @@ def index(request):
 
 def detalhe(request, seq):
     """Página de detalhe de um fundamento"""
-    fundamento = get_object_or_404(FundamentoLegal, seq=seq)
+    fundamento = get_object_or_404(FundamentoLegal.objects.select_related('pai'), seq=seq_ou_404(seq))
     context = {
         'fundamento': fundamento,
         'caminho': fundamento.caminho,
-        'filhos': fundamento.filhos.all(),
+        'filhos': list(fundamento.filhos.all()),
         'textos': fundamento.textos.all(),
     }
     return render(request, 'fundamentos/detalhe.html', context)
@@ -206,10 +417,10 @@ def arvore_view(request):
     return render(request, 'fundamentos/arvore.html', context)
 
 
+@condicional
 @api_view(['GET'])
 def api_filhos(request, seq):
     """API endpoint para carregar filhos de forma lazy"""
-    fundamento = get_object_or_404(FundamentoLegal, seq=seq)
-    filhos = fundamento.filhos.all()
-    serializer = FundamentoLegalListSerializer(filhos, many=True)
-    return Response(serializer.data)
+    fundamento = get_object_or_404(FundamentoLegal, seq=seq_ou_404(seq))
+    filhos = fundamento.filhos.values_list(*CAMPOS_LISTA)
+    return Response(linhas_lista(filhos))